@@ -33,6 +33,12 @@ MIN_EVALUATION_PERIOD = dt.timedelta(minutes=60)
 # Miner compressed index cache freshness.
 MINER_CACHE_FRESHNESS = dt.timedelta(minutes=20)
 
+# How often the miner reconciles its running total of stored content size against the full table.
+MINER_CONTENT_SIZE_RECONCILE_PERIOD = dt.timedelta(hours=24)
+
+# How often the miner deletes time buckets that are too old for validators to score.
+MINER_EXPIRED_CONTENT_CLEAR_PERIOD = dt.timedelta(hours=1)
+
 # Date after which only x.com URLs are accepted
 NO_TWITTER_URLS_DATE = dt.datetime(2024, 12, 28, tzinfo=dt.timezone.utc)  # December 28, 2024 UTC
 
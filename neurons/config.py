@@ -172,6 +172,14 @@ def add_args(neuron_type: NeuronType, parser):
             default=8000,
         )
 
+        parser.add_argument(
+            "--neuron.storage_backend",
+            type=str,
+            choices=["sqlite", "numpy"],
+            help="The validator storage engine for miner indexes. The numpy backend uses less memory and reads without locking but does not support the validator API.",
+            default="sqlite",
+        )
+
         parser.add_argument(
             "--organic_whitelist",
             nargs="+",
@@ -204,6 +212,28 @@ def add_args(neuron_type: NeuronType, parser):
             default=250,
         )
 
+        parser.add_argument(
+            "--neuron.storage_backend",
+            type=str,
+            choices=["sqlite", "lmdb"],
+            help="The miner storage engine. The lmdb backend requires the lmdb package, treats database_name as a directory and does not support the uploaders.",
+            default="sqlite",
+        )
+
+        parser.add_argument(
+            "--neuron.compress_content",
+            action="store_true",
+            help="Set this flag to compress newly stored content, fitting more data within max_database_size_gb_hint.",
+            default=False,
+        )
+
+        parser.add_argument(
+            "--neuron.index_keywords",
+            action="store_true",
+            help="Set this flag to maintain a full-text index of stored content, speeding up keyword upload jobs at the cost of extra disk space.",
+            default=False,
+        )
+
         root_dir = Path(os.path.dirname(__file__)).parent
         default_file = os.path.join(
             os.path.join(root_dir, "scraping/config/scraping_config.json"),
@@ -234,6 +264,20 @@ def add_args(neuron_type: NeuronType, parser):
             default=True
         )
 
+        parser.add_argument(
+            "--export_snapshot",
+            action="store_true",
+            help="Set this flag to have the uploaders read from a snapshot copy of the database, so long uploads don't hold back scraping writes or WAL checkpoints. Needs free disk space for one copy of the database, shared by the uploaders.",
+            default=False
+        )
+
+        parser.add_argument(
+            "--encoding_workers",
+            type=int,
+            help="Number of worker processes encoding usernames and urls during HF uploads. Defaults to the number of CPUs.",
+            default=None
+        )
+
         parser.add_argument(
             "--gravity",
             action="store_true",
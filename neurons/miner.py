@@ -37,11 +37,13 @@ from common.protocol import (
 from scraping.config.config_reader import ConfigReader
 from scraping.coordinator import ScraperCoordinator
 from scraping.provider import ScraperProvider
+from storage.miner.lmdb_miner_storage import LmdbMinerStorage
 from storage.miner.sqlite_miner_storage import SqliteMinerStorage
 from neurons.config import NeuronType, check_config, create_config
 from upload_utils.huggingface_uploader import DualUploader
 from upload_utils.s3_uploader import S3PartitionedUploader
 from upload_utils.encoding_system import EncodingKeyManager, decode_url
+from upload_utils.export_snapshot import SharedExportSnapshot
 from dynamic_desirability.desirability_retrieval import sync_run_retrieval
 
 from common.data import DataLabel, DataSource, DataEntity
@@ -316,6 +318,12 @@ class Miner:
         bt.logging(config=self.config, logging_dir=self.config.full_path)
         bt.logging.info(self.config)
         self.use_uploader = self.config.use_uploader
+        if self.use_uploader and self.config.neuron.storage_backend != "sqlite":
+            # The uploaders read the SQLite database directly.
+            bt.logging.warning(
+                f"Uploaders are not supported with the {self.config.neuron.storage_backend} storage backend. Disabling them."
+            )
+            self.use_uploader = False
         self.use_gravity_retrieval = self.config.gravity
 
         if self.config.offline:
@@ -402,6 +410,12 @@ class Miner:
         bt.logging.info("Initialized EncodingKeyManager for URL encoding/decoding.")
 
         if self.use_uploader and not self.config.offline:
+            # Both uploaders read from one snapshot of the database, rather than a copy each.
+            export_snapshot = (
+                SharedExportSnapshot(self.config.neuron.database_name)
+                if self.config.export_snapshot
+                else None
+            )
             self.hf_uploader = DualUploader(
                 db_path=self.config.neuron.database_name,
                 encoding_key_manager=self.encoding_key_manager,
@@ -409,7 +423,8 @@ class Miner:
                 wallet=self.wallet,
                 subtensor=self.subtensor,
                 state_file=self.config.miner_upload_state_file,
-
+                export_snapshot=export_snapshot,
+                n_encoding_workers=self.config.encoding_workers,
             )
             self.s3_partitioned_uploader = S3PartitionedUploader(
                 db_path=self.config.neuron.database_name,
@@ -417,17 +432,29 @@ class Miner:
                 wallet=self.wallet,
                 s3_auth_url=self.config.s3_auth_url,
                 state_file=self.config.miner_upload_state_file,
+                export_snapshot=export_snapshot,
             )
         elif self.use_uploader and self.config.offline:
             bt.logging.info("Uploaders disabled in offline mode.")
             self.hf_uploader = None
             self.s3_partitioned_uploader = None
+        else:
+            self.hf_uploader = None
+            self.s3_partitioned_uploader = None
 
         # Instantiate storage.
-        self.storage = SqliteMinerStorage(
-            self.config.neuron.database_name,
-            self.config.neuron.max_database_size_gb_hint,
-        )
+        if self.config.neuron.storage_backend == "lmdb":
+            self.storage = LmdbMinerStorage(
+                self.config.neuron.database_name,
+                self.config.neuron.max_database_size_gb_hint,
+            )
+        else:
+            self.storage = SqliteMinerStorage(
+                self.config.neuron.database_name,
+                self.config.neuron.max_database_size_gb_hint,
+                compress_content=self.config.neuron.compress_content,
+                index_keywords=self.config.neuron.index_keywords,
+            )
 
         bt.logging.success(
             f"Successfully connected to miner storage: {self.config.neuron.database_name}."
@@ -476,6 +503,14 @@ class Miner:
                     time_delta=constants.MINER_CACHE_FRESHNESS
                 )
                 bt.logging.trace("Refresh index thread finished refreshing the index.")
+                # Periodically correct any drift in the running total used for capacity checks.
+                self.storage.reconcile_content_size(
+                    time_delta=constants.MINER_CONTENT_SIZE_RECONCILE_PERIOD
+                )
+                # Clear content once it is too old to be scored.
+                self.storage.clear_expired_content(
+                    time_delta=constants.MINER_EXPIRED_CONTENT_CLEAR_PERIOD
+                )
                 # Wait freshness period + 1 minute to try refreshing again.
                 # Wait the additional minute to ensure that the next refresh sees a 'stale' index.
                 time.sleep(
@@ -901,7 +936,11 @@ class Miner:
         bt.logging.info(f"Got a GetHuggingFaceMetadata request from {synapse.dendrite.hotkey}.")
 
         # Query the HuggingFace metadata from the database
-        synapse.metadata = self.storage.get_hf_metadata(unique_id=self.hf_uploader.unique_id)
+        synapse.metadata = (
+            self.storage.get_hf_metadata(unique_id=self.hf_uploader.unique_id)
+            if self.hf_uploader
+            else []
+        )
 
         if not synapse.metadata:
             bt.logging.info(f"No HuggingFace metadata available. Returning empty list to {synapse.dendrite.hotkey}.")
@@ -504,6 +504,12 @@ class Validator:
             )
 
             self.axon.serve(netuid=self.config.netuid, subtensor=self.subtensor).start()
+            if self.config.neuron.api_on and self.config.neuron.storage_backend != "sqlite":
+                # The API queries the SQLite validator storage directly.
+                bt.logging.warning(
+                    f"The validator API is not supported with the {self.config.neuron.storage_backend} storage backend. Disabling it."
+                )
+                self.config.neuron.api_on = False
             if self.config.neuron.api_on:
                 try:
                     bt.logging.info("Starting Validator API...")
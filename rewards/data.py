@@ -322,6 +322,10 @@ class PrimitiveDataSourceDesirability:
             matching_jobs.append(job)
         
         return matching_jobs
+
+    def get_jobs(self, data_keyword: str, data_label: str) -> List[dict]:
+        """Returns the jobs for the given keyword and label in matching order, regardless of time constraints."""
+        return self._job_dict.get((data_keyword, data_label), [])
     
     def get_job_by_id(self, job_id: str) -> Optional[dict]:
         """Get job data by job ID"""
@@ -358,6 +362,13 @@ class PrimitiveDataDesirabilityLookup:
             keyword, label, data_timebucket
         )
     
+    def get_jobs(self, data_source: DataSource, keyword: str, label: str) -> List[Dict]:
+        """Get the jobs for a data source, keyword and label in matching order, regardless of time constraints."""
+        if data_source not in self.distribution:
+            return []
+
+        return self.distribution[data_source].get_jobs(keyword, label)
+    
     def get_default_scale_factor(self, data_source: DataSource) -> float:
         """Get the default scale factor for a data source."""
         if data_source not in self.distribution:
@@ -1,5 +1,6 @@
 import threading
 from typing import List, Optional
+import numpy as np
 import torch
 import bittensor as bt
 import datetime as dt
@@ -228,10 +229,7 @@ class MinerScorer:
                 current_time_bucket = TimeBucket.from_datetime(
                     dt.datetime.now(tz=dt.timezone.utc)
                 )
-                for bucket in index.scorable_data_entity_buckets:
-                    score += self.value_calculator.get_score_for_data_entity_bucket(
-                        bucket, current_time_bucket
-                    )
+                score = self._score_index(index, current_time_bucket)
 
                 # If the score has increased since the last eval, decrease credibility so that the
                 # new score remains unchanged. i.e. "you've told us you now have more valuable data, prove it".
@@ -273,6 +271,35 @@ class MinerScorer:
                 f"Evaluated Miner {uid}. Score={self.scores[uid].item()}. Credibility={self.miner_credibility[uid].item()}."
             )
 
+    def _score_index(self, index: ScorableMinerIndex, current_time_bucket: TimeBucket) -> float:
+        """Returns the sum of the scores of the index's buckets, scored as a batch of parallel arrays."""
+        buckets = index.scorable_data_entity_buckets
+        bucket_count = len(buckets)
+
+        label_ids_by_label = {}
+        label_ids = np.fromiter(
+            (
+                label_ids_by_label.setdefault(bucket.label, len(label_ids_by_label))
+                for bucket in buckets
+            ),
+            dtype=np.int64,
+            count=bucket_count,
+        )
+        return self.value_calculator.get_score_for_data_entity_buckets(
+            sources=np.fromiter(
+                (bucket.source for bucket in buckets), dtype=np.int64, count=bucket_count
+            ),
+            label_ids=label_ids,
+            labels=list(label_ids_by_label),
+            time_bucket_ids=np.fromiter(
+                (bucket.time_bucket_id for bucket in buckets), dtype=np.int64, count=bucket_count
+            ),
+            scorable_bytes=np.fromiter(
+                (bucket.scorable_bytes for bucket in buckets), dtype=np.int64, count=bucket_count
+            ),
+            current_time_bucket=current_time_bucket,
+        )
+
     def _update_credibility(self, uid: int, validation_results: List[ValidationResult]):
         """Updates the miner's credibility based on the most recent set of validation_results.
 
@@ -15,6 +15,7 @@ from functools import partial
 from scraping.provider import DEFAULT_FACTORIES, ScraperProvider
 from scraping.scraper import ScraperId, ScrapeConfig
 from scraping.custom.twikit_provider import TwikitProvider
+from storage.miner.ingest_writer import IngestWriter
 from storage.miner.miner_storage import MinerStorage
 
 
@@ -201,6 +202,9 @@ class ScraperCoordinator:
         self.storage = miner_storage
         self.config = config
 
+        # Workers hand their results to a single writer thread rather than each writing to storage.
+        self.ingest_writer = IngestWriter(miner_storage)
+
         self.tracker = ScraperCoordinator.Tracker(self.config, dt.datetime.utcnow())
         self.max_workers = 5
         self.is_running = False
@@ -235,6 +239,7 @@ class ScraperCoordinator:
         )
 
         self.provider = ScraperProvider(factories=factories)
+        self.ingest_writer.start()
         workers = []
         for i in range(self.max_workers):
             worker = asyncio.create_task(
@@ -278,7 +283,9 @@ class ScraperCoordinator:
 
         bt.logging.info("Coordinator shutting down. Waiting for workers to finish.")
         await asyncio.gather(*workers)
-        bt.logging.info("Coordinator stopped.")
+        # Store anything the workers already scraped.
+        self.ingest_writer.stop()
+        bt.logging.info(f"Coordinator stopped. Ingest counts: {self.ingest_writer.get_counts()}.")
 
     async def _worker(self, name):
         """A worker thread"""
@@ -290,7 +297,7 @@ class ScraperCoordinator:
                 # Perform the scrape
                 data_entities = await scrape_fn()
 
-                self.storage.store_data_entities(data_entities)
+                await self.ingest_writer.submit_async(data_entities)
                 self.queue.task_done()
             except Exception as e:
                 bt.logging.error("Worker " + name + ": " + traceback.format_exc())
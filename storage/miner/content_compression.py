@@ -0,0 +1,109 @@
+"""Compression of the DataEntity content blobs stored by the SqliteMinerStorage.
+
+Compressed content is prefixed with COMPRESSED_CONTENT_MAGIC and the id of the ContentDictionary it was
+compressed with, so compressed and raw rows can live side by side in the same table.
+"""
+
+import sqlite3
+import struct
+import zlib
+from typing import Dict, Iterable
+
+# Raw content is UTF-8 JSON, which never starts with a NUL byte.
+COMPRESSED_CONTENT_MAGIC = b"\x00DEZ"
+
+# The magic as a SQL blob literal, for detecting compressed rows within queries and triggers.
+COMPRESSED_CONTENT_MAGIC_SQL = f"X'{COMPRESSED_CONTENT_MAGIC.hex().upper()}'"
+
+# Dictionary id of content compressed without a dictionary.
+NO_DICTIONARY_ID = 0
+
+# zlib only looks back 32KB so any larger dictionary would be wasted.
+MAX_DICTIONARY_SIZE_BYTES = 32 * 1024
+
+COMPRESSION_LEVEL = 6
+
+_HEADER = struct.Struct(">4sI")
+
+
+def train_dictionary(samples: Iterable[bytes]) -> bytes:
+    """Builds a zlib preset dictionary from sample contents of a single DataSource.
+
+    zlib favors the end of the dictionary, so the samples are concatenated and only the tail is kept.
+    """
+    return b"".join(samples)[-MAX_DICTIONARY_SIZE_BYTES:]
+
+
+def is_compressed(content: bytes) -> bool:
+    """Returns whether the content was produced by compress_content."""
+    return content[: len(COMPRESSED_CONTENT_MAGIC)] == COMPRESSED_CONTENT_MAGIC
+
+
+def compress_content(content: bytes, dictionary_id: int, dictionary: bytes) -> bytes:
+    """Compresses the content with the provided dictionary, returning it unchanged if that would not save space."""
+    if dictionary_id == NO_DICTIONARY_ID:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, wbits=-15)
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, wbits=-15, zdict=dictionary)
+
+    compressed = (
+        _HEADER.pack(COMPRESSED_CONTENT_MAGIC, dictionary_id)
+        + compressor.compress(content)
+        + compressor.flush()
+    )
+    return compressed if len(compressed) < len(content) else content
+
+
+def decompress_content(content: bytes, dictionaries: Dict[int, bytes]) -> bytes:
+    """Returns the original content, decompressing it if necessary.
+
+    Raises:
+        KeyError: If the content was compressed with a dictionary missing from dictionaries.
+    """
+    if not is_compressed(content):
+        return content
+
+    _, dictionary_id = _HEADER.unpack_from(content)
+    if dictionary_id == NO_DICTIONARY_ID:
+        decompressor = zlib.decompressobj(wbits=-15)
+    else:
+        decompressor = zlib.decompressobj(wbits=-15, zdict=dictionaries[dictionary_id])
+
+    return decompressor.decompress(content[_HEADER.size :]) + decompressor.flush()
+
+
+def load_dictionaries(connection: sqlite3.Connection) -> Dict[int, bytes]:
+    """Reads every ContentDictionary from the database, returning an empty dict if none were ever created."""
+    try:
+        rows = connection.execute("SELECT id, dictionary FROM ContentDictionary").fetchall()
+    except sqlite3.OperationalError:
+        # Databases that never enabled compression do not have the table.
+        return {}
+
+    return {row[0]: row[1] for row in rows}
+
+
+class ContentDecompressor:
+    """Decompresses content read through a connection, loading dictionaries from it as they are needed."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.dictionaries = {}
+
+    def __call__(self, content: bytes) -> bytes:
+        if content is None or not is_compressed(content):
+            return content
+
+        try:
+            return decompress_content(content, self.dictionaries)
+        except KeyError:
+            # A dictionary was created since we last looked.
+            self.dictionaries = load_dictionaries(self.connection)
+            return decompress_content(content, self.dictionaries)
+
+
+def register_content_functions(connection: sqlite3.Connection):
+    """Registers a decompress_content(content) SQL function on the connection for reading compressed rows."""
+    connection.create_function(
+        "decompress_content", 1, ContentDecompressor(connection), deterministic=True
+    )
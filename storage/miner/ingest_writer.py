@@ -0,0 +1,205 @@
+import asyncio
+import datetime as dt
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import bittensor as bt
+
+from common.data import DataEntity
+from storage.miner.miner_storage import MinerStorage
+
+
+class IngestWriter:
+    """Buffers DataEntities from any number of producers and stores them in batches from a single writer thread.
+
+    Producers only enqueue, so they never contend with each other for the storage write lock. Each flush is a
+    single store_data_entities call, so capacity checks and commits happen once per batch instead of once per scrape.
+    """
+
+    # How often submit_async retries queueing while the queue is full.
+    FULL_QUEUE_RETRY_SECONDS = 0.1
+
+    # Errors caused by the entities being stored rather than by the storage itself. Only batches failing with these
+    # are split to find the bad entities, since smaller batches fail against a failing storage all the same.
+    ENTITY_ERRORS = (ValueError, TypeError, sqlite3.IntegrityError, sqlite3.InterfaceError)
+
+    # How many times a batch is stored while the storage is failing, waiting twice as long after each attempt.
+    STORE_ATTEMPTS = 3
+    STORE_RETRY_BACKOFF_SECONDS = 1.0
+
+    def __init__(
+        self,
+        storage: MinerStorage,
+        max_batch_entities: int = 10_000,
+        max_batch_delay: dt.timedelta = dt.timedelta(seconds=5),
+        max_pending_submissions: int = 100,
+    ):
+        self.storage = storage
+        self.max_batch_entities = max_batch_entities
+        self.max_batch_delay = max_batch_delay
+
+        # Bound the pending submissions so producers are slowed down if the writer falls behind.
+        self.queue = queue.Queue(maxsize=max_pending_submissions)
+        self.thread = None
+
+        # Lock around the ingest counts.
+        self.counts_lock = threading.Lock()
+        self.accepted_count = 0
+        self.duplicate_count = 0
+
+    def start(self):
+        """Starts the writer thread."""
+        assert self.thread is None, "IngestWriter already running"
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stores everything already submitted and then stops the writer thread."""
+        if self.thread is None:
+            return
+
+        # None tells the writer thread to flush and exit.
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def submit(self, data_entities: List[DataEntity]):
+        """Queues DataEntities to be stored by the writer thread. Blocks if too many submissions are pending."""
+        if data_entities:
+            self.queue.put(data_entities)
+
+    async def submit_async(self, data_entities: List[DataEntity]):
+        """Queues DataEntities like submit, but waits without blocking the event loop if too many are pending."""
+        if not data_entities:
+            return
+
+        waiting_since = None
+        while True:
+            try:
+                self.queue.put_nowait(data_entities)
+                break
+            except queue.Full:
+                if waiting_since is None:
+                    waiting_since = time.monotonic()
+                await asyncio.sleep(IngestWriter.FULL_QUEUE_RETRY_SECONDS)
+
+        if waiting_since is not None:
+            bt.logging.trace(
+                f"Waited {time.monotonic() - waiting_since:.1f}s for the ingest writer to catch up."
+            )
+
+    def get_counts(self) -> Dict[str, int]:
+        """Returns how many DataEntities have been stored and how many were dropped as duplicates within a batch."""
+        with self.counts_lock:
+            return {
+                "accepted": self.accepted_count,
+                "duplicates": self.duplicate_count,
+            }
+
+    def _run(self):
+        # Key by uri so a later scrape of the same entity replaces the earlier one, matching the storage upsert.
+        batch: Dict[str, DataEntity] = {}
+        batch_started: Optional[float] = None
+        max_batch_delay_seconds = self.max_batch_delay.total_seconds()
+
+        while True:
+            timeout = (
+                None
+                if batch_started is None
+                else max(0, batch_started + max_batch_delay_seconds - time.monotonic())
+            )
+            try:
+                data_entities = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                data_entities = []
+
+            stopping = data_entities is None
+            if not stopping:
+                duplicates = 0
+                for data_entity in data_entities:
+                    if data_entity.uri in batch:
+                        duplicates += 1
+                    batch[data_entity.uri] = data_entity
+
+                if duplicates:
+                    with self.counts_lock:
+                        self.duplicate_count += duplicates
+
+                if batch_started is None and batch:
+                    batch_started = time.monotonic()
+
+            if batch and (
+                stopping
+                or len(batch) >= self.max_batch_entities
+                or time.monotonic() - batch_started >= max_batch_delay_seconds
+            ):
+                self._flush(list(batch.values()))
+                batch = {}
+                batch_started = None
+
+            if stopping:
+                return
+
+    def _flush(self, data_entities: List[DataEntity]):
+        backoff_seconds = self.STORE_RETRY_BACKOFF_SECONDS
+        for attempt in range(1, self.STORE_ATTEMPTS + 1):
+            try:
+                failed_count = self._store(data_entities)
+                break
+            except Exception:
+                if attempt == self.STORE_ATTEMPTS:
+                    bt.logging.error(
+                        f"Dropped a batch of {len(data_entities)} entities after {attempt} failed attempts to store it: "
+                        + traceback.format_exc()
+                    )
+                    return
+
+                bt.logging.warning(
+                    f"Failed to store a batch of {len(data_entities)} entities, retrying in {backoff_seconds}s: "
+                    + traceback.format_exc()
+                )
+                time.sleep(backoff_seconds)
+                backoff_seconds *= 2
+
+        if failed_count:
+            bt.logging.error(
+                f"Dropped {failed_count} of a batch of {len(data_entities)} entities that failed to store on their own."
+            )
+
+        with self.counts_lock:
+            # Count the batch once it is stored, as a retried batch may have been partly stored before failing.
+            self.accepted_count += len(data_entities) - failed_count
+            bt.logging.trace(
+                f"Stored a batch of {len(data_entities) - failed_count} entities. "
+                + f"Accepted {self.accepted_count} and dropped {self.duplicate_count} duplicates in total."
+            )
+
+    def _store(self, data_entities: List[DataEntity], is_whole_batch: bool = True) -> int:
+        """Stores the entities, splitting them in halves to retry if their content fails to store. Returns how many failed.
+
+        A batch failing on its content is most likely too large for the storage or contains one bad entity, so only
+        the entities that still fail on their own are dropped. Any other error is raised for the whole batch.
+        """
+        try:
+            self.storage.store_data_entities(data_entities)
+        except self.ENTITY_ERRORS:
+            # Only log the traceback of the whole batch, as the splits mostly fail the same way.
+            log = bt.logging.warning if is_whole_batch else bt.logging.trace
+            if len(data_entities) == 1:
+                log(f"Failed to store entity {data_entities[0].uri}: {traceback.format_exc()}")
+                return 1
+
+            log(
+                f"Failed to store a batch of {len(data_entities)} entities, retrying in halves: {traceback.format_exc()}"
+            )
+            middle = len(data_entities) // 2
+            return self._store(data_entities[:middle], is_whole_batch=False) + self._store(
+                data_entities[middle:], is_whole_batch=False
+            )
+
+        return 0
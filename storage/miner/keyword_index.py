@@ -0,0 +1,63 @@
+"""Extraction of the searchable text of DataEntities for the SqliteMinerStorage keyword index.
+
+The index is an FTS5 trigram table, so keyword jobs can match substrings of the text, title and body content
+fields without parsing the JSON content of every row.
+"""
+
+import json
+from typing import Optional
+
+from common.data import DataSource
+
+# The content fields searched by keyword jobs for each source.
+KEYWORD_FIELDS_BY_SOURCE = {
+    DataSource.REDDIT: ("title", "body"),
+    DataSource.X: ("text",),
+}
+
+# Escape character for LIKE patterns built from keywords.
+LIKE_ESCAPE = "\\"
+
+# The trigram tokenizer can only match keywords of at least this many characters through the index.
+MIN_INDEXED_KEYWORD_LENGTH = 3
+
+
+def extract_keyword_text(source: int, content: bytes) -> Optional[str]:
+    """Returns the searchable text of a DataEntity's content, or None if its source is not searchable."""
+    fields = KEYWORD_FIELDS_BY_SOURCE.get(source)
+    if fields is None:
+        return None
+
+    try:
+        parsed = json.loads(content)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return ""
+
+    if not isinstance(parsed, dict):
+        return ""
+
+    return "\n".join(
+        parsed[field] for field in fields if isinstance(parsed.get(field), str)
+    )
+
+
+def keyword_like_pattern(keyword: str) -> str:
+    """Returns a LIKE pattern matching any text containing the keyword, for use with ESCAPE LIKE_ESCAPE."""
+    escaped = (
+        keyword.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+    return f"%{escaped}%"
+
+
+def keyword_match_query(keyword: str) -> Optional[str]:
+    """Returns an FTS5 query matching any text containing the keyword, or None if it is too short to use the index.
+
+    Short keywords must instead be matched with keyword_like_pattern, which scans the indexed text.
+    """
+    if len(keyword) < MIN_INDEXED_KEYWORD_LENGTH:
+        return None
+
+    # Quote the keyword as a phrase so FTS5 query syntax within it is treated literally.
+    return '"' + keyword.replace('"', '""') + '"'
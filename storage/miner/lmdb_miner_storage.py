@@ -0,0 +1,635 @@
+from collections import defaultdict
+import threading
+from common import constants, utils
+from common.data import (
+    CompressedEntityBucket,
+    CompressedMinerIndex,
+    DataEntity,
+    DataEntityBucket,
+    DataEntityBucketId,
+    DataLabel,
+    DataSource,
+    TimeBucket,
+    HuggingFaceMetadata,
+)
+from storage.miner.miner_storage import MinerStorage
+from typing import Dict, List, Optional, Tuple
+import datetime as dt
+import hashlib
+import json
+import struct
+import bittensor as bt
+
+try:
+    import lmdb
+except ImportError:  # lmdb is only required when the lmdb storage backend is selected.
+    lmdb = None
+
+
+# Key layouts. All integers are big-endian so that keys sort in numeric order.
+# Labels and uris are hashed so that keys stay within the LMDB key size limit.
+# Bucket key: source, timeBucketId, label hash. Entity keys append the uri hash to the bucket key.
+_LABEL_HASH_SIZE = 8
+_URI_HASH_SIZE = 16
+_BUCKET_KEY = struct.Struct(f">BI{_LABEL_HASH_SIZE}s")
+# Entity value header: datetime in microseconds, utc offset in seconds, contentSizeBytes and uri length.
+# The uri and then the content follow.
+_ENTITY_HEADER = struct.Struct(">qiQI")
+# Bucket value: bucketSize, entityCount. The label follows.
+_BUCKET_TOTALS = struct.Struct(">QQ")
+_UINT64 = struct.Struct(">Q")
+
+# utc offset stored for naive datetimes.
+_NAIVE_UTC_OFFSET = -(2**31)
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_EPOCH_UTC = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+_CONTENT_SIZE_KEY = b"content_size"
+
+
+def _datetime_key(micros: int, entity_key: bytes) -> bytes:
+    # Offset the signed microseconds so that keys sort in time order.
+    return _UINT64.pack(micros + 2**63) + entity_key
+
+
+def _bucket_key(source: int, time_bucket_id: int, label: str) -> bytes:
+    return _BUCKET_KEY.pack(
+        source,
+        time_bucket_id,
+        hashlib.blake2b(label.encode(), digest_size=_LABEL_HASH_SIZE).digest(),
+    )
+
+
+def _uri_hash(uri: str) -> bytes:
+    return hashlib.blake2b(uri.encode(), digest_size=_URI_HASH_SIZE).digest()
+
+
+def _list_bucket_values(cursor: "lmdb.Cursor", bucket_key: bytes) -> List[bytes]:
+    """Returns the entity values in a bucket ordered by contentSizeBytes and then uri, as SqliteMinerStorage does."""
+    values = []
+    if cursor.set_range(bucket_key):
+        for key, value in cursor:
+            if not key.startswith(bucket_key):
+                break
+            values.append(value)
+
+    def _sort_key(value: bytes) -> Tuple[int, bytes]:
+        _, _, content_size_bytes, uri_length = _ENTITY_HEADER.unpack_from(value)
+        return content_size_bytes, value[_ENTITY_HEADER.size : _ENTITY_HEADER.size + uri_length]
+
+    values.sort(key=_sort_key)
+    return values
+
+
+def _datetime_to_micros(datetime: dt.datetime) -> Tuple[int, int]:
+    if datetime.tzinfo is None:
+        return (datetime - _EPOCH) // dt.timedelta(microseconds=1), _NAIVE_UTC_OFFSET
+
+    return (
+        (datetime - _EPOCH_UTC) // dt.timedelta(microseconds=1),
+        int(datetime.utcoffset().total_seconds()),
+    )
+
+
+def _micros_to_datetime(micros: int, utc_offset: int) -> dt.datetime:
+    if utc_offset == _NAIVE_UTC_OFFSET:
+        return _EPOCH + dt.timedelta(microseconds=micros)
+
+    tzinfo = (
+        dt.timezone.utc
+        if utc_offset == 0
+        else dt.timezone(dt.timedelta(seconds=utc_offset))
+    )
+    return (_EPOCH_UTC + dt.timedelta(microseconds=micros)).astimezone(tzinfo)
+
+
+class LmdbMinerStorage(MinerStorage):
+    """LMDB backed MinerStorage.
+
+    DataEntities are kept in key order by (source, timeBucketId, label, uri) so every DataEntityBucket is a single
+    range read, with secondary indexes by uri, by bucket size and by datetime. Readers never block on the writer.
+    """
+
+    # How many DataEntities to delete per write transaction when clearing space.
+    CLEAR_CONTENT_BATCH_SIZE = 10_000
+
+    def __init__(
+        self,
+        database="LmdbMinerStorage.lmdb",
+        max_database_size_gb_hint=250,
+    ):
+        if lmdb is None:
+            raise ImportError(
+                "The lmdb storage backend requires the lmdb package. Install it with `pip install lmdb`."
+            )
+
+        self.database = database
+
+        # TODO Account for non-content keys when restricting total database size.
+        self.database_max_content_size_bytes = utils.gb_to_bytes(
+            max_database_size_gb_hint
+        )
+
+        # The map size is the hard upper bound of the database file, so leave room for keys and indexes.
+        self.env = lmdb.open(
+            database,
+            map_size=max(2 * self.database_max_content_size_bytes, utils.gb_to_bytes(1)),
+            max_dbs=8,
+            readahead=False,
+        )
+        # DataEntity key -> header and content.
+        self.entities_db = self.env.open_db(b"entities")
+        # uri hash -> DataEntity key.
+        self.uris_db = self.env.open_db(b"uris")
+        # Bucket key -> bucketSize, entityCount and label.
+        self.buckets_db = self.env.open_db(b"buckets")
+        # bucketSize and bucket key -> nothing, to read the largest buckets first.
+        self.bucket_sizes_db = self.env.open_db(b"bucket_sizes")
+        # datetime and DataEntity key -> nothing, to clear the oldest content first.
+        self.datetimes_db = self.env.open_db(b"datetimes")
+        # Running totals.
+        self.meta_db = self.env.open_db(b"meta")
+        # HuggingFace repo name -> HuggingFaceMetadata json.
+        self.hf_metadata_db = self.env.open_db(b"hf_metadata")
+
+        # Lock to avoid concurrency issues on clearing space when full.
+        self.clearing_space_lock = threading.Lock()
+
+        # Lock around the refresh for the index.
+        self.cached_index_refresh_lock = threading.Lock()
+
+        # Lock around the cached get miner index.
+        self.cached_index_lock = threading.Lock()
+        self.cached_index_4 = None
+        self.cached_index_updated = dt.datetime.min
+
+        # When the content size running total was last reconciled against the stored buckets.
+        self.content_size_reconciled = dt.datetime.now()
+
+        # When time buckets past the age limit were last cleared. Start at min so the first call clears them.
+        self.expired_content_cleared = dt.datetime.min
+
+    def close(self):
+        """Closes the LMDB environment."""
+        self.env.close()
+
+    def _get_content_size(self, txn) -> int:
+        """Returns the running total of stored content size in bytes."""
+        value = txn.get(_CONTENT_SIZE_KEY, db=self.meta_db)
+        return 0 if value is None else _UINT64.unpack(value)[0]
+
+    def _add_to_bucket(
+        self, txn, bucket_key: bytes, label: bytes, size_delta: int, count_delta: int
+    ):
+        """Applies a change to the totals of a bucket, keeping the bucket size index in sync.
+
+        The label is only needed when the bucket may not exist yet.
+        """
+        value = txn.get(bucket_key, db=self.buckets_db)
+        if value is None:
+            bucket_size, entity_count = 0, 0
+        else:
+            bucket_size, entity_count = _BUCKET_TOTALS.unpack_from(value)
+            label = value[_BUCKET_TOTALS.size :]
+            txn.delete(_UINT64.pack(bucket_size) + bucket_key, db=self.bucket_sizes_db)
+
+        bucket_size += size_delta
+        entity_count += count_delta
+        if entity_count <= 0:
+            txn.delete(bucket_key, db=self.buckets_db)
+        else:
+            txn.put(
+                bucket_key,
+                _BUCKET_TOTALS.pack(bucket_size, entity_count) + label,
+                db=self.buckets_db,
+            )
+            txn.put(_UINT64.pack(bucket_size) + bucket_key, b"", db=self.bucket_sizes_db)
+
+        content_size = self._get_content_size(txn) + size_delta
+        txn.put(_CONTENT_SIZE_KEY, _UINT64.pack(content_size), db=self.meta_db)
+
+    def _delete_entity(self, txn, entity_key: bytes, value: bytes) -> int:
+        """Deletes a DataEntity and its index entries, returning its content size."""
+        micros, _, content_size_bytes, _ = _ENTITY_HEADER.unpack_from(value)
+        bucket_key = entity_key[: _BUCKET_KEY.size]
+
+        txn.delete(entity_key, db=self.entities_db)
+        txn.delete(entity_key[_BUCKET_KEY.size :], db=self.uris_db)
+        txn.delete(_datetime_key(micros, entity_key), db=self.datetimes_db)
+        self._add_to_bucket(txn, bucket_key, b"", -content_size_bytes, -1)
+
+        return content_size_bytes
+
+    def reconcile_content_size(self, time_delta: dt.timedelta):
+        """Corrects any drift in the content size running total by recomputing it from the bucket totals.
+
+        Does nothing if the total was already reconciled within the provided time_delta.
+        """
+        if dt.datetime.now() - self.content_size_reconciled <= time_delta:
+            return
+
+        with self.env.begin(write=True) as txn:
+            running_content_size = self._get_content_size(txn)
+            actual_content_size = sum(
+                _BUCKET_TOTALS.unpack_from(value)[0]
+                for value in txn.cursor(db=self.buckets_db).iternext(keys=False)
+            )
+
+            if running_content_size != actual_content_size:
+                bt.logging.warning(
+                    f"Stored content size drifted from {actual_content_size} to {running_content_size} bytes. Reconciling."
+                )
+                txn.put(
+                    _CONTENT_SIZE_KEY, _UINT64.pack(actual_content_size), db=self.meta_db
+                )
+
+        self.content_size_reconciled = dt.datetime.now()
+
+    def store_data_entities(self, data_entities: List[DataEntity]):
+        """Stores any number of DataEntities, making space if necessary."""
+
+        added_content_size = 0
+        for data_entity in data_entities:
+            added_content_size += data_entity.content_size_bytes
+
+        # If the total size of the store is larger than our maximum configured stored content size then ecept.
+        if added_content_size > self.database_max_content_size_bytes:
+            raise ValueError(
+                "Content size to store: "
+                + str(added_content_size)
+                + " exceeds configured max: "
+                + str(self.database_max_content_size_bytes)
+            )
+
+        # Ensure only one thread is clearing space when necessary.
+        with self.clearing_space_lock:
+            # If we would exceed our maximum configured stored content size then clear space.
+            with self.env.begin() as txn:
+                current_content_size = self._get_content_size(txn)
+
+            if (
+                current_content_size + added_content_size
+                > self.database_max_content_size_bytes
+            ):
+                content_bytes_to_clear = (
+                    self.database_max_content_size_bytes // 10
+                    if self.database_max_content_size_bytes // 10 > added_content_size
+                    else added_content_size
+                )
+                self.clear_content_from_oldest(content_bytes_to_clear)
+
+        with self.env.begin(write=True) as txn:
+            for data_entity in data_entities:
+                label = (
+                    "NULL" if (data_entity.label is None) else data_entity.label.value
+                )
+                time_bucket_id = TimeBucket.from_datetime(data_entity.datetime).id
+                bucket_key = _bucket_key(data_entity.source, time_bucket_id, label)
+                uri = data_entity.uri.encode()
+                uri_hash = _uri_hash(data_entity.uri)
+                entity_key = bucket_key + uri_hash
+
+                # Overwrite duplicate uris (in case of updated content).
+                existing_key = txn.get(uri_hash, db=self.uris_db)
+                if existing_key is not None:
+                    self._delete_entity(
+                        txn, existing_key, txn.get(existing_key, db=self.entities_db)
+                    )
+
+                micros, utc_offset = _datetime_to_micros(data_entity.datetime)
+                txn.put(
+                    entity_key,
+                    _ENTITY_HEADER.pack(
+                        micros, utc_offset, data_entity.content_size_bytes, len(uri)
+                    )
+                    + uri
+                    + data_entity.content,
+                    db=self.entities_db,
+                )
+                txn.put(uri_hash, entity_key, db=self.uris_db)
+                txn.put(_datetime_key(micros, entity_key), b"", db=self.datetimes_db)
+                self._add_to_bucket(
+                    txn, bucket_key, label.encode(), data_entity.content_size_bytes, 1
+                )
+
+    def store_hf_dataset_info(self, hf_metadatas: List[HuggingFaceMetadata]):
+        with self.env.begin(write=True) as txn:
+            for hf_metadata in hf_metadatas:
+                txn.put(
+                    hf_metadata.repo_name.encode(),
+                    json.dumps(
+                        {
+                            "source": int(hf_metadata.source),
+                            "updated_at": hf_metadata.updated_at.isoformat(),
+                            "encoding_key": getattr(hf_metadata, "encoding_key", None),
+                        }
+                    ).encode(),
+                    db=self.hf_metadata_db,
+                )
+
+    def _list_hf_metadata(self, unique_id: str) -> List[HuggingFaceMetadata]:
+        """Returns the two most recently updated HuggingFaceMetadata for the unique_id."""
+        hf_metadatas = []
+        with self.env.begin() as txn:
+            for key, value in txn.cursor(db=self.hf_metadata_db):
+                repo_name = key.decode()
+                if not repo_name.endswith(f"_{unique_id}"):
+                    continue
+
+                metadata = json.loads(value)
+                hf_metadatas.append(
+                    HuggingFaceMetadata(
+                        repo_name=repo_name,
+                        source=metadata["source"],
+                        updated_at=dt.datetime.fromisoformat(metadata["updated_at"]),
+                        encoding_key=metadata["encoding_key"],
+                    )
+                )
+
+        hf_metadatas.sort(key=lambda hf_metadata: hf_metadata.updated_at, reverse=True)
+        return hf_metadatas[:2]
+
+    def should_upload_hf_data(self, unique_id: str) -> bool:
+        # Match the SqliteMinerStorage, which currently always allows uploads.
+        return True
+
+    def get_hf_metadata(self, unique_id: str) -> List[HuggingFaceMetadata]:
+        return self._list_hf_metadata(unique_id)
+
+    def list_data_entities_in_data_entity_bucket(
+        self, data_entity_bucket_id: DataEntityBucketId
+    ) -> List[DataEntity]:
+        """Lists from storage all DataEntities matching the provided DataEntityBucketId."""
+        label = (
+            "NULL"
+            if (data_entity_bucket_id.label is None)
+            else data_entity_bucket_id.label.value
+        )
+        bucket_key = _bucket_key(
+            data_entity_bucket_id.source, data_entity_bucket_id.time_bucket.id, label
+        )
+
+        # Every entity shares the bucket's source and label, which were validated when the entities were stored.
+        source = DataSource(data_entity_bucket_id.source)
+        data_label = data_entity_bucket_id.label
+
+        # Convert the entries into DataEntity objects and return them up to the configured max chuck size.
+        data_entities = []
+        running_size = 0
+
+        with self.env.begin() as txn:
+            cursor = txn.cursor(db=self.entities_db)
+            for value in _list_bucket_values(cursor, bucket_key):
+                # If we have already reached the max DataEntityBucket size instead return early.
+                if running_size >= constants.DATA_ENTITY_BUCKET_SIZE_LIMIT_BYTES:
+                    return data_entities
+
+                micros, utc_offset, content_size_bytes, uri_length = (
+                    _ENTITY_HEADER.unpack_from(value)
+                )
+                content_start = _ENTITY_HEADER.size + uri_length
+                data_entities.append(
+                    DataEntity.model_construct(
+                        uri=value[_ENTITY_HEADER.size : content_start].decode(),
+                        datetime=_micros_to_datetime(micros, utc_offset),
+                        source=source,
+                        content=value[content_start:],
+                        content_size_bytes=content_size_bytes,
+                        label=data_label,
+                    )
+                )
+                running_size += content_size_bytes
+
+        bt.logging.trace(
+            f"Returning {len(data_entities)} data entities for bucket {data_entity_bucket_id}"
+        )
+        return data_entities
+
+    def _list_largest_buckets(self, limit: int) -> List[Tuple[int, int, int, Optional[str]]]:
+        """Returns the size, timeBucketId, source and label of the largest buckets within the age limit."""
+        oldest_time_bucket_id = TimeBucket.from_datetime(
+            dt.datetime.now() - dt.timedelta(constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS)
+        ).id
+
+        buckets = []
+        with self.env.begin() as txn:
+            # Walk the size index from the largest bucket down.
+            for key in txn.cursor(db=self.bucket_sizes_db).iterprev(values=False):
+                if len(buckets) >= limit:
+                    break
+
+                size = _UINT64.unpack_from(key)[0]
+                bucket_key = key[_UINT64.size :]
+                source, time_bucket_id, _ = _BUCKET_KEY.unpack(bucket_key)
+                if time_bucket_id < oldest_time_bucket_id:
+                    continue
+
+                label = txn.get(bucket_key, db=self.buckets_db)[_BUCKET_TOTALS.size :].decode()
+
+                # Ensure the miner does not attempt to report more than the max DataEntityBucket size.
+                buckets.append(
+                    (
+                        min(size, constants.DATA_ENTITY_BUCKET_SIZE_LIMIT_BYTES),
+                        time_bucket_id,
+                        source,
+                        label if label != "NULL" else None,
+                    )
+                )
+
+        return buckets
+
+    def refresh_compressed_index(self, time_delta: dt.timedelta):
+        """Refreshes the compressed MinerIndex."""
+        # First check if we already have a fresh enough index, if so return immediately.
+        with self.cached_index_lock:
+            if dt.datetime.now() - self.cached_index_updated <= time_delta:
+                bt.logging.trace(
+                    f"Skipping updating cached index. It is already fresher than {time_delta}."
+                )
+                return
+            else:
+                bt.logging.info(
+                    f"Cached index out of {time_delta} freshness period. Refreshing cached index."
+                )
+
+        # Else we take the refresh lock and check again within the lock.
+        # This handles cases where multiple threads are waiting on refresh at the same time.
+        with self.cached_index_refresh_lock:
+            with self.cached_index_lock:
+                if dt.datetime.now() - self.cached_index_updated <= time_delta:
+                    bt.logging.trace(
+                        "After waiting on refresh lock the index was already refreshed."
+                    )
+                    return
+
+            buckets_by_source_by_label = defaultdict(dict)
+
+            # Always get the max for caching and truncate to each necessary size.
+            for size, time_bucket_id, source, label in self._list_largest_buckets(
+                constants.DATA_ENTITY_BUCKET_COUNT_LIMIT_PER_MINER_INDEX_PROTOCOL_4
+            ):
+                bucket = buckets_by_source_by_label[DataSource(source)].get(
+                    label, CompressedEntityBucket(label=label)
+                )
+                bucket.sizes_bytes.append(size)
+                bucket.time_bucket_ids.append(time_bucket_id)
+                buckets_by_source_by_label[DataSource(source)][label] = bucket
+
+            # Convert the buckets_by_source_by_label into a list of lists of CompressedEntityBucket and return
+            bt.logging.trace("Creating protocol 4 cached index.")
+            with self.cached_index_lock:
+                self.cached_index_4 = CompressedMinerIndex(
+                    sources={
+                        source: list(labels_to_buckets.values())
+                        for source, labels_to_buckets in buckets_by_source_by_label.items()
+                    }
+                )
+                self.cached_index_updated = dt.datetime.now()
+                bt.logging.success(
+                    f"Created cached index of {CompressedMinerIndex.size_bytes(self.cached_index_4)} bytes "
+                    + f"across {CompressedMinerIndex.bucket_count(self.cached_index_4)} buckets."
+                )
+
+    def list_contents_in_data_entity_buckets(
+        self, data_entity_bucket_ids: List[DataEntityBucketId]
+    ) -> Dict[DataEntityBucketId, List[bytes]]:
+        """Lists contents for each requested DataEntityBucketId.
+        Args:
+            data_entity_bucket_ids (List[DataEntityBucketId]): Which buckets to get contents for.
+        Returns:
+            Dict[DataEntityBucketId, List[bytes]]: Map of each bucket id to contained contents.
+        """
+        # If no bucket ids or too many bucket ids are provided return an empty dict.
+        if (
+            len(data_entity_bucket_ids) == 0
+            or len(data_entity_bucket_ids) > constants.BULK_BUCKETS_COUNT_LIMIT
+        ):
+            return defaultdict(list)
+
+        buckets_ids_to_contents = defaultdict(list)
+        running_size = 0
+        running_count = 0
+
+        with self.env.begin() as txn:
+            cursor = txn.cursor(db=self.entities_db)
+            for bucket_id in dict.fromkeys(data_entity_bucket_ids):
+                label = "NULL" if (bucket_id.label is None) else bucket_id.label.value
+                bucket_key = _bucket_key(bucket_id.source, bucket_id.time_bucket.id, label)
+
+                for value in _list_bucket_values(cursor, bucket_key):
+                    # Return early once we hit the count or size limit.
+                    if (
+                        running_count >= constants.BULK_CONTENTS_COUNT_LIMIT
+                        or running_size >= constants.BULK_CONTENTS_SIZE_LIMIT_BYTES
+                    ):
+                        return buckets_ids_to_contents
+
+                    _, _, content_size_bytes, uri_length = _ENTITY_HEADER.unpack_from(value)
+                    buckets_ids_to_contents[bucket_id].append(
+                        value[_ENTITY_HEADER.size + uri_length :]
+                    )
+                    running_size += content_size_bytes
+                    running_count += 1
+
+        return buckets_ids_to_contents
+
+    def get_compressed_index(
+        self,
+        bucket_count_limit=constants.DATA_ENTITY_BUCKET_COUNT_LIMIT_PER_MINER_INDEX_PROTOCOL_4,
+    ) -> CompressedMinerIndex:
+        """Gets the compressed MinerIndex, which is a summary of all of the DataEntities that this MinerStorage is currently serving."""
+
+        # Force refresh index if 10 minutes beyond refersh period. Expected to be refreshed earlier by refresh loop.
+        self.refresh_compressed_index(
+            time_delta=(constants.MINER_CACHE_FRESHNESS + dt.timedelta(minutes=10))
+        )
+
+        with self.cached_index_lock:
+            # Only protocol 4 is supported at this time.
+            return self.cached_index_4
+
+    def clear_content_from_oldest(self, content_bytes_to_clear: int):
+        """Deletes entries starting from the oldest until we have cleared the specified amount of content."""
+
+        bt.logging.debug(f"Database full. Clearing {content_bytes_to_clear} bytes.")
+
+        cleared_bytes = 0
+        while cleared_bytes < content_bytes_to_clear:
+            # Keep each write transaction small so readers see freed space promptly.
+            with self.env.begin(write=True) as txn:
+                cursor = txn.cursor(db=self.datetimes_db)
+                batch_keys = []
+                for key in cursor.iternext(values=False):
+                    if len(batch_keys) >= self.CLEAR_CONTENT_BATCH_SIZE:
+                        break
+                    batch_keys.append(key)
+
+                if not batch_keys:
+                    return
+
+                for key in batch_keys:
+                    entity_key = key[_UINT64.size :]
+                    cleared_bytes += self._delete_entity(
+                        txn, entity_key, txn.get(entity_key, db=self.entities_db)
+                    )
+                    if cleared_bytes >= content_bytes_to_clear:
+                        break
+
+    def clear_expired_content(self, time_delta: dt.timedelta):
+        """Deletes every time bucket older than DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS, since validators no longer score it.
+
+        Does nothing if expired content was already cleared within the provided time_delta.
+        """
+        if dt.datetime.now() - self.expired_content_cleared <= time_delta:
+            return
+
+        oldest_time_bucket_id = TimeBucket.from_datetime(
+            dt.datetime.now() - dt.timedelta(constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS)
+        ).id
+
+        # Entities are keyed by source and then timeBucketId, so each expired range is contiguous within a source.
+        cleared_count = 0
+        for source in DataSource:
+            start_key = _BUCKET_KEY.pack(source, 0, bytes(_LABEL_HASH_SIZE))
+            end_key = _BUCKET_KEY.pack(source, oldest_time_bucket_id, bytes(_LABEL_HASH_SIZE))
+
+            while True:
+                # Keep each write transaction small so readers see freed space promptly.
+                with self.env.begin(write=True) as txn:
+                    cursor = txn.cursor(db=self.entities_db)
+                    batch = []
+                    if cursor.set_range(start_key):
+                        for key, value in cursor:
+                            if key >= end_key or len(batch) >= self.CLEAR_CONTENT_BATCH_SIZE:
+                                break
+                            batch.append((key, value))
+
+                    for key, value in batch:
+                        self._delete_entity(txn, key, value)
+
+                cleared_count += len(batch)
+                if len(batch) < self.CLEAR_CONTENT_BATCH_SIZE:
+                    break
+
+        if cleared_count:
+            bt.logging.info(
+                f"Cleared {cleared_count} entities older than {constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS} days."
+            )
+        self.expired_content_cleared = dt.datetime.now()
+
+    def list_data_entity_buckets(self) -> List[DataEntityBucket]:
+        """Lists all DataEntityBuckets for all the DataEntities that this MinerStorage is currently serving."""
+        return [
+            DataEntityBucket(
+                id=DataEntityBucketId(
+                    time_bucket=TimeBucket(id=time_bucket_id),
+                    source=DataSource(source),
+                    label=DataLabel(value=label) if label is not None else None,
+                ),
+                size_bytes=size,
+            )
+            for size, time_bucket_id, source, label in self._list_largest_buckets(
+                constants.DATA_ENTITY_BUCKET_COUNT_LIMIT_PER_MINER_INDEX
+            )
+        ]
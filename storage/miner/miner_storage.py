@@ -44,3 +44,19 @@ class MinerStorage(ABC):
             Dict[DataEntityBucketId, List[bytes]]: Map of each bucket id to contained contents.
         """
         raise NotImplemented
+
+    @abstractmethod
+    def reconcile_content_size(self, time_delta: dt.timedelta):
+        """Corrects any drift in the running content size total used for capacity checks.
+
+        Does nothing if the total was already reconciled within the provided time_delta.
+        """
+        raise NotImplemented
+
+    @abstractmethod
+    def clear_expired_content(self, time_delta: dt.timedelta):
+        """Clears all content older than DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS, since validators no longer score it.
+
+        Does nothing if expired content was already cleared within the provided time_delta.
+        """
+        raise NotImplemented
@@ -12,9 +12,21 @@ from common.data import (
     TimeBucket,
     HuggingFaceMetadata,
 )
+from storage.miner.content_compression import (
+    COMPRESSED_CONTENT_MAGIC_SQL,
+    MAX_DICTIONARY_SIZE_BYTES,
+    NO_DICTIONARY_ID,
+    compress_content,
+    decompress_content,
+    is_compressed,
+    load_dictionaries,
+    train_dictionary,
+)
+from storage.miner.keyword_index import KEYWORD_FIELDS_BY_SOURCE, extract_keyword_text
 from storage.miner.miner_storage import MinerStorage
 from typing import Dict, List
 import datetime as dt
+import pathlib
 import sqlite3
 import contextlib
 import bittensor as bt
@@ -59,9 +71,13 @@ def tz_aware_timestamp_adapter(val):
 class SqliteMinerStorage(MinerStorage):
     """Sqlite backed MinerStorage"""
 
+    # DataEntities are stored in one table per partition of PARTITION_TIME_BUCKETS consecutive time buckets, named
+    # DataEntity_<partition id>, so that old content can be cleared by dropping whole tables instead of deleting rows.
+    PARTITION_TIME_BUCKETS = 24 * 7
+
     # TODO Consider CHECK expression to limit source to expected ENUM values.
     # Sqlite type converters handle the mapping from Python datetime to Timestamp.
-    DATA_ENTITY_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS DataEntity (
+    DATA_ENTITY_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS DataEntity_{partition_id} (
                                 uri                 TEXT            PRIMARY KEY,
                                 datetime            TIMESTAMP(6)    NOT NULL,
                                 timeBucketId        INTEGER         NOT NULL,
@@ -71,10 +87,163 @@ class SqliteMinerStorage(MinerStorage):
                                 contentSizeBytes    INTEGER         NOT NULL
                                 ) WITHOUT ROWID"""
 
-    DELETE_OLD_INDEX = """DROP INDEX IF EXISTS data_entity_bucket_index"""
+    DATA_ENTITY_TABLE_INDEX = """CREATE INDEX IF NOT EXISTS data_entity_bucket_index_{partition_id}
+                                ON DataEntity_{partition_id} (timeBucketId, source, label, contentSizeBytes)"""
+
+    # Lets the uploaders page through a source in (datetime, uri) order without sorting. The uri primary key
+    # is implicitly the last column of the index.
+    DATA_ENTITY_DATETIME_INDEX = """CREATE INDEX IF NOT EXISTS data_entity_source_datetime_index_{partition_id}
+                                ON DataEntity_{partition_id} (source, datetime)"""
+
+    # Every partition, with the running total of its stored content kept up to date by the triggers below so that
+    # the capacity check on every store does not need to sum the DataEntities.
+    # contentSizeBytes is the logical size of the content while storedSizeBytes counts compressed rows by their
+    # compressed length, so that compressing content frees up space for more of it.
+    DATA_ENTITY_PARTITION_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS DataEntityPartition (
+                                id                  INTEGER         PRIMARY KEY,
+                                contentSizeBytes    INTEGER         NOT NULL DEFAULT 0,
+                                storedSizeBytes     INTEGER         NOT NULL DEFAULT 0
+                                )"""
+
+    # Pre-aggregated size of every DataEntityBucket, kept up to date by the triggers below so that index
+    # refreshes never need to scan the DataEntities.
+    BUCKET_SUMMARY_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS BucketSummary (
+                                timeBucketId        INTEGER         NOT NULL,
+                                source              INTEGER         NOT NULL,
+                                label               CHAR(32)        NOT NULL,
+                                bucketSize          INTEGER         NOT NULL,
+                                entityCount         INTEGER         NOT NULL,
+                                PRIMARY KEY(timeBucketId, source, label)
+                                ) WITHOUT ROWID"""
 
-    DATA_ENTITY_TABLE_INDEX = """CREATE INDEX IF NOT EXISTS data_entity_bucket_index2
-                                ON DataEntity (timeBucketId, source, label, contentSizeBytes)"""
+    BUCKET_SUMMARY_INSERT_TRIGGER = """CREATE TRIGGER IF NOT EXISTS bucket_summary_insert_{partition_id}
+                                AFTER INSERT ON DataEntity_{partition_id}
+                                BEGIN
+                                    INSERT INTO BucketSummary (timeBucketId, source, label, bucketSize, entityCount)
+                                    VALUES (NEW.timeBucketId, NEW.source, IFNULL(NEW.label, 'NULL'), NEW.contentSizeBytes, 1)
+                                    ON CONFLICT (timeBucketId, source, label) DO UPDATE SET
+                                        bucketSize = bucketSize + excluded.bucketSize,
+                                        entityCount = entityCount + 1;
+                                END"""
+
+    BUCKET_SUMMARY_DELETE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS bucket_summary_delete_{partition_id}
+                                AFTER DELETE ON DataEntity_{partition_id}
+                                BEGIN
+                                    UPDATE BucketSummary
+                                    SET bucketSize = bucketSize - OLD.contentSizeBytes, entityCount = entityCount - 1
+                                    WHERE timeBucketId = OLD.timeBucketId AND source = OLD.source
+                                        AND label = IFNULL(OLD.label, 'NULL');
+                                    DELETE FROM BucketSummary
+                                    WHERE timeBucketId = OLD.timeBucketId AND source = OLD.source
+                                        AND label = IFNULL(OLD.label, 'NULL') AND entityCount <= 0;
+                                END"""
+
+    BUCKET_SUMMARY_UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS bucket_summary_update_{partition_id}
+                                AFTER UPDATE OF timeBucketId, source, label, contentSizeBytes ON DataEntity_{partition_id}
+                                BEGIN
+                                    UPDATE BucketSummary
+                                    SET bucketSize = bucketSize - OLD.contentSizeBytes, entityCount = entityCount - 1
+                                    WHERE timeBucketId = OLD.timeBucketId AND source = OLD.source
+                                        AND label = IFNULL(OLD.label, 'NULL');
+                                    DELETE FROM BucketSummary
+                                    WHERE timeBucketId = OLD.timeBucketId AND source = OLD.source
+                                        AND label = IFNULL(OLD.label, 'NULL') AND entityCount <= 0;
+                                    INSERT INTO BucketSummary (timeBucketId, source, label, bucketSize, entityCount)
+                                    VALUES (NEW.timeBucketId, NEW.source, IFNULL(NEW.label, 'NULL'), NEW.contentSizeBytes, 1)
+                                    ON CONFLICT (timeBucketId, source, label) DO UPDATE SET
+                                        bucketSize = bucketSize + excluded.bucketSize,
+                                        entityCount = entityCount + 1;
+                                END"""
+
+    # Only run when the BucketSummary table is first created, to summarize any pre-existing DataEntities.
+    BUCKET_SUMMARY_BACKFILL = """INSERT INTO BucketSummary (timeBucketId, source, label, bucketSize, entityCount)
+                                SELECT timeBucketId, source, IFNULL(label, 'NULL'), SUM(contentSizeBytes), COUNT(*)
+                                FROM DataEntity
+                                GROUP BY timeBucketId, source, IFNULL(label, 'NULL')"""
+
+    CONTENT_SIZE_INSERT_TRIGGER = f"""CREATE TRIGGER IF NOT EXISTS content_size_insert_{{partition_id}}
+                                AFTER INSERT ON DataEntity_{{partition_id}}
+                                BEGIN
+                                    UPDATE DataEntityPartition SET contentSizeBytes = contentSizeBytes + NEW.contentSizeBytes,
+                                        storedSizeBytes = storedSizeBytes + CASE
+                                            WHEN substr(NEW.content, 1, 4) = {COMPRESSED_CONTENT_MAGIC_SQL}
+                                            THEN length(NEW.content) ELSE NEW.contentSizeBytes END
+                                    WHERE id = {{partition_id}};
+                                END"""
+
+    CONTENT_SIZE_DELETE_TRIGGER = f"""CREATE TRIGGER IF NOT EXISTS content_size_delete_{{partition_id}}
+                                AFTER DELETE ON DataEntity_{{partition_id}}
+                                BEGIN
+                                    UPDATE DataEntityPartition SET contentSizeBytes = contentSizeBytes - OLD.contentSizeBytes,
+                                        storedSizeBytes = storedSizeBytes - CASE
+                                            WHEN substr(OLD.content, 1, 4) = {COMPRESSED_CONTENT_MAGIC_SQL}
+                                            THEN length(OLD.content) ELSE OLD.contentSizeBytes END
+                                    WHERE id = {{partition_id}};
+                                END"""
+
+    CONTENT_SIZE_UPDATE_TRIGGER = f"""CREATE TRIGGER IF NOT EXISTS content_size_update_{{partition_id}}
+                                AFTER UPDATE OF content, contentSizeBytes ON DataEntity_{{partition_id}}
+                                BEGIN
+                                    UPDATE DataEntityPartition
+                                    SET contentSizeBytes = contentSizeBytes - OLD.contentSizeBytes + NEW.contentSizeBytes,
+                                        storedSizeBytes = storedSizeBytes - CASE
+                                            WHEN substr(OLD.content, 1, 4) = {COMPRESSED_CONTENT_MAGIC_SQL}
+                                            THEN length(OLD.content) ELSE OLD.contentSizeBytes END + CASE
+                                            WHEN substr(NEW.content, 1, 4) = {COMPRESSED_CONTENT_MAGIC_SQL}
+                                            THEN length(NEW.content) ELSE NEW.contentSizeBytes END
+                                    WHERE id = {{partition_id}};
+                                END"""
+
+    # Shared zlib dictionaries used to compress content, trained once per DataSource.
+    CONTENT_DICTIONARY_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS ContentDictionary (
+                                id                  INTEGER         PRIMARY KEY,
+                                source              INTEGER         NOT NULL,
+                                dictionary          BLOB            NOT NULL
+                                )"""
+
+    # Searchable text of every DataEntity of a partition from a source with keyword fields, indexed by
+    # DataEntityTextIndex_<partition id>. The keyword index is partitioned with the DataEntities so it is dropped with them.
+    KEYWORD_TEXT_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS DataEntityText_{partition_id} (
+                                id                  INTEGER         PRIMARY KEY,
+                                uri                 TEXT            NOT NULL UNIQUE,
+                                source              INTEGER         NOT NULL,
+                                datetime            TIMESTAMP(6)    NOT NULL,
+                                text                TEXT            NOT NULL
+                                )"""
+
+    # Trigram full-text index over DataEntityText, so LIKE '%keyword%' searches use the index.
+    KEYWORD_INDEX_CREATE = """CREATE VIRTUAL TABLE IF NOT EXISTS DataEntityTextIndex_{partition_id} USING fts5(
+                                text, content='DataEntityText_{partition_id}', content_rowid='id', tokenize='trigram'
+                                )"""
+
+    # Keep the full-text index in sync with its external content table.
+    KEYWORD_TEXT_INSERT_TRIGGER = """CREATE TRIGGER IF NOT EXISTS data_entity_text_insert_{partition_id}
+                                AFTER INSERT ON DataEntityText_{partition_id}
+                                BEGIN
+                                    INSERT INTO DataEntityTextIndex_{partition_id} (rowid, text) VALUES (NEW.id, NEW.text);
+                                END"""
+
+    KEYWORD_TEXT_DELETE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS data_entity_text_delete_{partition_id}
+                                AFTER DELETE ON DataEntityText_{partition_id}
+                                BEGIN
+                                    INSERT INTO DataEntityTextIndex_{partition_id} (DataEntityTextIndex_{partition_id}, rowid, text)
+                                        VALUES ('delete', OLD.id, OLD.text);
+                                END"""
+
+    KEYWORD_TEXT_UPDATE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS data_entity_text_update_{partition_id}
+                                AFTER UPDATE OF text ON DataEntityText_{partition_id}
+                                BEGIN
+                                    INSERT INTO DataEntityTextIndex_{partition_id} (DataEntityTextIndex_{partition_id}, rowid, text)
+                                        VALUES ('delete', OLD.id, OLD.text);
+                                    INSERT INTO DataEntityTextIndex_{partition_id} (rowid, text) VALUES (NEW.id, NEW.text);
+                                END"""
+
+    # Drop the text of DataEntities as they are deleted from a partition that is kept.
+    KEYWORD_DATA_ENTITY_DELETE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS data_entity_keyword_delete_{partition_id}
+                                AFTER DELETE ON DataEntity_{partition_id}
+                                BEGIN
+                                    DELETE FROM DataEntityText_{partition_id} WHERE uri = OLD.uri;
+                                END"""
 
     HF_METADATA_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS HFMetaData (
                                 uri                 TEXT            PRIMARY KEY,
@@ -83,36 +252,54 @@ class SqliteMinerStorage(MinerStorage):
                                 encodingKey         TEXT
                                 ) WITHOUT ROWID"""
 
+    # How many DataEntities to delete per write transaction when clearing space within a partition.
+    CLEAR_CONTENT_BATCH_SIZE = 10_000
+
+    # How many idle connections to keep open for reuse across calls.
+    CONNECTION_POOL_SIZE = 8
+
     def __init__(
         self,
         database="SqliteMinerStorage.sqlite",
         max_database_size_gb_hint=250,
+        compress_content=False,
+        index_keywords=False,
     ):
         sqlite3.register_converter("timestamp", tz_aware_timestamp_adapter)
         self.database = database
 
+        # Pools of idle read-write and read-only connections reused across calls.
+        self.connection_pool_lock = threading.Lock()
+        self.idle_connections = []
+        self.idle_read_only_connections = []
+
         # TODO Account for non-content columns when restricting total database size.
         self.database_max_content_size_bytes = utils.gb_to_bytes(
             max_database_size_gb_hint
         )
 
+        # Whether to maintain the full-text keyword index used by the S3 uploader's keyword jobs.
+        self.index_keywords = index_keywords
+
         with contextlib.closing(self._create_connection()) as connection:
             cursor = connection.cursor()
 
-            # Create the DataEntity table (if it does not already exist).
-            cursor.execute(SqliteMinerStorage.DATA_ENTITY_TABLE_CREATE)
-
-            # Delete the old index (if it exists).
-            cursor.execute(SqliteMinerStorage.DELETE_OLD_INDEX)
-
-            # Create the Index (if it does not already exist).
-            cursor.execute(SqliteMinerStorage.DATA_ENTITY_TABLE_INDEX)
+            # Create the table of DataEntity partitions (if it does not already exist).
+            cursor.execute(SqliteMinerStorage.DATA_ENTITY_PARTITION_TABLE_CREATE)
 
             # Create the huggingface table to store HF Info
             cursor.execute(SqliteMinerStorage.HF_METADATA_TABLE_CREATE)
+
+            # Create the table of content compression dictionaries.
+            cursor.execute(SqliteMinerStorage.CONTENT_DICTIONARY_TABLE_CREATE)
             # Use Write Ahead Logging to avoid blocking reads.
-            cursor.execute("pragma journal_mode=wal")
+            # Consume the result so the pragma statement does not keep holding a lock after close.
+            cursor.execute("pragma journal_mode=wal").fetchone()
 
+        # Move the DataEntities of miners who created the database in previous versions into partitions.
+        self._partition_data_entity_table()
+        # Create and populate the BucketSummary for miners who created the database in previous versions.
+        self._ensure_bucket_summary()
         # Update the HFMetaData for miners who created this table in previous versions
         self._ensure_hf_metadata_schema()
         # Lock to avoid concurrency issues on clearing space when full.
@@ -126,21 +313,520 @@ class SqliteMinerStorage(MinerStorage):
         self.cached_index_4 = None
         self.cached_index_updated = dt.datetime.min
 
+        # When the running content size totals were last reconciled against the DataEntities.
+        self.content_size_reconciled = dt.datetime.now()
+
+        # When time buckets past the age limit were last cleared. Start at min so the first call clears them.
+        self.expired_content_cleared = dt.datetime.min
+
+        # Whether to compress newly stored content. Previously compressed content is always readable.
+        self.compress_content = compress_content
+
+        # Lock around the content dictionaries and the samples used to train new ones.
+        self.content_dictionary_lock = threading.Lock()
+        self.content_dictionary_samples = defaultdict(list)
+        # Total size of the samples of each source, to avoid summing them on every stored entity.
+        self.content_dictionary_sample_bytes = defaultdict(int)
+        self._load_content_dictionaries()
+
+        self._ensure_keyword_index()
+
     def _create_connection(self):
         # Create the database if it doesn't exist, defaulting to the local directory.
         # Use PARSE_DECLTYPES to convert accessed values into the appropriate type.
+        # Connections may be handed between threads by the pool, which ensures only one thread uses each at a time.
         connection = sqlite3.connect(
-            self.database, detect_types=sqlite3.PARSE_DECLTYPES, timeout=60.0
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=60.0,
+            check_same_thread=False,
         )
         # Allow this connection to parse results from returned rows by column name.
         connection.row_factory = sqlite3.Row
+        # Ensure the BucketSummary delete trigger also fires for rows removed by REPLACE.
+        connection.execute("pragma recursive_triggers = ON")
+        # Tune the connection for a large WAL database. NORMAL synchronous is durable across crashes in WAL mode.
+        connection.execute("pragma synchronous = NORMAL")
+        connection.execute("pragma temp_store = MEMORY")
+        connection.execute("pragma cache_size = -65536")  # 64 MB
+        connection.execute("pragma mmap_size = 268435456")  # 256 MB
 
         return connection
 
-    def _ensure_hf_metadata_schema(self):
+    def _create_read_only_connection(self):
+        # Open the database read-only so serving queries can never take the write lock.
+        connection = sqlite3.connect(
+            pathlib.Path(self.database).absolute().as_uri() + "?mode=ro",
+            uri=True,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=60.0,
+            check_same_thread=False,
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("pragma temp_store = MEMORY")
+        # Read content blobs straight from the mapped file instead of copying them through the page cache.
+        connection.execute("pragma mmap_size = 1073741824")  # 1 GB
+
+        return connection
+
+    @contextlib.contextmanager
+    def _pooled_connection(self, read_only: bool = False):
+        """Yields a connection from the pool, creating one if none are idle.
+
+        Reusing connections keeps their page cache and prepared statement cache warm across calls.
+        """
+        idle_connections = (
+            self.idle_read_only_connections if read_only else self.idle_connections
+        )
+
+        connection = None
+        with self.connection_pool_lock:
+            if idle_connections:
+                connection = idle_connections.pop()
+
+        if connection is None:
+            connection = (
+                self._create_read_only_connection()
+                if read_only
+                else self._create_connection()
+            )
+
+        try:
+            yield connection
+        finally:
+            # Never hand out a connection with a transaction left open by a failed call.
+            if connection.in_transaction:
+                connection.rollback()
+
+            with self.connection_pool_lock:
+                if len(idle_connections) < self.CONNECTION_POOL_SIZE:
+                    idle_connections.append(connection)
+                    connection = None
+
+            if connection is not None:
+                connection.close()
+
+    def close(self):
+        """Closes all idle pooled connections."""
+        with self.connection_pool_lock:
+            idle_connections = self.idle_connections + self.idle_read_only_connections
+            self.idle_connections = []
+            self.idle_read_only_connections = []
+
+        for connection in idle_connections:
+            connection.close()
+
+    @staticmethod
+    def _get_partition_id(time_bucket_id: int) -> int:
+        """Returns the id of the partition that stores the time bucket."""
+        return time_bucket_id // SqliteMinerStorage.PARTITION_TIME_BUCKETS
+
+    def _get_partition_ids(self, cursor: sqlite3.Cursor) -> List[int]:
+        """Returns the ids of every partition, oldest first."""
+        cursor.execute("SELECT id FROM DataEntityPartition ORDER BY id ASC")
+        return [row[0] for row in cursor.fetchall()]
+
+    def _create_partition(self, cursor: sqlite3.Cursor, partition_id: int):
+        """Creates the table of a partition with its indexes and triggers, within the caller's write transaction."""
+        for statement in (
+            SqliteMinerStorage.DATA_ENTITY_TABLE_CREATE,
+            SqliteMinerStorage.DATA_ENTITY_TABLE_INDEX,
+            SqliteMinerStorage.DATA_ENTITY_DATETIME_INDEX,
+            SqliteMinerStorage.BUCKET_SUMMARY_INSERT_TRIGGER,
+            SqliteMinerStorage.BUCKET_SUMMARY_DELETE_TRIGGER,
+            SqliteMinerStorage.BUCKET_SUMMARY_UPDATE_TRIGGER,
+            SqliteMinerStorage.CONTENT_SIZE_INSERT_TRIGGER,
+            SqliteMinerStorage.CONTENT_SIZE_DELETE_TRIGGER,
+            SqliteMinerStorage.CONTENT_SIZE_UPDATE_TRIGGER,
+        ):
+            cursor.execute(statement.format(partition_id=partition_id))
+        cursor.execute(
+            "INSERT OR IGNORE INTO DataEntityPartition (id) VALUES (?)", [partition_id]
+        )
+
+    def _create_keyword_partition(self, cursor: sqlite3.Cursor, partition_id: int) -> bool:
+        """Creates the keyword index of a partition from its DataEntities, within the caller's write transaction.
+
+        Returns whether the index was created, as opposed to already existing.
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            [f"DataEntityText_{partition_id}"],
+        )
+        if cursor.fetchone() is not None:
+            return False
+
+        for statement in (
+            SqliteMinerStorage.KEYWORD_TEXT_TABLE_CREATE,
+            SqliteMinerStorage.KEYWORD_INDEX_CREATE,
+            SqliteMinerStorage.KEYWORD_TEXT_INSERT_TRIGGER,
+            SqliteMinerStorage.KEYWORD_TEXT_DELETE_TRIGGER,
+            SqliteMinerStorage.KEYWORD_TEXT_UPDATE_TRIGGER,
+            SqliteMinerStorage.KEYWORD_DATA_ENTITY_DELETE_TRIGGER,
+        ):
+            cursor.execute(statement.format(partition_id=partition_id))
+
+        cursor.connection.create_function(
+            "keyword_text",
+            2,
+            lambda source, content: extract_keyword_text(
+                source, self._decompress_content(content)
+            ),
+        )
+        # Copy the stored datetime text as is, so it compares exactly with DataEntity.datetime.
+        cursor.execute(
+            f"""INSERT INTO DataEntityText_{partition_id} (uri, source, datetime, text)
+                    SELECT uri, source, datetime, keyword_text(source, content) FROM DataEntity_{partition_id}
+                    WHERE source IN ({",".join(str(int(source)) for source in KEYWORD_FIELDS_BY_SOURCE)})"""
+        )
+        return True
+
+    def _create_views(self, cursor: sqlite3.Cursor):
+        """Recreates the views over every partition, within the caller's write transaction.
+
+        DataEntity is the union of every partition, for the uploaders and other readers that query the DataEntities
+        as one table. SQLite merges the partitions of ordered reads through their indexes rather than sorting them.
+        """
+        partition_ids = self._get_partition_ids(cursor)
+
+        cursor.execute("DROP VIEW IF EXISTS DataEntity")
+        cursor.execute(
+            "CREATE VIEW DataEntity AS "
+            + (
+                " UNION ALL ".join(
+                    f"SELECT * FROM DataEntity_{partition_id}" for partition_id in partition_ids
+                )
+                or """SELECT NULL AS uri, NULL AS datetime, NULL AS timeBucketId, NULL AS source, NULL AS label,
+                        NULL AS content, NULL AS contentSizeBytes WHERE 0"""
+            )
+        )
+        if partition_ids:
+            # Let DataEntities be deleted through the view, from whichever partition holds them.
+            cursor.execute(
+                f"""CREATE TRIGGER data_entity_delete INSTEAD OF DELETE ON DataEntity
+                        BEGIN
+                            {" ".join(f"DELETE FROM DataEntity_{partition_id} WHERE uri = OLD.uri;" for partition_id in partition_ids)}
+                        END"""
+            )
+
+        cursor.execute("DROP VIEW IF EXISTS DataEntityText")
+        cursor.execute("DROP VIEW IF EXISTS DataEntityTextIndex")
+        if not self.index_keywords:
+            return
+
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'DataEntityText\\_%' ESCAPE '\\'"
+        )
+        keyword_partition_ids = sorted(int(row[0].split("_")[1]) for row in cursor.fetchall())
+        cursor.execute(
+            "CREATE VIEW DataEntityText AS "
+            + (
+                " UNION ALL ".join(
+                    f"SELECT uri, source, datetime, text FROM DataEntityText_{partition_id}"
+                    for partition_id in keyword_partition_ids
+                )
+                or "SELECT NULL AS uri, NULL AS source, NULL AS datetime, NULL AS text WHERE 0"
+            )
+        )
+        # Keyword searches MATCH the text column of this view, which SQLite pushes down to each partition's index.
+        cursor.execute(
+            "CREATE VIEW DataEntityTextIndex AS "
+            + (
+                " UNION ALL ".join(
+                    f"""SELECT t.uri AS uri, f.text AS text FROM DataEntityTextIndex_{partition_id} f
+                            JOIN DataEntityText_{partition_id} t ON t.id = f.rowid"""
+                    for partition_id in keyword_partition_ids
+                )
+                or "SELECT NULL AS uri, NULL AS text WHERE 0"
+            )
+        )
+
+    def _drop_partitions(self, connection: sqlite3.Connection, partition_ids: List[int]):
+        """Drops the partitions in a single write transaction.
+
+        Dropping a table fires no triggers, so the partitions' BucketSummary rows are removed as time bucket ranges,
+        and their running content size totals go with their DataEntityPartition rows.
+        """
+        if not partition_ids:
+            return
+
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for partition_id in set(partition_ids) & set(self._get_partition_ids(cursor)):
+            cursor.execute(
+                "DELETE FROM BucketSummary WHERE timeBucketId >= ? AND timeBucketId < ?",
+                [
+                    partition_id * self.PARTITION_TIME_BUCKETS,
+                    (partition_id + 1) * self.PARTITION_TIME_BUCKETS,
+                ],
+            )
+            cursor.execute("DELETE FROM DataEntityPartition WHERE id = ?", [partition_id])
+            cursor.execute(f"DROP TABLE IF EXISTS DataEntityTextIndex_{partition_id}")
+            cursor.execute(f"DROP TABLE IF EXISTS DataEntityText_{partition_id}")
+            cursor.execute(f"DROP TABLE DataEntity_{partition_id}")
+        self._create_views(cursor)
+        connection.commit()
+
+    def _partition_data_entity_table(self):
+        """Moves the DataEntities of a database created before partitioning into partitions.
+
+        Each partition is moved in its own write transaction, so an interrupted move carries on at the next startup.
+        """
+        with contextlib.closing(self._create_connection()) as connection:
+            cursor = connection.cursor()
+
+            cursor.execute("SELECT type FROM sqlite_master WHERE name = 'DataEntity'")
+            row = cursor.fetchone()
+            if row is not None and row["type"] == "table":
+                bt.logging.info("Partitioning the DataEntity table.")
+                cursor.execute("BEGIN IMMEDIATE")
+                # The running totals and keyword index are rebuilt from the DataEntities as they are moved.
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'DataEntity'"
+                )
+                for trigger in [row["name"] for row in cursor.fetchall()]:
+                    cursor.execute(f"DROP TRIGGER {trigger}")
+                cursor.execute("DROP TABLE IF EXISTS ContentSize")
+                cursor.execute("DROP TABLE IF EXISTS DataEntityTextIndex")
+                cursor.execute("DROP TABLE IF EXISTS DataEntityText")
+                cursor.execute("DROP TABLE IF EXISTS BucketSummary")
+                cursor.execute(SqliteMinerStorage.BUCKET_SUMMARY_TABLE_CREATE)
+                cursor.execute("ALTER TABLE DataEntity RENAME TO UnpartitionedDataEntity")
+                connection.commit()
+
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'UnpartitionedDataEntity'"
+            )
+            if cursor.fetchone() is None:
+                return
+
+            while True:
+                cursor.execute("SELECT MIN(timeBucketId) FROM UnpartitionedDataEntity")
+                oldest_time_bucket_id = cursor.fetchone()[0]
+                if oldest_time_bucket_id is None:
+                    break
+
+                partition_id = self._get_partition_id(oldest_time_bucket_id)
+                time_bucket_range = [
+                    partition_id * self.PARTITION_TIME_BUCKETS,
+                    (partition_id + 1) * self.PARTITION_TIME_BUCKETS,
+                ]
+                cursor.execute("BEGIN IMMEDIATE")
+                self._create_partition(cursor, partition_id)
+                cursor.execute(
+                    f"""INSERT INTO DataEntity_{partition_id}
+                            SELECT * FROM UnpartitionedDataEntity WHERE timeBucketId >= ? AND timeBucketId < ?""",
+                    time_bucket_range,
+                )
+                cursor.execute(
+                    "DELETE FROM UnpartitionedDataEntity WHERE timeBucketId >= ? AND timeBucketId < ?",
+                    time_bucket_range,
+                )
+                connection.commit()
+
+            cursor.execute("DROP TABLE UnpartitionedDataEntity")
+            connection.commit()
+            bt.logging.info("Finished partitioning the DataEntity table.")
+
+    def _ensure_bucket_summary(self):
         with contextlib.closing(self._create_connection()) as connection:
             cursor = connection.cursor()
 
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'BucketSummary'"
+            )
+            summary_exists = cursor.fetchone() is not None
+
+            # Create the table and backfill in one transaction so no concurrent write is missed.
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(SqliteMinerStorage.BUCKET_SUMMARY_TABLE_CREATE)
+            self._create_views(cursor)
+
+            if not summary_exists:
+                bt.logging.info("Creating BucketSummary table from existing DataEntities.")
+                cursor.execute(SqliteMinerStorage.BUCKET_SUMMARY_BACKFILL)
+
+            connection.commit()
+
+    def _ensure_keyword_index(self):
+        with contextlib.closing(self._create_connection()) as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'view' AND name = 'DataEntityText'"
+            )
+            index_exists = cursor.fetchone() is not None
+
+            # Create or drop the index of every partition in one transaction so readers never see a partial index.
+            cursor.execute("BEGIN IMMEDIATE")
+            partition_ids = self._get_partition_ids(cursor)
+
+            if not self.index_keywords:
+                if index_exists:
+                    # Drop the index rather than let it go stale, so readers fall back to scanning content.
+                    bt.logging.info("Dropping the keyword index.")
+                for partition_id in partition_ids:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS data_entity_keyword_delete_{partition_id}")
+                    cursor.execute(f"DROP TABLE IF EXISTS DataEntityTextIndex_{partition_id}")
+                    cursor.execute(f"DROP TABLE IF EXISTS DataEntityText_{partition_id}")
+            else:
+                if not index_exists:
+                    bt.logging.info("Creating the keyword index from existing DataEntities.")
+                for partition_id in partition_ids:
+                    self._create_keyword_partition(cursor, partition_id)
+
+            self._create_views(cursor)
+            connection.commit()
+
+    def _store_keyword_texts(
+        self, cursor: sqlite3.Cursor, partition_id: int, data_entities: List[DataEntity]
+    ):
+        """Upserts the searchable text of the DataEntities of a partition into its keyword index."""
+        values = []
+        for data_entity in data_entities:
+            text = extract_keyword_text(data_entity.source, data_entity.content)
+            if text is not None:
+                values.append([data_entity.uri, data_entity.source, data_entity.datetime, text])
+
+        cursor.executemany(
+            f"""INSERT INTO DataEntityText_{partition_id} (uri, source, datetime, text) VALUES (?,?,?,?)
+                ON CONFLICT (uri) DO UPDATE SET
+                    source = excluded.source,
+                    datetime = excluded.datetime,
+                    text = excluded.text""",
+            values,
+        )
+
+    def _get_content_size(self, cursor: sqlite3.Cursor) -> int:
+        """Returns the running total of stored content size in bytes."""
+        cursor.execute("SELECT IFNULL(SUM(contentSizeBytes), 0) FROM DataEntityPartition")
+        return cursor.fetchone()[0]
+
+    def _get_stored_content_size(self, cursor: sqlite3.Cursor) -> int:
+        """Returns the running total of stored content size in bytes, counting compressed content by its compressed size."""
+        cursor.execute("SELECT IFNULL(SUM(storedSizeBytes), 0) FROM DataEntityPartition")
+        return cursor.fetchone()[0]
+
+    def _load_content_dictionaries(self):
+        """Reloads the cached content dictionaries and the newest dictionary id for each DataSource."""
+        with self._pooled_connection() as connection:
+            dictionaries = load_dictionaries(connection)
+            cursor = connection.cursor()
+            cursor.execute("SELECT source, MAX(id) AS id FROM ContentDictionary GROUP BY source")
+            dictionary_ids_by_source = {row["source"]: row["id"] for row in cursor}
+
+        with self.content_dictionary_lock:
+            self.content_dictionaries = dictionaries
+            self.content_dictionary_ids_by_source = dictionary_ids_by_source
+
+    def _get_content_dictionary(self, connection: sqlite3.Connection, source: int, content: bytes):
+        """Returns the id and dictionary to compress the content of a source with.
+
+        Until enough samples of a source have been seen to train its dictionary, content is compressed without one.
+        """
+        with self.content_dictionary_lock:
+            dictionary_id = self.content_dictionary_ids_by_source.get(source)
+            if dictionary_id is not None:
+                return dictionary_id, self.content_dictionaries[dictionary_id]
+
+            samples = self.content_dictionary_samples[source]
+            samples.append(content)
+            self.content_dictionary_sample_bytes[source] += len(content)
+            if self.content_dictionary_sample_bytes[source] < MAX_DICTIONARY_SIZE_BYTES:
+                return NO_DICTIONARY_ID, b""
+
+            # Persist the dictionary before any content compressed with it.
+            dictionary = train_dictionary(samples)
+            cursor = connection.cursor()
+            cursor.execute(
+                "INSERT INTO ContentDictionary (source, dictionary) VALUES (?, ?)",
+                [source, dictionary],
+            )
+            dictionary_id = cursor.lastrowid
+            connection.commit()
+
+            bt.logging.info(
+                f"Trained a {len(dictionary)} byte content dictionary for source {source}."
+            )
+            self.content_dictionaries[dictionary_id] = dictionary
+            self.content_dictionary_ids_by_source[source] = dictionary_id
+            del self.content_dictionary_samples[source]
+            del self.content_dictionary_sample_bytes[source]
+            return dictionary_id, dictionary
+
+    def _decompress_content(self, content: bytes) -> bytes:
+        """Returns the original content of a stored row."""
+        if not is_compressed(content):
+            return content
+
+        try:
+            return decompress_content(content, self.content_dictionaries)
+        except KeyError:
+            # The dictionary was created by another storage instance on the same database.
+            self._load_content_dictionaries()
+            return decompress_content(content, self.content_dictionaries)
+
+    def reconcile_content_size(self, time_delta: dt.timedelta):
+        """Corrects any drift in the running content size totals by recomputing them from each partition.
+
+        Each partition is summed in its own read transaction, which doesn't block stores, and only the drift is then
+        applied in a short write transaction.
+
+        Does nothing if the totals were already reconciled within the provided time_delta.
+        """
+        if dt.datetime.now() - self.content_size_reconciled <= time_delta:
+            return
+
+        with self._pooled_connection() as connection:
+            cursor = connection.cursor()
+
+            for partition_id in self._get_partition_ids(cursor):
+                # Read the running totals and sum the partition from the same snapshot.
+                cursor.execute("BEGIN")
+                cursor.execute(
+                    "SELECT contentSizeBytes, storedSizeBytes FROM DataEntityPartition WHERE id = ?",
+                    [partition_id],
+                )
+                running_sizes = cursor.fetchone()
+                # Skip partitions dropped since they were listed.
+                if running_sizes is None:
+                    connection.commit()
+                    continue
+
+                cursor.execute(
+                    f"""SELECT IFNULL(SUM(contentSizeBytes), 0), IFNULL(SUM(CASE
+                            WHEN substr(content, 1, 4) = {COMPRESSED_CONTENT_MAGIC_SQL}
+                            THEN length(content) ELSE contentSizeBytes END), 0)
+                        FROM DataEntity_{partition_id}"""
+                )
+                actual_sizes = cursor.fetchone()
+                connection.commit()
+
+                content_size_drift = actual_sizes[0] - running_sizes[0]
+                stored_content_size_drift = actual_sizes[1] - running_sizes[1]
+                if content_size_drift == 0 and stored_content_size_drift == 0:
+                    continue
+
+                bt.logging.warning(
+                    f"Stored content size of partition {partition_id} drifted by {-content_size_drift} bytes "
+                    + f"({-stored_content_size_drift} bytes stored). Reconciling."
+                )
+                # Apply only the drift, so stores since the snapshot stay counted.
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(
+                    """UPDATE DataEntityPartition
+                        SET contentSizeBytes = contentSizeBytes + ?, storedSizeBytes = storedSizeBytes + ?
+                        WHERE id = ?""",
+                    [content_size_drift, stored_content_size_drift, partition_id],
+                )
+                connection.commit()
+
+        self.content_size_reconciled = dt.datetime.now()
+
+    def _ensure_hf_metadata_schema(self):
+        with self._pooled_connection() as connection:
+            cursor = connection.cursor()
+
             # Check if the encodingKey column exists
             cursor.execute("PRAGMA table_info(HFMetaData)")
             columns = [column[1] for column in cursor.fetchall()]
@@ -155,29 +841,56 @@ class SqliteMinerStorage(MinerStorage):
     def store_data_entities(self, data_entities: List[DataEntity]):
         """Stores any number of DataEntities, making space if necessary."""
 
-        added_content_size = 0
-        for data_entity in data_entities:
-            added_content_size += data_entity.content_size_bytes
-
-        # If the total size of the store is larger than our maximum configured stored content size then ecept.
-        if added_content_size > self.database_max_content_size_bytes:
-            raise ValueError(
-                "Content size to store: "
-                + str(added_content_size)
-                + " exceeds configured max: "
-                + str(self.database_max_content_size_bytes)
-            )
+        with self._pooled_connection() as connection:
+            # Parse every DataEntity into an list of value lists for inserting, grouped by partition.
+            values_by_partition = defaultdict(list)
+            data_entities_by_partition = defaultdict(list)
+            # Compressed content only takes up its compressed size.
+            added_content_size = 0
+
+            for data_entity in data_entities:
+                label = (
+                    "NULL" if (data_entity.label is None) else data_entity.label.value
+                )
+                time_bucket_id = TimeBucket.from_datetime(data_entity.datetime).id
+                partition_id = self._get_partition_id(time_bucket_id)
+                content = data_entity.content
+                if self.compress_content:
+                    dictionary_id, dictionary = self._get_content_dictionary(
+                        connection, data_entity.source, content
+                    )
+                    content = compress_content(content, dictionary_id, dictionary)
+
+                added_content_size += (
+                    len(content) if is_compressed(content) else data_entity.content_size_bytes
+                )
+                values_by_partition[partition_id].append(
+                    [
+                        data_entity.uri,
+                        data_entity.datetime,
+                        time_bucket_id,
+                        data_entity.source,
+                        label,
+                        content,
+                        data_entity.content_size_bytes,
+                    ]
+                )
+                data_entities_by_partition[partition_id].append(data_entity)
+
+            # If the total size of the store is larger than our maximum configured stored content size then ecept.
+            if added_content_size > self.database_max_content_size_bytes:
+                raise ValueError(
+                    "Content size to store: "
+                    + str(added_content_size)
+                    + " exceeds configured max: "
+                    + str(self.database_max_content_size_bytes)
+                )
 
-        with contextlib.closing(self._create_connection()) as connection:
             # Ensure only one thread is clearing space when necessary.
             with self.clearing_space_lock:
                 # If we would exceed our maximum configured stored content size then clear space.
                 cursor = connection.cursor()
-                cursor.execute("SELECT SUM(contentSizeBytes) FROM DataEntity")
-
-                # If there are no rows we convert the None result to 0
-                result = cursor.fetchone()
-                current_content_size = result[0] if result[0] else 0
+                current_content_size = self._get_stored_content_size(cursor)
 
                 if (
                     current_content_size + added_content_size
@@ -189,36 +902,59 @@ class SqliteMinerStorage(MinerStorage):
                         > added_content_size
                         else added_content_size
                     )
+                    # Clearing works on the logical content size, so scale by how well the content compresses.
+                    if current_content_size > 0:
+                        content_bytes_to_clear = (
+                            content_bytes_to_clear
+                            * self._get_content_size(cursor)
+                            // current_content_size
+                        )
                     self.clear_content_from_oldest(content_bytes_to_clear)
 
-            # Parse every DataEntity into an list of value lists for inserting.
-            values = []
-
-            for data_entity in data_entities:
-                label = (
-                    "NULL" if (data_entity.label is None) else data_entity.label.value
-                )
-                time_bucket_id = TimeBucket.from_datetime(data_entity.datetime).id
-                values.append(
-                    [
-                        data_entity.uri,
-                        data_entity.datetime,
-                        time_bucket_id,
-                        data_entity.source,
-                        label,
-                        data_entity.content,
-                        data_entity.content_size_bytes,
-                    ]
+            # Create any new partitions and write to them in one transaction, so no partition is dropped in between.
+            cursor.execute("BEGIN IMMEDIATE")
+            partition_ids = self._get_partition_ids(cursor)
+            new_partition_ids = values_by_partition.keys() - set(partition_ids)
+            for partition_id in new_partition_ids:
+                self._create_partition(cursor, partition_id)
+                if self.index_keywords:
+                    self._create_keyword_partition(cursor, partition_id)
+            if new_partition_ids:
+                self._create_views(cursor)
+
+            for partition_id, values in values_by_partition.items():
+                # Remove any previous version of a DataEntity stored in another partition under a different datetime.
+                uris = [[value[0]] for value in values]
+                for other_partition_id in partition_ids:
+                    if other_partition_id != partition_id:
+                        cursor.executemany(
+                            f"DELETE FROM DataEntity_{other_partition_id} WHERE uri = ?", uris
+                        )
+
+                # Insert overwriting duplicate keys (in case of updated content).
+                # Use an upsert rather than REPLACE so overwrites update the BucketSummary as a single delta.
+                cursor.executemany(
+                    f"""INSERT INTO DataEntity_{partition_id} VALUES (?,?,?,?,?,?,?)
+                        ON CONFLICT (uri) DO UPDATE SET
+                            datetime = excluded.datetime,
+                            timeBucketId = excluded.timeBucketId,
+                            source = excluded.source,
+                            label = excluded.label,
+                            content = excluded.content,
+                            contentSizeBytes = excluded.contentSizeBytes""",
+                    values,
                 )
 
-            # Insert overwriting duplicate keys (in case of updated content).
-            cursor.executemany("REPLACE INTO DataEntity VALUES (?,?,?,?,?,?,?)", values)
+                if self.index_keywords:
+                    self._store_keyword_texts(
+                        cursor, partition_id, data_entities_by_partition[partition_id]
+                    )
 
             # Commit the insert.
             connection.commit()
 
     def store_hf_dataset_info(self, hf_metadatas: List[HuggingFaceMetadata]):
-        with contextlib.closing(self._create_connection()) as connection:
+        with self._pooled_connection() as connection:
             cursor = connection.cursor()
             values = []
             for hf_metadata in hf_metadatas:
@@ -237,12 +973,20 @@ class SqliteMinerStorage(MinerStorage):
             connection.commit()
 
     def get_earliest_data_datetime(self, source):
-        query = "SELECT MIN(datetime) as earliest_date FROM DataEntity WHERE source = ?"
-        with contextlib.closing(self._create_connection()) as connection:
+        with self._pooled_connection() as connection:
             cursor = connection.cursor()
-            cursor.execute(query, (source,))
-            result = cursor.fetchone()
-            return result['earliest_date'] if result and result['earliest_date'] else None
+            # Read every partition in one transaction, so none are dropped in between.
+            cursor.execute("BEGIN")
+            # Stop at the oldest partition with any data from the source.
+            for partition_id in self._get_partition_ids(cursor):
+                cursor.execute(
+                    f"SELECT MIN(datetime) as earliest_date FROM DataEntity_{partition_id} WHERE source = ?",
+                    (source,),
+                )
+                result = cursor.fetchone()
+                if result and result['earliest_date']:
+                    return result['earliest_date']
+            return None
 
     def should_upload_hf_data(self, unique_id: str) -> bool:
         sql_query = """
@@ -256,7 +1000,7 @@ class SqliteMinerStorage(MinerStorage):
             );
         """
         try:
-            with contextlib.closing(self._create_connection()) as connection:
+            with self._pooled_connection() as connection:
                 cursor = connection.cursor()
                 cursor.execute(sql_query, (f"%_{unique_id}",))
                 result = cursor.fetchone()
@@ -289,7 +1033,7 @@ class SqliteMinerStorage(MinerStorage):
             LIMIT 2;
         """
 
-        with contextlib.closing(self._create_connection()) as connection:
+        with self._pooled_connection() as connection:
             cursor = connection.cursor()
             cursor.execute(sql_query, (f"%_{unique_id}",))
             hf_metadatas = []
@@ -316,10 +1060,17 @@ class SqliteMinerStorage(MinerStorage):
             else data_entity_bucket_id.label.value
         )
 
-        with contextlib.closing(self._create_connection()) as connection:
+        partition_id = self._get_partition_id(data_entity_bucket_id.time_bucket.id)
+
+        with self._pooled_connection(read_only=True) as connection:
             cursor = connection.cursor()
+            # Check for the partition and read from it in one transaction, so it is not dropped in between.
+            cursor.execute("BEGIN")
+            if partition_id not in self._get_partition_ids(cursor):
+                return []
+
             cursor.execute(
-                """SELECT * FROM DataEntity 
+                f"""SELECT uri, datetime, content, contentSizeBytes FROM DataEntity_{partition_id}
                         WHERE timeBucketId = ? AND source = ? AND label = ?""",
                 [
                     data_entity_bucket_id.time_bucket.id,
@@ -333,19 +1084,23 @@ class SqliteMinerStorage(MinerStorage):
 
             running_size = 0
 
+            # Every row shares the bucket's source and label, which were validated when the entities were stored.
+            source = DataSource(data_entity_bucket_id.source)
+            data_label = data_entity_bucket_id.label
+
             for row in cursor:
                 # If we have already reached the max DataEntityBucket size instead return early.
                 if running_size >= constants.DATA_ENTITY_BUCKET_SIZE_LIMIT_BYTES:
                     return data_entities
                 else:
-                    # Construct the new DataEntity with all non null columns.
-                    data_entity = DataEntity(
+                    # Construct the new DataEntity without revalidating the already validated stored row.
+                    data_entity = DataEntity.model_construct(
                         uri=row["uri"],
                         datetime=row["datetime"],
-                        source=DataSource(row["source"]),
-                        content=row["content"],
+                        source=source,
+                        content=self._decompress_content(row["content"]),
                         content_size_bytes=row["contentSizeBytes"],
-                        label=DataLabel(value=row["label"]) if row["label"] != "NULL" else None
+                        label=data_label,
                     )
 
                     data_entities.append(data_entity)
@@ -383,7 +1138,7 @@ class SqliteMinerStorage(MinerStorage):
                     )
                     return
 
-            with contextlib.closing(self._create_connection()) as connection:
+            with self._pooled_connection() as connection:
                 cursor = connection.cursor()
 
                 oldest_time_bucket_id = TimeBucket.from_datetime(
@@ -391,11 +1146,10 @@ class SqliteMinerStorage(MinerStorage):
                     - dt.timedelta(constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS)
                 ).id
 
-                # Get sum of content_size_bytes for all rows grouped by DataEntityBucket.
+                # Get the pre-aggregated size of every DataEntityBucket.
                 cursor.execute(
-                    """SELECT SUM(contentSizeBytes) AS bucketSize, timeBucketId, source, label FROM DataEntity
+                    """SELECT bucketSize, timeBucketId, source, label FROM BucketSummary
                             WHERE timeBucketId >= ?
-                            GROUP BY timeBucketId, source, label
                             ORDER BY bucketSize DESC
                             LIMIT ?
                             """,
@@ -459,44 +1213,68 @@ class SqliteMinerStorage(MinerStorage):
             return defaultdict(list)
 
         # Get rows that match the DataEntityBucketIds.
-        # Use a list of alternating ids and labels to match the upcoming sql query.
-        time_bucket_ids_and_labels = list()
-        for bucket_id in data_entity_bucket_ids:
-            time_bucket_ids_and_labels.append(bucket_id.time_bucket.id)
-            # Note that only twitter has NULL label and that all twitter labels are prefixed with #.
-            # Therefore we do not need to distinguish labels by source.
+        # Use a flat list of (timeBucketId, source, label) tuples per partition to match the upcoming VALUES table.
+        # Skip duplicate ids so the join does not return the same rows twice.
+        bucket_keys_by_partition = defaultdict(list)
+        for bucket_id in dict.fromkeys(data_entity_bucket_ids):
             label = "NULL" if (bucket_id.label is None) else bucket_id.label.value
-            time_bucket_ids_and_labels.append(label)
+            bucket_keys_by_partition[self._get_partition_id(bucket_id.time_bucket.id)].extend(
+                [bucket_id.time_bucket.id, bucket_id.source, label]
+            )
 
-        with contextlib.closing(self._create_connection()) as connection:
+        # Get the contents from each row and return them up to the configured max count and size.
+        buckets_ids_to_contents = defaultdict(list)
+        running_count = 0
+        running_size = 0
+
+        # Only build each DataEntityBucketId once rather than once per row.
+        bucket_ids_by_key = {}
+
+        with self._pooled_connection(read_only=True) as connection:
             cursor = connection.cursor()
-            cursor.execute(
-                f"""SELECT timeBucketId, source, label, content, contentSizeBytes FROM DataEntity
-                    WHERE timeBucketId = ? AND label = ?
-                    {"OR timeBucketId = ? AND label = ?" * (len(data_entity_bucket_ids) - 1)}
-                    LIMIT ?
-                 """,
-                list(time_bucket_ids_and_labels)
-                + [constants.BULK_CONTENTS_COUNT_LIMIT],
-            )
+            # Read every partition in one transaction, so none are dropped in between.
+            cursor.execute("BEGIN")
+            partition_ids = self._get_partition_ids(cursor)
 
-            # Get the contents from each row and return them up to the configured max size.
-            buckets_ids_to_contents = defaultdict(list)
-            running_size = 0
+            for partition_id, bucket_keys in sorted(bucket_keys_by_partition.items()):
+                if partition_id not in partition_ids:
+                    continue
 
-            for row in cursor:
-                if running_size < constants.BULK_CONTENTS_SIZE_LIMIT_BYTES:
-                    data_entity_bucket_id = DataEntityBucketId(
-                        time_bucket=TimeBucket(id=row["timeBucketId"]),
-                        source=DataSource(row["source"]),
-                        label=DataLabel(value=row["label"]) if row["label"] != "NULL" else None
-                    )
+                # Drive the query from the requested buckets so each one is a single range lookup on
+                # the partition's bucket index, which already holds every join column plus the uri primary key.
+                cursor.execute(
+                    f"""WITH Buckets(timeBucketId, source, label) AS (
+                            VALUES {", ".join(["(?, ?, ?)"] * (len(bucket_keys) // 3))}
+                        )
+                        SELECT d.timeBucketId, d.source, d.label, d.content, d.contentSizeBytes
+                        FROM Buckets b CROSS JOIN DataEntity_{partition_id} d
+                            ON d.timeBucketId = b.timeBucketId AND d.source = b.source AND d.label = b.label
+                        LIMIT ?
+                     """,
+                    bucket_keys + [constants.BULK_CONTENTS_COUNT_LIMIT - running_count],
+                )
+
+                for row in cursor:
+                    if running_size >= constants.BULK_CONTENTS_SIZE_LIMIT_BYTES:
+                        # Return early since we hit the size limit.
+                        return buckets_ids_to_contents
+
+                    key = (row["timeBucketId"], row["source"], row["label"])
+                    data_entity_bucket_id = bucket_ids_by_key.get(key)
+                    if data_entity_bucket_id is None:
+                        data_entity_bucket_id = DataEntityBucketId(
+                            time_bucket=TimeBucket(id=row["timeBucketId"]),
+                            source=DataSource(row["source"]),
+                            label=DataLabel(value=row["label"]) if row["label"] != "NULL" else None
+                        )
+                        bucket_ids_by_key[key] = data_entity_bucket_id
                     buckets_ids_to_contents[data_entity_bucket_id].append(
-                        row["content"]
+                        self._decompress_content(row["content"])
                     )
+                    running_count += 1
                     running_size += row["contentSizeBytes"]
-                else:
-                    # Return early since we hit the size limit.
+
+                if running_count >= constants.BULK_CONTENTS_COUNT_LIMIT:
                     break
 
             return buckets_ids_to_contents
@@ -521,43 +1299,135 @@ class SqliteMinerStorage(MinerStorage):
 
         bt.logging.debug(f"Database full. Clearing {content_bytes_to_clear} bytes.")
 
-        with contextlib.closing(self._create_connection()) as connection:
+        with self._pooled_connection() as connection:
             cursor = connection.cursor()
 
-            # TODO Investigate way to select last X bytes worth of entries in a single query.
-            # Get the contentSizeBytes of each row by timestamp desc.
+            # Find the newest time bucket we need to clear into using the pre-aggregated BucketSummary.
             cursor.execute(
-                "SELECT contentSizeBytes, datetime FROM DataEntity ORDER BY datetime ASC"
+                """SELECT timeBucketId, SUM(bucketSize) AS timeBucketSize FROM BucketSummary
+                        GROUP BY timeBucketId
+                        ORDER BY timeBucketId ASC"""
             )
+            time_bucket_sizes = cursor.fetchall()
 
             running_bytes = 0
-            earliest_datetime_to_clear = dt.datetime.min
-            # Iterate over rows until we have found bytes to clear or we reach the end and fail.
+            cutoff_time_bucket_id = None
+            for row in time_bucket_sizes:
+                if running_bytes + row["timeBucketSize"] >= content_bytes_to_clear:
+                    cutoff_time_bucket_id = row["timeBucketId"]
+                    break
+                running_bytes += row["timeBucketSize"]
+
+            partition_ids = self._get_partition_ids(cursor)
+
+            # If there is not enough content to clear then clear everything.
+            if cutoff_time_bucket_id is None:
+                self._drop_partitions(connection, partition_ids)
+                return
+
+            # Drop every partition older than the cutoff in full.
+            cutoff_partition_id = self._get_partition_id(cutoff_time_bucket_id)
+            self._drop_partitions(
+                connection,
+                [partition_id for partition_id in partition_ids if partition_id < cutoff_partition_id],
+            )
+
+            # Within the cutoff partition clear every older time bucket in full.
+            self._delete_in_batches(
+                connection, cutoff_partition_id, "timeBucketId < ?", [cutoff_time_bucket_id]
+            )
+
+            # Within the cutoff time bucket clear from the oldest until we have cleared enough.
+            # This only needs to sort the rows of a single time bucket.
+            cursor.execute(
+                f"""SELECT contentSizeBytes, datetime FROM DataEntity_{cutoff_partition_id}
+                        WHERE timeBucketId = ?
+                        ORDER BY datetime ASC""",
+                [cutoff_time_bucket_id],
+            )
+            earliest_datetime_to_clear = None
             for row in cursor:
                 running_bytes += row["contentSizeBytes"]
                 earliest_datetime_to_clear = row["datetime"]
-                # Once we have enough content to clear then we do so.
                 if running_bytes >= content_bytes_to_clear:
-                    cursor.execute(
-                        "DELETE FROM DataEntity WHERE datetime <= ?",
-                        [earliest_datetime_to_clear],
-                    )
-                    connection.commit()
+                    break
+
+            if earliest_datetime_to_clear is not None:
+                self._delete_in_batches(
+                    connection,
+                    cutoff_partition_id,
+                    "timeBucketId = ? AND datetime <= ?",
+                    [cutoff_time_bucket_id, earliest_datetime_to_clear],
+                )
+
+    def clear_expired_content(self, time_delta: dt.timedelta):
+        """Drops every partition older than DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS, since validators no longer score it.
+
+        A partition is only dropped once all of its time buckets have expired. Until then the expired time buckets
+        in it are already left out of the index.
+
+        Does nothing if expired content was already cleared within the provided time_delta.
+        """
+        if dt.datetime.now() - self.expired_content_cleared <= time_delta:
+            return
+
+        oldest_time_bucket_id = TimeBucket.from_datetime(
+            dt.datetime.now() - dt.timedelta(constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS)
+        ).id
+
+        # Hold the clearing lock so stores do not clear space from the same partitions at the same time.
+        with self.clearing_space_lock, self._pooled_connection() as connection:
+            cursor = connection.cursor()
+            expired_partition_ids = [
+                partition_id
+                for partition_id in self._get_partition_ids(cursor)
+                if (partition_id + 1) * self.PARTITION_TIME_BUCKETS <= oldest_time_bucket_id
+            ]
+
+            # Dropping a partition's tables frees it in one step, without deleting and indexing each row.
+            if expired_partition_ids:
+                self._drop_partitions(connection, expired_partition_ids)
+
+        if expired_partition_ids:
+            bt.logging.info(
+                f"Dropped {len(expired_partition_ids)} partitions older than {constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS} days."
+            )
+        self.expired_content_cleared = dt.datetime.now()
+
+    def _delete_in_batches(
+        self, connection: sqlite3.Connection, partition_id: int, condition: str, parameters: List
+    ):
+        """Deletes all DataEntities in the partition matching the condition, committing every CLEAR_CONTENT_BATCH_SIZE rows.
+
+        Keeping each write transaction small avoids holding the write lock for long periods.
+        """
+        cursor = connection.cursor()
+        while True:
+            cursor.execute(
+                f"""DELETE FROM DataEntity_{partition_id} WHERE uri IN (
+                        SELECT uri FROM DataEntity_{partition_id} WHERE {condition} LIMIT ?
+                    )""",
+                parameters + [self.CLEAR_CONTENT_BATCH_SIZE],
+            )
+            deleted_rows = cursor.rowcount
+            connection.commit()
+
+            if deleted_rows < self.CLEAR_CONTENT_BATCH_SIZE:
+                break
 
     def list_data_entity_buckets(self) -> List[DataEntityBucket]:
         """Lists all DataEntityBuckets for all the DataEntities that this MinerStorage is currently serving."""
 
-        with contextlib.closing(self._create_connection()) as connection:
+        with self._pooled_connection() as connection:
             cursor = connection.cursor()
             oldest_time_bucket_id = TimeBucket.from_datetime(
                 dt.datetime.now()
                 - dt.timedelta(constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS)
             ).id
-            # Get sum of content_size_bytes for all rows grouped by DataEntityBucket.
+            # Get the pre-aggregated size of every DataEntityBucket.
             cursor.execute(
-                """SELECT SUM(contentSizeBytes) AS bucketSize, timeBucketId, source, label FROM DataEntity
+                """SELECT bucketSize, timeBucketId, source, label FROM BucketSummary
                         WHERE timeBucketId >= ?
-                        GROUP BY timeBucketId, source, label
                         ORDER BY bucketSize DESC
                         LIMIT ?
                         """,
@@ -0,0 +1,254 @@
+import dataclasses
+import datetime as dt
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import bittensor as bt
+import numpy as np
+
+from common.data import CompressedMinerIndex
+from common.data_v2 import ScorableDataEntityBucket, ScorableMinerIndex
+from storage.validator.validator_storage import ValidatorStorage
+
+# Buckets are packed into a single int64 key of source | labelId | timeBucketId, so that sorting the keys orders the
+# buckets like the MinerIndex primary key of the SQLite storage.
+_SOURCE_SHIFT = 56
+_LABEL_SHIFT = 24
+_LABEL_MASK = (1 << 32) - 1
+_TIME_BUCKET_MASK = (1 << _LABEL_SHIFT) - 1
+_MAX_SOURCE = (1 << 63 - _SOURCE_SHIFT) - 1
+
+
+@dataclasses.dataclass(frozen=True)
+class _MinerIndexArrays:
+    """The stored index of one miner. The arrays are never modified once created."""
+
+    # Sorted, unique packed bucket keys.
+    keys: np.ndarray
+    # Content size of the bucket with the key at the same position.
+    sizes: np.ndarray
+    last_updated: dt.datetime
+    credibility: float
+
+
+@dataclasses.dataclass(frozen=True)
+class _Snapshot:
+    """A consistent view of every miner's index and the bucket totals. Replaced, never modified, by writers."""
+
+    miners: Dict[str, _MinerIndexArrays]
+    # Sorted packed keys of every bucket with a non-zero total content size across all miners.
+    total_keys: np.ndarray
+    total_bytes: np.ndarray
+
+
+def _pack_keys(
+    sources: np.ndarray, label_ids: np.ndarray, time_bucket_ids: np.ndarray
+) -> np.ndarray:
+    return (
+        (sources << _SOURCE_SHIFT) | (label_ids << _LABEL_SHIFT) | time_bucket_ids
+    )
+
+
+def _sum_by_key(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the sorted unique keys and the sum of the values of each."""
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    if not len(keys):
+        return keys, values[order]
+    return keys[starts], np.add.reduceat(values[order], starts)
+
+
+class NumpyValidatorStorage(ValidatorStorage):
+    """In-memory Validator Storage keeping each miner's index as packed NumPy arrays.
+
+    All state lives in an immutable snapshot that writers replace in a single assignment, so reads take no lock and
+    always see the indexes and bucket totals of the same moment. Writers are serialized by write_lock.
+    """
+
+    def __init__(self):
+        self.write_lock = threading.Lock()
+        self._snapshot = _Snapshot(
+            miners={},
+            total_keys=np.empty(0, dtype=np.int64),
+            total_bytes=np.empty(0, dtype=np.int64),
+        )
+        # Labels only ever get new ids, so ids in any snapshot remain valid. None is the bucket without a label.
+        self._label_ids: Dict[Optional[str], int] = {}
+        self._labels: List[Optional[str]] = []
+
+    def _get_or_insert_label(self, label: Optional[str]) -> int:
+        """Returns the id of a label, casefolded like the SQLite storage. Must hold write_lock."""
+        label = label.casefold() if label is not None else None
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = len(self._labels)
+            self._labels.append(label)
+            self._label_ids[label] = label_id
+        return label_id
+
+    def upsert_compressed_miner_index(
+        self, index: CompressedMinerIndex, hotkey: str, credibility: float = 0
+    ):
+        """Stores the index for all of the data that a specific miner promises to provide."""
+
+        bt.logging.trace(
+            f"{hotkey}: Upserting miner index with {CompressedMinerIndex.bucket_count(index)} buckets"
+        )
+
+        with self.write_lock:
+            sources, label_ids, time_bucket_ids, sizes = [], [], [], []
+            for source, compressed_buckets in index.sources.items():
+                source = int(source)
+                if not 0 <= source <= _MAX_SOURCE:
+                    bt.logging.trace(f"{hotkey}: Dropping buckets of unsupported source {source}")
+                    continue
+                for compressed_bucket in compressed_buckets:
+                    bucket_count = len(compressed_bucket.time_bucket_ids)
+                    sources.append(np.full(bucket_count, source, dtype=np.int64))
+                    label_ids.append(
+                        np.full(
+                            bucket_count,
+                            self._get_or_insert_label(compressed_bucket.label),
+                            dtype=np.int64,
+                        )
+                    )
+                    time_bucket_ids.append(
+                        np.asarray(compressed_bucket.time_bucket_ids, dtype=np.int64)
+                    )
+                    sizes.append(np.asarray(compressed_bucket.sizes_bytes, dtype=np.int64))
+
+            if sources:
+                sources, label_ids, time_bucket_ids, sizes = (
+                    np.concatenate(arrays)
+                    for arrays in (sources, label_ids, time_bucket_ids, sizes)
+                )
+            else:
+                sources = label_ids = time_bucket_ids = sizes = np.empty(0, dtype=np.int64)
+
+            # Drop buckets whose time bucket id doesn't fit in the key.
+            valid = (time_bucket_ids >= 0) & (time_bucket_ids <= _TIME_BUCKET_MASK)
+            keys = _pack_keys(sources[valid], label_ids[valid], time_bucket_ids[valid])
+            # Keep the first of any duplicate buckets, like INSERT OR IGNORE.
+            keys, first = np.unique(keys, return_index=True)
+            miner = _MinerIndexArrays(
+                keys=keys,
+                sizes=sizes[valid][first],
+                last_updated=dt.datetime.utcnow(),
+                credibility=credibility,
+            )
+
+            snapshot = self._snapshot
+            miners = dict(snapshot.miners)
+            previous = miners.get(hotkey)
+            miners[hotkey] = miner
+            self._snapshot = self._replace_miner(snapshot, miners, removed=previous, added=miner)
+
+    def read_miner_index(self, miner_hotkey: str) -> Optional[ScorableMinerIndex]:
+        """Gets a scored index for all of the data that a specific miner promises to provide."""
+        snapshot = self._snapshot
+        miner = snapshot.miners.get(miner_hotkey)
+        if miner is None:
+            return None
+
+        # Look up the total of each of the miner's buckets. Buckets with a zero total have no entry.
+        positions = np.searchsorted(snapshot.total_keys, miner.keys)
+        positions_in_range = np.minimum(positions, max(len(snapshot.total_keys) - 1, 0))
+        if len(snapshot.total_keys):
+            found = snapshot.total_keys[positions_in_range] == miner.keys
+            bucket_totals = np.where(found, snapshot.total_bytes[positions_in_range], 0)
+        else:
+            bucket_totals = np.zeros(len(miner.keys), dtype=np.int64)
+
+        # Computed in the same order and precision as the SQLite storage: size * size as an integer, then divided
+        # as a double and truncated.
+        squared_sizes = (miner.sizes * miner.sizes).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scorable_bytes = np.where(
+                bucket_totals != 0, squared_sizes / bucket_totals, 0
+            ).astype(np.int64)
+
+        labels = self._labels
+        scored_data_entity_buckets = [
+            ScorableDataEntityBucket(
+                time_bucket_id=time_bucket_id,
+                source=source,
+                label=labels[label_id],
+                size_bytes=size_bytes,
+                scorable_bytes=scorable,
+            )
+            for source, label_id, time_bucket_id, size_bytes, scorable in zip(
+                (miner.keys >> _SOURCE_SHIFT).tolist(),
+                ((miner.keys >> _LABEL_SHIFT) & _LABEL_MASK).tolist(),
+                (miner.keys & _TIME_BUCKET_MASK).tolist(),
+                miner.sizes.tolist(),
+                scorable_bytes.tolist(),
+            )
+        ]
+
+        return ScorableMinerIndex(
+            scorable_data_entity_buckets=scored_data_entity_buckets,
+            last_updated=miner.last_updated,
+        )
+
+    def delete_miner(self, hotkey: str):
+        """Removes the index and miner details for the specified miner."""
+        with self.write_lock:
+            snapshot = self._snapshot
+            if hotkey not in snapshot.miners:
+                return
+
+            miners = dict(snapshot.miners)
+            previous = miners.pop(hotkey)
+            self._snapshot = self._replace_miner(snapshot, miners, removed=previous, added=None)
+
+    def read_miner_last_updated(self, miner_hotkey: str) -> Optional[dt.datetime]:
+        """Gets when a specific miner was last updated."""
+        miner = self._snapshot.miners.get(miner_hotkey)
+        return miner.last_updated if miner is not None else None
+
+    def _replace_miner(
+        self,
+        snapshot: _Snapshot,
+        miners: Dict[str, _MinerIndexArrays],
+        removed: Optional[_MinerIndexArrays],
+        added: Optional[_MinerIndexArrays],
+    ) -> _Snapshot:
+        """Returns a snapshot with the given miners and the bucket totals updated from removed to added."""
+        delta_keys = [np.empty(0, dtype=np.int64)]
+        delta_bytes = [np.empty(0, dtype=np.int64)]
+        if removed is not None:
+            delta_keys.append(removed.keys)
+            delta_bytes.append(-removed.sizes)
+        if added is not None:
+            delta_keys.append(added.keys)
+            delta_bytes.append(added.sizes)
+        delta_keys, delta_bytes = _sum_by_key(
+            np.concatenate(delta_keys), np.concatenate(delta_bytes)
+        )
+
+        # Add the deltas to the existing totals and insert the totals of new buckets.
+        total_keys = snapshot.total_keys
+        total_bytes = snapshot.total_bytes.copy()
+        positions = np.searchsorted(total_keys, delta_keys)
+        existing = positions < len(total_keys)
+        existing[existing] = total_keys[positions[existing]] == delta_keys[existing]
+        total_bytes[positions[existing]] += delta_bytes[existing]
+        total_keys = np.insert(total_keys, positions[~existing], delta_keys[~existing])
+        total_bytes = np.insert(total_bytes, positions[~existing], delta_bytes[~existing])
+
+        non_zero = total_bytes != 0
+        return _Snapshot(
+            miners=miners,
+            total_keys=total_keys[non_zero],
+            total_bytes=total_bytes[non_zero],
+        )
+
+    def memory_bytes(self) -> int:
+        """Returns the size of the arrays holding the indexes and bucket totals."""
+        snapshot = self._snapshot
+        return (
+            snapshot.total_keys.nbytes
+            + snapshot.total_bytes.nbytes
+            + sum(miner.keys.nbytes + miner.sizes.nbytes for miner in snapshot.miners.values())
+        )
@@ -14,35 +14,86 @@ class AutoIncrementDict:
 
     Provides O(1) ability to insert a key and get its id, and to lookup the key for an id.
 
-    Not thread safe.
+    Thread safe.
     """
 
     def __init__(self):
         self.available_ids = set()
         self.items = []
         self.indexes = {}
+        self.lock = threading.Lock()
 
     def get_or_insert(self, key: Any) -> int:
-        if key not in self.indexes:
-            if self.available_ids:
-                key_id = self.available_ids.pop()
-                self.items[key_id] = key
-                self.indexes[key] = key_id
-            else:
-                self.items.append(key)
-                self.indexes[key] = len(self.items) - 1
+        key_id = self.indexes.get(key)
+        if key_id is not None:
+            return key_id
 
-        return self.indexes[key]
+        with self.lock:
+            if key not in self.indexes:
+                if self.available_ids:
+                    key_id = self.available_ids.pop()
+                    self.items[key_id] = key
+                    self.indexes[key] = key_id
+                else:
+                    self.items.append(key)
+                    self.indexes[key] = len(self.items) - 1
+
+            return self.indexes[key]
 
     def get_by_id(self, id: int) -> Any:
         return self.items[id]
 
     def delete_key(self, key: Any):
-        if key in self.indexes:
-            key_id = self.indexes[key]
-            self.items[key_id] = None
-            del self.indexes[key]
-            self.available_ids.add(key_id)
+        with self.lock:
+            if key in self.indexes:
+                key_id = self.indexes[key]
+                self.items[key_id] = None
+                del self.indexes[key]
+                self.available_ids.add(key_id)
+
+
+class ReadWriteLock:
+    """A lock held either by any number of readers or by a single writer.
+
+    Waiting writers go before new readers, so a steady stream of reads can't starve them. Not reentrant.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self.condition:
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            try:
+                while self.writing or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
 
 
 # Use a timezone aware adapter for timestamp columns.
@@ -108,6 +159,35 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
     MINER_INDEX_TABLE_BUCKET_SIZE_INDEX = """CREATE INDEX IF NOT EXISTS bucket_size_index
                                              ON MinerIndex (source, labelId, timeBucketId, contentSizeBytes)"""
 
+    # Total content size of each bucket across all miners, kept up to date as miner indexes are inserted and deleted.
+    BUCKET_TOTAL_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS BucketTotal (
+                                    source              TINYINT         NOT NULL,
+                                    labelId             INTEGER         NOT NULL,
+                                    timeBucketId        INTEGER         NOT NULL,
+                                    totalBytes          INTEGER         NOT NULL,
+                                    PRIMARY KEY(source, labelId, timeBucketId)
+                                    ) WITHOUT ROWID"""
+
+    # Adds the content sizes of a miner's buckets to the bucket totals, negated when the index is being deleted.
+    BUCKET_TOTAL_APPLY_MINER = """INSERT INTO BucketTotal (source, labelId, timeBucketId, totalBytes)
+                                  SELECT source, labelId, timeBucketId, :sign * contentSizeBytes
+                                  FROM   MinerIndex
+                                  WHERE  minerId = :mine
+                                  ON CONFLICT(source, labelId, timeBucketId)
+                                  DO UPDATE SET totalBytes = totalBytes + excluded.totalBytes"""
+
+    # Bucket changes of a miner's index waiting to be applied to MinerIndex and BucketTotal together.
+    # storedSize is NULL for new buckets and newSize for deleted ones.
+    MINER_INDEX_CHANGE_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS MinerIndexChange (
+                                    minerId             INTEGER         NOT NULL,
+                                    source              TINYINT         NOT NULL,
+                                    labelId             INTEGER         NOT NULL,
+                                    timeBucketId        INTEGER         NOT NULL,
+                                    storedSize          INTEGER,
+                                    newSize             INTEGER,
+                                    PRIMARY KEY(minerId, source, labelId, timeBucketId)
+                                    ) WITHOUT ROWID"""
+
     HF_METADATA_TABLE_CREATE = """CREATE TABLE IF NOT EXISTS HFMetadata (
                                         minerId     INTEGER         NOT NULL,
                                         repo_name   TEXT            NOT NULL,
@@ -117,6 +197,12 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
                                         )"""
 
 
+    # lastUpdated of a miner whose first index hasn't been completely written yet.
+    NEVER_UPDATED = "0001-01-01 00:00:00.000000"
+
+    # Maximum number of bucket changes staged per exclusive lock hold, so reads can interleave with large upserts.
+    WRITE_BATCH_SIZE = 10_000
+
     def __init__(self):
         sqlite3.register_converter("timestamp", tz_aware_timestamp_adapter)
 
@@ -136,10 +222,22 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
                 SqliteMemoryValidatorStorage.MINER_INDEX_TABLE_BUCKET_SIZE_INDEX
             )
 
+            cursor.execute(SqliteMemoryValidatorStorage.BUCKET_TOTAL_TABLE_CREATE)
+
+            cursor.execute(SqliteMemoryValidatorStorage.MINER_INDEX_CHANGE_TABLE_CREATE)
+
             cursor.execute(SqliteMemoryValidatorStorage.HF_METADATA_TABLE_CREATE)
 
-            # Lock to avoid concurrency issues on interacting with the database.
-            self.lock = threading.RLock()
+            # Lock to avoid concurrency issues on interacting with the database. Reads share it, writes are exclusive.
+            self.lock = ReadWriteLock()
+            # Locks serializing the writes to each miner, by hotkey.
+            self.miner_locks: Dict[str, threading.Lock] = {}
+            self.miner_locks_lock = threading.Lock()
+
+    def _miner_lock(self, hotkey: str) -> threading.Lock:
+        """Returns the lock serializing the writes to the specified miner."""
+        with self.miner_locks_lock:
+            return self.miner_locks.setdefault(hotkey, threading.Lock())
 
     def _create_connection(self):
         # Create the database if it doesn't exist, defaulting to the local directory.
@@ -155,10 +253,24 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
         connection.isolation_level = None
         return connection
 
+    def _get_or_insert_miner(self, hotkey: str) -> int:
+        """Returns the minerId of the specified hotkey, inserting a miner that was never updated if there is none."""
+        with self.lock.write():
+            with contextlib.closing(self._create_connection()) as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "INSERT OR IGNORE INTO Miner (hotkey, lastUpdated) VALUES (?, ?)",
+                    [hotkey, SqliteMemoryValidatorStorage.NEVER_UPDATED],
+                )
+                connection.commit()
+
+                cursor.execute("SELECT minerId FROM Miner WHERE hotkey = ?", [hotkey])
+                return cursor.fetchone()[0]
+
     def _upsert_miner(self, hotkey: str, now_str: str, credibility: float) -> int:
         miner_id = 0
 
-        with self.lock:
+        with self.lock.write():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
 
@@ -197,48 +309,142 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
 
         now_str = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
 
-        # Upsert this Validator's minerId for the specified hotkey.
-        miner_id = self._upsert_miner(hotkey, now_str, credibility)
-
-        # Parse every DataEntityBucket from the index into a list of values to insert.
-        values = []
-        for source, compressed_buckets in index.sources.items():
-            for compressed_bucket in compressed_buckets:
-                for time_bucket_id, size_bytes in zip(
-                    compressed_bucket.time_bucket_ids, compressed_bucket.sizes_bytes
-                ):
+        # Writes to one miner are serialized, so its stored buckets don't change between diffing and writing.
+        with self._miner_lock(hotkey):
+            # Get this Validator's minerId for the specified hotkey. lastUpdated is only written once the whole index
+            # is, so a miner whose index is partly written or failed to write is due another update.
+            miner_id = self._get_or_insert_miner(hotkey)
+
+            # Parse every DataEntityBucket from the index into its size by bucket key, keeping the first of any
+            # duplicate buckets like INSERT OR IGNORE.
+            new_buckets = {}
+            for source, compressed_buckets in index.sources.items():
+                source = int(source)
+                for compressed_bucket in compressed_buckets:
                     try:
-                        values.append(
-                            [
-                                miner_id,
-                                int(source),
-                                self.label_dict.get_or_insert(
-                                    self._label_value_parse_str(compressed_bucket.label)
-                                ),
-                                time_bucket_id,
-                                size_bytes,
-                            ]
+                        label_id = self.label_dict.get_or_insert(
+                            self._label_value_parse_str(compressed_bucket.label)
                         )
                     except:
-                        # In the case that we fail to get a label (due to unsupported characters) we drop just that one bucket.
-                        pass
+                        # In the case that we fail to get a label (due to unsupported characters) we drop just the buckets with that label.
+                        continue
+                    for time_bucket_id, size_bytes in zip(
+                        compressed_bucket.time_bucket_ids, compressed_bucket.sizes_bytes
+                    ):
+                        new_buckets.setdefault((source, label_id, time_bucket_id), size_bytes)
+
+            # Only the writes take the exclusive lock, so reads continue while the stored buckets are read and diffed.
+            with self.lock.read():
+                with contextlib.closing(self._create_connection()) as connection:
+                    cursor = connection.cursor()
+                    cursor.execute(
+                        "SELECT source, labelId, timeBucketId, contentSizeBytes FROM MinerIndex WHERE minerId = ?",
+                        [miner_id],
+                    )
+                    stored_buckets = {(row[0], row[1], row[2]): row[3] for row in cursor}
 
-        with self.lock:
-            # Clear the previous keys for this miner.
-            self._delete_miner_index(hotkey)
+            # Only write what changed since the last index of this miner, which is usually little.
+            changes = self._diff_miner_index(stored_buckets, new_buckets)
+            bt.logging.trace(
+                f"{hotkey}: Writing {len(changes)} changed buckets of {len(stored_buckets)} stored buckets"
+            )
+            # Stage the changes in batches, then apply them all at once so reads never see part of the index.
+            for x in range(0, len(changes), SqliteMemoryValidatorStorage.WRITE_BATCH_SIZE):
+                self._stage_bucket_changes(
+                    miner_id, changes[x : x + SqliteMemoryValidatorStorage.WRITE_BATCH_SIZE], x == 0
+                )
+            if changes:
+                self._apply_bucket_changes(miner_id)
+
+            self._upsert_miner(hotkey, now_str, credibility)
+
+    def _diff_miner_index(
+        self,
+        stored_buckets: Dict[Tuple[int, int, int], int],
+        new_buckets: Dict[Tuple[int, int, int], int],
+    ) -> List[Tuple[Tuple[int, int, int], Optional[int], Optional[int]]]:
+        """Returns the (bucket key, stored size, new size) of every bucket whose size differs between the stored and
+        new buckets of a miner. The stored size is None for new buckets and the new size for deleted ones."""
+        changes = [
+            (key, stored_size, None)
+            for key, stored_size in stored_buckets.items()
+            if key not in new_buckets
+        ]
+        changes.extend(
+            (key, stored_buckets.get(key), size_bytes)
+            for key, size_bytes in new_buckets.items()
+            if stored_buckets.get(key) != size_bytes
+        )
+        return changes
 
+    def _stage_bucket_changes(
+        self,
+        miner_id: int,
+        changes: List[Tuple[Tuple[int, int, int], Optional[int], Optional[int]]],
+        is_first_batch: bool,
+    ):
+        """Stages bucket changes returned by _diff_miner_index to be applied by _apply_bucket_changes.
+
+        The first batch of an upsert also drops any changes left staged by an upsert that failed.
+        """
+        with self.lock.write():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
-                # Insert the new keys. (Ignore into to defend against a miner giving us multiple duplicate rows.)
-                # Batch in groups of 1m if necessary to avoid congestion issues.
-                value_subsets = [
-                    values[x : x + 1_000_000] for x in range(0, len(values), 1_000_000)
-                ]
-                for value_subset in value_subsets:
-                    cursor.executemany(
-                        """INSERT OR IGNORE INTO MinerIndex (minerId, source, labelId, timeBucketId, contentSizeBytes) VALUES (?, ?, ?, ?, ?)""",
-                        value_subset,
-                    )
+                cursor.execute("BEGIN")
+                if is_first_batch:
+                    cursor.execute("DELETE FROM MinerIndexChange WHERE minerId = ?", [miner_id])
+                cursor.executemany(
+                    """INSERT INTO MinerIndexChange (minerId, source, labelId, timeBucketId, storedSize, newSize)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [[miner_id, *key, stored_size, new_size] for key, stored_size, new_size in changes],
+                )
+                connection.commit()
+
+    def _apply_bucket_changes(self, miner_id: int):
+        """Applies the staged bucket changes of a miner to its index and the bucket totals in one transaction."""
+        with self.lock.write():
+            with contextlib.closing(self._create_connection()) as connection:
+                cursor = connection.cursor()
+                cursor.execute("BEGIN")
+                cursor.execute(
+                    """DELETE FROM MinerIndex
+                       WHERE minerId = :mine
+                       AND   (source, labelId, timeBucketId) IN (
+                                 SELECT source, labelId, timeBucketId FROM MinerIndexChange
+                                 WHERE minerId = :mine AND newSize IS NULL
+                             )""",
+                    {"mine": miner_id},
+                )
+                cursor.execute(
+                    """INSERT INTO MinerIndex (minerId, source, labelId, timeBucketId, contentSizeBytes)
+                       SELECT minerId, source, labelId, timeBucketId, newSize
+                       FROM   MinerIndexChange
+                       WHERE  minerId = :mine AND newSize IS NOT NULL
+                       ON CONFLICT(minerId, source, labelId, timeBucketId)
+                       DO UPDATE SET contentSizeBytes = excluded.contentSizeBytes""",
+                    {"mine": miner_id},
+                )
+
+                # Apply the size changes to the bucket totals, dropping the totals that reach zero.
+                cursor.execute(
+                    """INSERT INTO BucketTotal (source, labelId, timeBucketId, totalBytes)
+                       SELECT source, labelId, timeBucketId, IFNULL(newSize, 0) - IFNULL(storedSize, 0)
+                       FROM   MinerIndexChange
+                       WHERE  minerId = :mine
+                       ON CONFLICT(source, labelId, timeBucketId)
+                       DO UPDATE SET totalBytes = totalBytes + excluded.totalBytes""",
+                    {"mine": miner_id},
+                )
+                cursor.execute(
+                    """DELETE FROM BucketTotal
+                       WHERE totalBytes = 0
+                       AND   (source, labelId, timeBucketId) IN (
+                                 SELECT source, labelId, timeBucketId FROM MinerIndexChange WHERE minerId = :mine
+                             )""",
+                    {"mine": miner_id},
+                )
+
+                cursor.execute("DELETE FROM MinerIndexChange WHERE minerId = :mine", {"mine": miner_id})
                 connection.commit()
 
     def read_miner_index(
@@ -246,7 +452,7 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
         miner_hotkey: str,
     ) -> Optional[ScorableMinerIndex]:
         """Gets a scored index for all of the data that a specific miner promises to provide."""
-        with self.lock:
+        with self.lock.read():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
 
@@ -261,30 +467,16 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
                 miner_id, last_updated = row
 
                 # Get all the DataEntityBuckets for this miner joined to the total content size of like buckets, credibility-free.
+                # Buckets whose total is zero have no BucketTotal row and get no scorable bytes.
                 sql = """
-                WITH
-                  TempBuckets AS (
-                      SELECT source, labelId, timeBucketId
-                      FROM   MinerIndex
-                      WHERE  minerId = :mine
-                  ),
-                  TotalContent AS (
-                      SELECT source,
-                             labelId,
-                             timeBucketId,
-                             SUM(contentSizeBytes) AS bucketTotalBytes
-                      FROM   MinerIndex
-                      JOIN   TempBuckets USING (source, labelId, timeBucketId)
-                      GROUP  BY source, labelId, timeBucketId
-                  )
                 SELECT  mi.source,
                         mi.labelId,
                         mi.timeBucketId,
                         mi.contentSizeBytes,
                         (mi.contentSizeBytes * mi.contentSizeBytes * 1.0
-                         / NULLIF(TotalContent.bucketTotalBytes, 0)) AS scorableBytes
+                         / NULLIF(bt.totalBytes, 0)) AS scorableBytes
                 FROM    MinerIndex AS mi
-                JOIN    TotalContent USING (source, labelId, timeBucketId)
+                LEFT JOIN BucketTotal AS bt USING (source, labelId, timeBucketId)
                 WHERE   mi.minerId = :mine;
                 """
                 cursor.execute(sql, {"mine": miner_id})
@@ -328,21 +520,42 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
             # Delete the rows for the specified miner.
             result = cursor.fetchone()
             if result is not None:
-                cursor.execute("DELETE FROM MinerIndex WHERE minerId = ?", [result[0]])
+                miner_id = result[0]
+                cursor.execute("BEGIN")
+                # Subtract the miner's buckets from the bucket totals, dropping the totals that reach zero.
+                cursor.execute(
+                    SqliteMemoryValidatorStorage.BUCKET_TOTAL_APPLY_MINER,
+                    {"sign": -1, "mine": miner_id},
+                )
+                cursor.execute(
+                    """DELETE FROM BucketTotal
+                       WHERE totalBytes = 0
+                       AND   (source, labelId, timeBucketId) IN (
+                                 SELECT source, labelId, timeBucketId FROM MinerIndex WHERE minerId = ?
+                             )""",
+                    [miner_id],
+                )
+                cursor.execute("DELETE FROM MinerIndex WHERE minerId = ?", [miner_id])
+                cursor.execute("DELETE FROM MinerIndexChange WHERE minerId = ?", [miner_id])
                 connection.commit()
 
     def delete_miner(self, hotkey: str):
         """Removes the index and miner details for the specified miner."""
-        with self.lock:
-            self._delete_miner_index(hotkey)
-            self._delete_hf_metadata(hotkey)
-            with contextlib.closing(self._create_connection()) as connection:
-                cursor = connection.cursor()
-                cursor.execute("DELETE FROM Miner WHERE hotkey = ?", [hotkey])
+        with self._miner_lock(hotkey):
+            with self.lock.write():
+                self._delete_miner_index(hotkey)
+                self._delete_hf_metadata(hotkey)
+                with contextlib.closing(self._create_connection()) as connection:
+                    cursor = connection.cursor()
+                    cursor.execute("DELETE FROM Miner WHERE hotkey = ?", [hotkey])
+
+            # Drop the miner's lock so the locks don't accumulate as hotkeys deregister.
+            with self.miner_locks_lock:
+                self.miner_locks.pop(hotkey, None)
 
     def read_miner_last_updated(self, miner_hotkey: str) -> Optional[dt.datetime]:
         """Gets when a specific miner was last updated."""
-        with self.lock:
+        with self.lock.read():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
                 cursor.execute(
@@ -359,7 +572,7 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
         """Stores or updates the HuggingFace metadata for a specific miner."""
         bt.logging.trace(f"{hotkey}: Upserting HuggingFace metadata with {len(metadata)} entries")
 
-        with self.lock:
+        with self.lock.write():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
                 cursor.execute("SELECT minerId FROM Miner WHERE hotkey = ?", [hotkey])
@@ -379,7 +592,7 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
 
     def read_hf_metadata(self, miner_hotkey: str) -> List[HuggingFaceMetadata]:
         """Gets the HuggingFace metadata for a specific miner."""
-        with self.lock:
+        with self.lock.read():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
                 cursor.execute("SELECT minerId FROM Miner WHERE hotkey = ?", [miner_hotkey])
@@ -413,7 +626,7 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
 
     def has_hf_metadata(self, miner_hotkey: str) -> bool:
         """Checks if a specific miner has any HuggingFace metadata."""
-        with self.lock:
+        with self.lock.read():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
                 cursor.execute("SELECT minerId FROM Miner WHERE hotkey = ?", [miner_hotkey])
@@ -427,7 +640,7 @@ class SqliteMemoryValidatorStorage(ValidatorStorage):
 
     def read_hf_metadata_last_updated(self, miner_hotkey: str) -> Optional[dt.datetime]:
         """Gets when a specific miner's HuggingFace metadata was last updated."""
-        with self.lock:
+        with self.lock.read():
             with contextlib.closing(self._create_connection()) as connection:
                 cursor = connection.cursor()
                 cursor.execute("SELECT minerId FROM Miner WHERE hotkey = ?", [miner_hotkey])
@@ -1,9 +1,12 @@
+import random
 import unittest
 from attr import dataclass
+import numpy as np
 from common import constants, utils
-from common.data_v2 import ScorableDataEntityBucket
+from common.data_v2 import ScorableDataEntityBucket, ScorableMinerIndex
 from rewards.data import DataDesirabilityLookup, Job, JobMatcher, DataSourceDesirability
 from rewards.data_value_calculator import DataValueCalculator
+from rewards.miner_scorer import MinerScorer
 from common.data import (
     DataLabel,
     DataSource,
@@ -320,5 +323,128 @@ class TestDataValueCalculator(unittest.TestCase):
         self.assertAlmostEqual(score, 225.0, places=5)
 
 
+
+class TestDataValueCalculatorBatch(unittest.TestCase):
+    def setUp(self):
+        self.current_time_bucket = TimeBucket(id=500_000)
+        max_age_in_hours = constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS * 24
+        start = self.current_time_bucket.id - max_age_in_hours
+
+        def _job(id: str, label: str, job_weight: float, start_timebucket=None, end_timebucket=None) -> Job:
+            return Job(
+                id=id,
+                keyword=None,
+                label=label,
+                job_weight=job_weight,
+                start_timebucket=start_timebucket,
+                end_timebucket=end_timebucket,
+            )
+
+        reddit_job_matcher = JobMatcher(jobs=[
+            _job("reddit_1", "r/testlabel", 1.0),
+            _job("reddit_2", "r/penalizedlabel", -1.0),
+            _job("reddit_3", "r/unscoredlabel", 0.0),
+            # Several jobs for one label, overlapping in time.
+            _job("reddit_4", "r/multilabel", 0.3),
+            _job("reddit_5", "r/multilabel", 2.5, start_timebucket=start + 100, end_timebucket=start + 400),
+            _job("reddit_6", "r/multilabel", 1.7, start_timebucket=start + 300),
+            _job("reddit_7", "r/dated", 3.1, end_timebucket=start + 200),
+            # A zero time bucket constrains matching but doesn't count as a date constraint for the time scalar.
+            _job("reddit_8", "r/zerostart", 1.3, start_timebucket=0),
+        ])
+        x_job_matcher = JobMatcher(jobs=[
+            _job("x_1", "#testlabel", 0.9),
+            _job("x_2", "#dated", 4.2, start_timebucket=start + 50, end_timebucket=start + 600),
+            _job("x_3", "#dated", -0.4),
+        ])
+        self.value_calculator = DataValueCalculator(
+            model=DataDesirabilityLookup(
+                distribution={
+                    DataSource.REDDIT: DataSourceDesirability(
+                        weight=0.55, default_scale_factor=0.35, job_matcher=reddit_job_matcher
+                    ),
+                    DataSource.X: DataSourceDesirability(
+                        weight=0.45, default_scale_factor=0.7, job_matcher=x_job_matcher
+                    ),
+                },
+                max_age_in_hours=max_age_in_hours,
+            )
+        )
+        self.labels = [
+            None,
+            "r/testlabel",
+            "r/penalizedlabel",
+            "r/unscoredlabel",
+            "r/multilabel",
+            "r/dated",
+            "r/zerostart",
+            "r/otherlabel",
+            "#testlabel",
+            "#dated",
+            "#otherlabel",
+        ]
+
+    def _create_random_buckets(self, rng: random.Random, count: int):
+        max_age_in_hours = self.value_calculator.model.max_age_in_hours
+        # YouTube has no desirability, so its buckets score 0.
+        sources = [DataSource.REDDIT, DataSource.X, DataSource.YOUTUBE]
+        buckets = []
+        for _ in range(count):
+            size_bytes = rng.randrange(1, constants.DATA_ENTITY_BUCKET_SIZE_LIMIT_BYTES)
+            buckets.append(
+                ScorableDataEntityBucket(
+                    # Include buckets from the future and too old to score.
+                    time_bucket_id=self.current_time_bucket.id
+                    + rng.randrange(-max_age_in_hours - 50, 50),
+                    source=rng.choice(sources),
+                    label=rng.choice(self.labels),
+                    size_bytes=size_bytes,
+                    scorable_bytes=rng.randrange(0, size_bytes + 1),
+                )
+            )
+        return buckets
+
+    def test_batch_scores_match_scalar_scores(self):
+        """Tests that batch scoring is bit compatible with scoring each bucket on randomized indexes."""
+        rng = random.Random(13)
+        scorer = MinerScorer(num_neurons=1, value_calculator=self.value_calculator)
+
+        for bucket_count in [0, 1, 10, 1_000, 20_000]:
+            buckets = self._create_random_buckets(rng, bucket_count)
+
+            expected_scores = [
+                self.value_calculator.get_score_for_data_entity_bucket(bucket, self.current_time_bucket)
+                for bucket in buckets
+            ]
+            expected_total = 0.0
+            for expected_score in expected_scores:
+                expected_total += expected_score
+
+            labels = list(dict.fromkeys(bucket.label for bucket in buckets))
+            arrays = dict(
+                sources=np.array([bucket.source for bucket in buckets], dtype=np.int64),
+                label_ids=np.array([labels.index(bucket.label) for bucket in buckets], dtype=np.int64),
+                labels=labels,
+                time_bucket_ids=np.array([bucket.time_bucket_id for bucket in buckets], dtype=np.int64),
+                scorable_bytes=np.array([bucket.scorable_bytes for bucket in buckets], dtype=np.int64),
+                current_time_bucket=self.current_time_bucket,
+            )
+            scores = self.value_calculator.get_scores_for_data_entity_buckets(**arrays)
+            total = self.value_calculator.get_score_for_data_entity_buckets(**arrays)
+            index_total = scorer._score_index(
+                ScorableMinerIndex(
+                    scorable_data_entity_buckets=buckets, last_updated=dt.datetime.now()
+                ),
+                self.current_time_bucket,
+            )
+
+            # Compare the exact bits.
+            self.assertEqual(
+                [score.hex() for score in scores.tolist()],
+                [float(score).hex() for score in expected_scores],
+            )
+            self.assertEqual(total.hex(), float(expected_total).hex())
+            self.assertEqual(index_total.hex(), float(expected_total).hex())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
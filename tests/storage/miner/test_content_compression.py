@@ -0,0 +1,81 @@
+import contextlib
+import json
+import sqlite3
+import unittest
+
+from storage.miner.content_compression import (
+    NO_DICTIONARY_ID,
+    compress_content,
+    decompress_content,
+    is_compressed,
+    register_content_functions,
+    train_dictionary,
+)
+
+
+class TestContentCompression(unittest.TestCase):
+    def _contents(self, count: int):
+        return [
+            json.dumps(
+                {"username": f"user_{i}", "text": f"Post number {i}", "url": f"https://x.com/{i}"}
+            ).encode()
+            for i in range(count)
+        ]
+
+    def test_round_trip_without_dictionary(self):
+        content = self._contents(1)[0] * 10
+        compressed = compress_content(content, NO_DICTIONARY_ID, b"")
+
+        self.assertTrue(is_compressed(compressed))
+        self.assertLess(len(compressed), len(content))
+        self.assertEqual(decompress_content(compressed, {}), content)
+
+    def test_round_trip_with_dictionary(self):
+        contents = self._contents(200)
+        dictionary = train_dictionary(contents[:100])
+        content = contents[150]
+
+        compressed = compress_content(content, 1, dictionary)
+        self.assertTrue(is_compressed(compressed))
+        self.assertLess(
+            len(compressed), len(compress_content(content * 2, NO_DICTIONARY_ID, b""))
+        )
+        self.assertEqual(decompress_content(compressed, {1: dictionary}), content)
+
+        with self.assertRaises(KeyError):
+            decompress_content(compressed, {})
+
+    def test_incompressible_content_unchanged(self):
+        content = b'{"a": 1}'
+        self.assertEqual(compress_content(content, NO_DICTIONARY_ID, b""), content)
+        self.assertFalse(is_compressed(content))
+        self.assertEqual(decompress_content(content, {}), content)
+
+    def test_sql_function_loads_dictionaries(self):
+        contents = self._contents(100)
+        dictionary = train_dictionary(contents)
+
+        with contextlib.closing(sqlite3.connect(":memory:")) as connection:
+            register_content_functions(connection)
+            connection.execute("CREATE TABLE DataEntity (content BLOB)")
+            connection.execute(
+                "CREATE TABLE ContentDictionary (id INTEGER PRIMARY KEY, source INTEGER, dictionary BLOB)"
+            )
+            connection.execute(
+                "INSERT INTO ContentDictionary VALUES (1, 2, ?)", [dictionary]
+            )
+            connection.executemany(
+                "INSERT INTO DataEntity VALUES (?)",
+                [[compress_content(contents[0], 1, dictionary)], [contents[1]]],
+            )
+
+            self.assertEqual(
+                connection.execute(
+                    "SELECT JSON_EXTRACT(decompress_content(content), '$.username') FROM DataEntity"
+                ).fetchall(),
+                [("user_0",), ("user_1",)],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import asyncio
+import datetime as dt
+import sqlite3
+import threading
+import unittest
+from unittest.mock import Mock
+
+from common.data import DataEntity, DataLabel, DataSource
+from storage.miner.ingest_writer import IngestWriter
+from storage.miner.miner_storage import MinerStorage
+import tests.utils as test_utils
+
+
+def _create_entity(uri: str) -> DataEntity:
+    return DataEntity(
+        uri=uri,
+        datetime=dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc),
+        source=DataSource.REDDIT,
+        label=DataLabel(value="r/bittensor_"),
+        content=bytes(10),
+        content_size_bytes=10,
+    )
+
+
+class TestIngestWriter(unittest.TestCase):
+    def setUp(self):
+        self.storage = Mock(spec=MinerStorage)
+        self.stored_batches = []
+        self.storage.store_data_entities.side_effect = lambda entities: self.stored_batches.append(
+            entities
+        )
+
+    def test_batches_submissions_on_stop(self):
+        """Tests that submissions are stored as a single batch when the writer is stopped."""
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(hours=1))
+        writer.start()
+
+        entities = [_create_entity(f"http://{i}") for i in range(10)]
+        for i in range(0, 10, 2):
+            writer.submit(entities[i : i + 2])
+        writer.stop()
+
+        self.assertEqual(self.stored_batches, [entities])
+        self.assertEqual(writer.get_counts(), {"accepted": 10, "duplicates": 0})
+
+    def test_flushes_on_batch_size(self):
+        """Tests that a batch is stored as soon as it reaches the max batch size."""
+        writer = IngestWriter(
+            self.storage, max_batch_entities=3, max_batch_delay=dt.timedelta(hours=1)
+        )
+        writer.start()
+
+        entities = [_create_entity(f"http://{i}") for i in range(4)]
+        writer.submit(entities[:2])
+        writer.submit(entities[2:])
+
+        test_utils.wait_for_condition(lambda: len(self.stored_batches) == 1)
+        self.assertEqual(self.stored_batches[0], entities)
+
+        writer.stop()
+        self.assertEqual(len(self.stored_batches), 1)
+
+    def test_flushes_on_batch_delay(self):
+        """Tests that a partial batch is stored once the max batch delay has passed."""
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(milliseconds=50))
+        writer.start()
+
+        entity = _create_entity("http://1")
+        writer.submit([entity])
+
+        test_utils.wait_for_condition(lambda: len(self.stored_batches) == 1)
+        self.assertEqual(self.stored_batches[0], [entity])
+
+        writer.stop()
+
+    def test_duplicates_within_batch(self):
+        """Tests that the last submission of a uri wins and earlier ones are counted as duplicates."""
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(hours=1))
+        writer.start()
+
+        first = _create_entity("http://1")
+        second = first.model_copy(update={"content": bytes(5), "content_size_bytes": 5})
+        writer.submit([first, _create_entity("http://2")])
+        writer.submit([second])
+        writer.stop()
+
+        self.assertEqual(len(self.stored_batches), 1)
+        self.assertEqual(
+            {entity.uri: entity for entity in self.stored_batches[0]}["http://1"], second
+        )
+        self.assertEqual(writer.get_counts(), {"accepted": 2, "duplicates": 1})
+
+    def test_failed_batch_not_accepted(self):
+        """Tests that a batch the storage rejects is not counted and does not stop the writer."""
+        self.storage.store_data_entities.side_effect = [ValueError("Too large"), None]
+        writer = IngestWriter(self.storage, max_batch_entities=1)
+        writer.start()
+
+        writer.submit([_create_entity("http://1")])
+        writer.submit([_create_entity("http://2")])
+        writer.stop()
+
+        self.assertEqual(self.storage.store_data_entities.call_count, 2)
+        self.assertEqual(writer.get_counts(), {"accepted": 1, "duplicates": 0})
+
+    def test_failed_batch_split_and_retried(self):
+        """Tests that a failing batch is retried in halves and only the entities that fail on their own are dropped."""
+
+        def store(entities):
+            if any(entity.uri == "http://bad" for entity in entities):
+                raise ValueError("Bad entity")
+            self.stored_batches.append(entities)
+
+        self.storage.store_data_entities.side_effect = store
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(hours=1))
+        writer.start()
+
+        entities = [_create_entity(f"http://{i}") for i in range(10)]
+        writer.submit(entities[:3] + [_create_entity("http://bad")] + entities[3:])
+        writer.stop()
+
+        self.assertEqual([entity for batch in self.stored_batches for entity in batch], entities)
+        self.assertEqual(writer.get_counts(), {"accepted": 10, "duplicates": 0})
+
+    def test_failing_storage_retried_whole(self):
+        """Tests that a batch failing on the storage itself is retried whole a few times rather than split."""
+        self.storage.store_data_entities.side_effect = sqlite3.OperationalError("database is locked")
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(hours=1))
+        writer.STORE_RETRY_BACKOFF_SECONDS = 0
+        writer.start()
+
+        writer.submit([_create_entity(f"http://{i}") for i in range(10)])
+        writer.stop()
+
+        self.assertEqual(self.storage.store_data_entities.call_count, IngestWriter.STORE_ATTEMPTS)
+        self.assertEqual(writer.get_counts(), {"accepted": 0, "duplicates": 0})
+
+    def test_storage_recovers_on_retry(self):
+        """Tests that a batch is stored once the storage stops failing."""
+        entities = [_create_entity(f"http://{i}") for i in range(10)]
+        self.storage.store_data_entities.side_effect = [sqlite3.OperationalError("disk I/O error"), None]
+        writer = IngestWriter(self.storage, max_batch_delay=dt.timedelta(hours=1))
+        writer.STORE_RETRY_BACKOFF_SECONDS = 0
+        writer.start()
+
+        writer.submit(entities)
+        writer.stop()
+
+        self.storage.store_data_entities.assert_called_with(entities)
+        self.assertEqual(writer.get_counts(), {"accepted": 10, "duplicates": 0})
+
+    def test_submit_async_waits_without_blocking(self):
+        """Tests that submit_async waits for room in a full queue without blocking the event loop."""
+        writer = IngestWriter(
+            self.storage, max_batch_delay=dt.timedelta(hours=1), max_pending_submissions=1
+        )
+        entities = [_create_entity(f"http://{i}") for i in range(2)]
+
+        async def run():
+            await writer.submit_async(entities[:1])
+            submission = asyncio.create_task(writer.submit_async(entities[1:]))
+
+            # The event loop keeps running other tasks while the queue is full.
+            await asyncio.sleep(0.3)
+            self.assertFalse(submission.done())
+
+            writer.start()
+            await asyncio.wait_for(submission, timeout=5)
+
+        asyncio.run(run())
+        writer.stop()
+
+        self.assertEqual(self.stored_batches, [entities])
+
+    def test_concurrent_producers(self):
+        """Tests that entities submitted from several threads are all stored."""
+        writer = IngestWriter(self.storage, max_batch_entities=50)
+        writer.start()
+
+        def produce(worker: int):
+            for i in range(100):
+                writer.submit([_create_entity(f"http://{worker}/{i}")])
+
+        producers = [threading.Thread(target=produce, args=(i,)) for i in range(5)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        writer.stop()
+
+        self.assertEqual(sum(len(batch) for batch in self.stored_batches), 500)
+        self.assertEqual(writer.get_counts(), {"accepted": 500, "duplicates": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
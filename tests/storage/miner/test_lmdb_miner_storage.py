@@ -0,0 +1,385 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from common import constants
+from common.data import (
+    CompressedEntityBucket,
+    DataEntity,
+    DataEntityBucketId,
+    DataLabel,
+    DataSource,
+    HuggingFaceMetadata,
+    TimeBucket,
+)
+import datetime as dt
+
+from storage.miner import lmdb_miner_storage
+from storage.miner.lmdb_miner_storage import LmdbMinerStorage
+from storage.miner.sqlite_miner_storage import SqliteMinerStorage
+from tests.storage.miner import test_sqlite_miner_storage
+
+
+@unittest.skipIf(lmdb_miner_storage.lmdb is None, "lmdb is not installed.")
+class TestLmdbMinerStorage(unittest.TestCase):
+    def setUp(self):
+        # Make a test database for the test to operate against.
+        self.test_dir = tempfile.mkdtemp()
+        self.test_storage = LmdbMinerStorage(
+            os.path.join(self.test_dir, "TestDb.lmdb"), max_database_size_gb_hint=1
+        )
+
+    def tearDown(self):
+        # Clean up the test database.
+        self.test_storage.close()
+        shutil.rmtree(self.test_dir)
+
+    def _create_entity(self, i: int, datetime: dt.datetime, label="label_1", size=10):
+        return DataEntity(
+            uri=f"test_entity_{i}",
+            datetime=datetime,
+            source=DataSource.REDDIT,
+            label=DataLabel(value=label) if label else None,
+            content=bytes(size),
+            content_size_bytes=size,
+        )
+
+    def test_store_and_list_entities_in_bucket(self):
+        """Tests that stored entities are listed back by bucket, with other buckets excluded."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entity1 = self._create_entity(1, now)
+        entity2 = self._create_entity(2, now + dt.timedelta(minutes=1))
+        # Same time bucket, different label.
+        entity3 = self._create_entity(3, now, label="label_2")
+        # Different time bucket, no label.
+        entity4 = self._create_entity(4, now + dt.timedelta(hours=1), label=None)
+        self.test_storage.store_data_entities([entity1, entity2, entity3, entity4])
+
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+            [entity1, entity2],
+        )
+
+        no_label_bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(entity4.datetime),
+            source=DataSource.REDDIT,
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(
+                no_label_bucket_id
+            ),
+            [entity4],
+        )
+
+    def test_store_naive_and_long_uri_entities(self):
+        """Tests that naive datetimes and uris longer than the LMDB key limit round trip."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0)
+        entity = DataEntity(
+            uri="https://reddit.com/" + "a" * 1000,
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=b"content",
+            content_size_bytes=7,
+        )
+        self.test_storage.store_data_entities([entity])
+
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+            [entity],
+        )
+
+    def test_store_overwrites_identical_uri(self):
+        """Tests that storing an entity with an existing uri replaces it, even across buckets."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        self.test_storage.store_data_entities([self._create_entity(1, now)])
+        updated = self._create_entity(1, now + dt.timedelta(hours=1), size=20)
+        self.test_storage.store_data_entities([updated])
+
+        old_bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        new_bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(updated.datetime),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(old_bucket_id), []
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(new_bucket_id),
+            [updated],
+        )
+        self.assertEqual(
+            [bucket.size_bytes for bucket in self.test_storage.list_data_entity_buckets()],
+            [20],
+        )
+
+    def test_store_over_max_content_size_fail(self):
+        """Tests that we except on attempts to store entities larger than maximum storage in one store call"""
+        large_entity = DataEntity(
+            uri="large_entity",
+            datetime=dt.datetime.now(),
+            source=DataSource.REDDIT,
+            content=bytes(1000),
+            content_size_bytes=2 * 1024 * 1024 * 1024,
+        )
+
+        with self.assertRaises(ValueError):
+            self.test_storage.store_data_entities([large_entity])
+
+    def test_store_over_max_content_size_clears_oldest(self):
+        """Tests that we clear the oldest content when going over maximum configured content storage."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        mb_400 = 400 * 1024 * 1024
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now + dt.timedelta(hours=i),
+                source=DataSource.REDDIT,
+                content=f"entity{i}".encode(),
+                content_size_bytes=mb_400,
+            )
+            for i in range(3)
+        ]
+        self.test_storage.store_data_entities(entities[:2])
+        self.test_storage.store_data_entities(entities[2:])
+
+        stored_uris = set()
+        for entity in entities:
+            bucket_id = DataEntityBucketId(
+                time_bucket=TimeBucket.from_datetime(entity.datetime),
+                source=DataSource.REDDIT,
+            )
+            stored_uris.update(
+                e.uri
+                for e in self.test_storage.list_data_entities_in_data_entity_bucket(
+                    bucket_id
+                )
+            )
+        self.assertEqual(stored_uris, {"test_entity_1", "test_entity_2"})
+
+    def test_get_compressed_index(self):
+        """Tests that the compressed index reports the largest buckets within the age limit."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        self.test_storage.store_data_entities(
+            [
+                self._create_entity(1, now),
+                self._create_entity(2, now, size=20),
+                self._create_entity(3, now + dt.timedelta(hours=1), label="label_2"),
+                # Too old to be included.
+                self._create_entity(
+                    4,
+                    now - dt.timedelta(days=constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS + 1),
+                ),
+            ]
+        )
+
+        index = self.test_storage.get_compressed_index()
+        self.assertEqual(
+            index.sources,
+            {
+                DataSource.REDDIT: [
+                    CompressedEntityBucket(
+                        label="label_1",
+                        time_bucket_ids=[TimeBucket.from_datetime(now).id],
+                        sizes_bytes=[30],
+                    ),
+                    CompressedEntityBucket(
+                        label="label_2",
+                        time_bucket_ids=[
+                            TimeBucket.from_datetime(now + dt.timedelta(hours=1)).id
+                        ],
+                        sizes_bytes=[10],
+                    ),
+                ]
+            },
+        )
+
+    def test_list_contents_in_data_entity_buckets(self):
+        """Tests getting contents for several buckets at once."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entities = [
+            self._create_entity(1, now, size=1),
+            self._create_entity(2, now, size=2),
+            self._create_entity(3, now, label="label_2", size=3),
+            self._create_entity(4, now + dt.timedelta(hours=1), size=4),
+        ]
+        self.test_storage.store_data_entities(entities)
+
+        bucket1_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        bucket2_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now + dt.timedelta(hours=1)),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        missing_bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.X,
+        )
+
+        buckets_to_contents = self.test_storage.list_contents_in_data_entity_buckets(
+            [bucket1_id, bucket2_id, missing_bucket_id]
+        )
+        self.assertEqual(
+            dict(buckets_to_contents),
+            {bucket1_id: [bytes(1), bytes(2)], bucket2_id: [bytes(4)]},
+        )
+
+    def test_clear_expired_content(self):
+        """Tests that time buckets past the age limit are cleared across sources."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        expired = now - dt.timedelta(days=constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS + 1)
+        fresh_entity = self._create_entity(1, now)
+        expired_x_entity = DataEntity(
+            uri="test_entity_3",
+            datetime=expired,
+            source=DataSource.X,
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        self.test_storage.store_data_entities(
+            [fresh_entity, self._create_entity(2, expired), expired_x_entity]
+        )
+
+        self.test_storage.clear_expired_content(time_delta=dt.timedelta(hours=1))
+
+        for entity in [fresh_entity, expired_x_entity]:
+            bucket_id = DataEntityBucketId(
+                time_bucket=TimeBucket.from_datetime(entity.datetime),
+                source=entity.source,
+                label=entity.label,
+            )
+            self.assertEqual(
+                self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+                [fresh_entity] if entity is fresh_entity else [],
+            )
+        with self.test_storage.env.begin() as txn:
+            self.assertEqual(self.test_storage._get_content_size(txn), 10)
+
+    def test_hf_metadata(self):
+        """Tests that the two most recently updated HuggingFaceMetadata are returned for the unique id."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        hf_metadatas = [
+            HuggingFaceMetadata(
+                repo_name=f"repo_{i}_abc",
+                source=DataSource.REDDIT,
+                updated_at=now + dt.timedelta(hours=i),
+                encoding_key=None,
+            )
+            for i in range(3)
+        ]
+        self.test_storage.store_hf_dataset_info(hf_metadatas)
+
+        self.assertEqual(
+            self.test_storage.get_hf_metadata("abc"), [hf_metadatas[2], hf_metadatas[1]]
+        )
+        self.assertEqual(self.test_storage.get_hf_metadata("xyz"), [])
+
+    @unittest.skip("Skip the storage backend benchmark by default.")
+    def test_backend_benchmark(self):
+        """Compares insert throughput and bucket read latency of the lmdb and sqlite backends."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        batches = [
+            [
+                DataEntity(
+                    uri=f"test_entity_{batch}_{i}",
+                    datetime=now - dt.timedelta(hours=i % 24),
+                    source=DataSource.REDDIT,
+                    label=DataLabel(value=f"label_{i % 10}"),
+                    content=bytes(1000),
+                    content_size_bytes=1000,
+                )
+                for i in range(1000)
+            ]
+            for batch in range(100)
+        ]
+        bucket_ids = [
+            DataEntityBucketId(
+                time_bucket=TimeBucket.from_datetime(now - dt.timedelta(hours=i % 24)),
+                source=DataSource.REDDIT,
+                label=DataLabel(value=f"label_{i % 10}"),
+            )
+            for i in range(100)
+        ]
+
+        sqlite_storage = SqliteMinerStorage(
+            os.path.join(self.test_dir, "TestDb.sqlite"), max_database_size_gb_hint=1
+        )
+        for name, storage in (("sqlite", sqlite_storage), ("lmdb", self.test_storage)):
+            start = time.time()
+            for batch in batches:
+                storage.store_data_entities(batch)
+            elapsed = time.time() - start
+            print(f"{name}: stored {len(batches) * 1000} entities in {elapsed:.3f}s")
+
+            start = time.time()
+            for bucket_id in bucket_ids:
+                storage.list_data_entities_in_data_entity_bucket(bucket_id)
+            elapsed = time.time() - start
+            print(
+                f"{name}: read {len(bucket_ids)} buckets in {elapsed:.3f}s ({elapsed / len(bucket_ids) * 1000:.3f}ms per bucket)"
+            )
+        sqlite_storage.close()
+
+
+@unittest.skipIf(lmdb_miner_storage.lmdb is None, "lmdb is not installed.")
+class TestLmdbMinerStorageCases(test_sqlite_miner_storage.TestSqliteMinerStorage):
+    """Runs the SqliteMinerStorage suite against LmdbMinerStorage."""
+
+    # Tests that read or write the SQLite tables, connections or compression directly.
+    SQLITE_ONLY_TESTS = {
+        "test_bucket_summary_backfilled_for_existing_database",
+        "test_bucket_summary_tracks_store_overwrite_and_clear",
+        "test_clear_content_from_oldest_more_than_stored",
+        "test_clear_content_from_oldest_partial_time_bucket",
+        "test_clear_expired_content",
+        "test_compressed_content_readable_without_compression",
+        "test_compressed_content_round_trip",
+        "test_content_size_tracks_store_overwrite_and_clear",
+        "test_keyword_index",
+        "test_keyword_index_added_to_existing_database",
+        "test_read_only_serving_connection",
+        "test_reconcile_content_size",
+        "test_reconcile_content_size_per_partition",
+        "test_store_entities",
+        "test_store_over_max_content_size_succeeds",
+        "test_store_overwrite_moves_partition",
+        "test_unpartitioned_database_partitioned",
+    }
+
+    def setUp(self):
+        if self._testMethodName in self.SQLITE_ONLY_TESTS:
+            self.skipTest("Inspects SqliteMinerStorage internals.")
+
+        self.test_dir = tempfile.mkdtemp()
+        self.test_storage = LmdbMinerStorage(
+            os.path.join(self.test_dir, "TestDb.lmdb"), max_database_size_gb_hint=1
+        )
+
+    def tearDown(self):
+        self.test_storage.close()
+        shutil.rmtree(self.test_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
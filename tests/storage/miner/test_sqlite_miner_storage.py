@@ -2,6 +2,7 @@ import contextlib
 import time
 import unittest
 import os
+import sqlite3
 
 from common import constants
 from common.data import (
@@ -31,6 +32,7 @@ class TestSqliteMinerStorage(unittest.TestCase):
 
     def tearDown(self):
         # Clean up the test database.
+        self.test_storage.close()
         os.remove(self.test_storage.database)
 
     def test_instantiate_sqlite_miner_storage(self):
@@ -167,6 +169,607 @@ class TestSqliteMinerStorage(unittest.TestCase):
 
             self.assertEqual(uris, ["test_entity_2", "test_entity_3"])
 
+    def test_clear_content_from_oldest_partial_time_bucket(self):
+        """Tests that clearing removes whole older time buckets and only the oldest rows of the last one."""
+        start = dt.datetime(2024, 1, 2, 3, 0, 0, tzinfo=dt.timezone.utc)
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=start + dt.timedelta(minutes=20 * i),
+                source=DataSource.REDDIT,
+                content=bytes(10),
+                content_size_bytes=10,
+            )
+            for i in range(6)
+        ]
+        self.test_storage.store_data_entities(entities)
+
+        # Use a tiny batch size to exercise deleting across several transactions.
+        self.test_storage.CLEAR_CONTENT_BATCH_SIZE = 2
+
+        # Clear the first time bucket (3 entities) plus one entity of the second.
+        self.test_storage.clear_content_from_oldest(40)
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT uri FROM DataEntity ORDER BY datetime ASC")
+            uris = [row["uri"] for row in cursor]
+
+        self.assertEqual(uris, ["test_entity_4", "test_entity_5"])
+
+    def test_clear_content_from_oldest_more_than_stored(self):
+        """Tests that clearing more content than is stored clears everything."""
+        now = dt.datetime(2024, 1, 2, 3, 0, 0, tzinfo=dt.timezone.utc)
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now + dt.timedelta(hours=i),
+                source=DataSource.X,
+                content=bytes(10),
+                content_size_bytes=10,
+            )
+            for i in range(3)
+        ]
+        self.test_storage.store_data_entities(entities)
+
+        self.test_storage.clear_content_from_oldest(1000)
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM DataEntity")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def _read_bucket_summary(self):
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT timeBucketId, source, label, bucketSize, entityCount FROM BucketSummary"
+            )
+            return {
+                (row["timeBucketId"], row["source"], row["label"]): (
+                    row["bucketSize"],
+                    row["entityCount"],
+                )
+                for row in cursor
+            }
+
+    def test_bucket_summary_tracks_store_overwrite_and_clear(self):
+        """Tests that the BucketSummary stays in sync with inserts, overwrites and deletes."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        time_bucket_id = TimeBucket.from_datetime(now).id
+        entity1 = DataEntity(
+            uri="test_entity_1",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        entity2 = DataEntity(
+            uri="test_entity_2",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=bytes(20),
+            content_size_bytes=20,
+        )
+        entity3 = DataEntity(
+            uri="test_entity_3",
+            datetime=now + dt.timedelta(hours=1),
+            source=DataSource.X,
+            content=bytes(30),
+            content_size_bytes=30,
+        )
+
+        self.test_storage.store_data_entities([entity1, entity2, entity3])
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {
+                (time_bucket_id, DataSource.REDDIT, "label_1"): (30, 2),
+                (time_bucket_id + 1, DataSource.X, "NULL"): (30, 1),
+            },
+        )
+
+        # Overwrite entity2 with new content and a new label.
+        entity2_updated = DataEntity(
+            uri="test_entity_2",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_2"),
+            content=bytes(50),
+            content_size_bytes=50,
+        )
+        self.test_storage.store_data_entities([entity2_updated])
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {
+                (time_bucket_id, DataSource.REDDIT, "label_1"): (10, 1),
+                (time_bucket_id, DataSource.REDDIT, "label_2"): (50, 1),
+                (time_bucket_id + 1, DataSource.X, "NULL"): (30, 1),
+            },
+        )
+
+        # Clearing the oldest content removes the emptied buckets entirely.
+        self.test_storage.clear_content_from_oldest(60)
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {(time_bucket_id + 1, DataSource.X, "NULL"): (30, 1)},
+        )
+
+    def test_bucket_summary_backfilled_for_existing_database(self):
+        """Tests that an existing database without a BucketSummary is summarized on startup."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entity = DataEntity(
+            uri="test_entity_1",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        self.test_storage.store_data_entities([entity])
+
+        # Simulate a database created by a previous version.
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            connection.execute("DROP TABLE BucketSummary")
+            connection.commit()
+
+        self.test_storage.close()
+        self.test_storage = SqliteMinerStorage(
+            "TestDb.sqlite", max_database_size_gb_hint=1
+        )
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {
+                (TimeBucket.from_datetime(now).id, DataSource.REDDIT, "label_1"): (
+                    10,
+                    1,
+                )
+            },
+        )
+
+    def _read_content_size(self):
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT IFNULL(SUM(contentSizeBytes), 0) FROM DataEntityPartition")
+            return cursor.fetchone()[0]
+
+    def test_content_size_tracks_store_overwrite_and_clear(self):
+        """Tests that the running content size total stays in sync with inserts, overwrites and deletes."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entity1 = DataEntity(
+            uri="test_entity_1",
+            datetime=now,
+            source=DataSource.REDDIT,
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        entity2 = DataEntity(
+            uri="test_entity_2",
+            datetime=now + dt.timedelta(hours=1),
+            source=DataSource.X,
+            content=bytes(20),
+            content_size_bytes=20,
+        )
+
+        self.assertEqual(self._read_content_size(), 0)
+
+        self.test_storage.store_data_entities([entity1, entity2])
+        self.assertEqual(self._read_content_size(), 30)
+
+        # Overwrite entity2 with larger content.
+        entity2_updated = DataEntity(
+            uri="test_entity_2",
+            datetime=now + dt.timedelta(hours=1),
+            source=DataSource.X,
+            content=bytes(50),
+            content_size_bytes=50,
+        )
+        self.test_storage.store_data_entities([entity2_updated])
+        self.assertEqual(self._read_content_size(), 60)
+
+        self.test_storage.clear_content_from_oldest(10)
+        self.assertEqual(self._read_content_size(), 50)
+
+    def test_reconcile_content_size(self):
+        """Tests that drift in the running content size total is corrected by reconciliation."""
+        entity = DataEntity(
+            uri="test_entity_1",
+            datetime=dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc),
+            source=DataSource.REDDIT,
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        self.test_storage.store_data_entities([entity])
+
+        # Introduce drift.
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            connection.execute("UPDATE DataEntityPartition SET contentSizeBytes = 1000")
+            connection.commit()
+
+        # Reconciliation is skipped while the last one is still fresh.
+        self.test_storage.reconcile_content_size(time_delta=dt.timedelta(hours=1))
+        self.assertEqual(self._read_content_size(), 1000)
+
+        self.test_storage.reconcile_content_size(time_delta=dt.timedelta(0))
+        self.assertEqual(self._read_content_size(), 10)
+
+    def test_reconcile_content_size_per_partition(self):
+        """Tests that drift is corrected in the partition it occurred in, leaving the other partitions' totals alone."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now + dt.timedelta(days=7 * i),
+                source=DataSource.REDDIT,
+                content=bytes(10 * (i + 1)),
+                content_size_bytes=10 * (i + 1),
+            )
+            for i in range(2)
+        ]
+        self.test_storage.store_data_entities(entities)
+        drifted_partition_id = SqliteMinerStorage._get_partition_id(
+            TimeBucket.from_datetime(entities[0].datetime).id
+        )
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            connection.execute(
+                "UPDATE DataEntityPartition SET contentSizeBytes = 0, storedSizeBytes = 5 WHERE id = ?",
+                [drifted_partition_id],
+            )
+            connection.commit()
+
+        self.test_storage.reconcile_content_size(time_delta=dt.timedelta(0))
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertEqual(
+                [
+                    tuple(row)
+                    for row in connection.execute(
+                        "SELECT contentSizeBytes, storedSizeBytes FROM DataEntityPartition ORDER BY id"
+                    )
+                ],
+                [(10, 10), (20, 20)],
+            )
+
+    def test_clear_expired_content(self):
+        """Tests that partitions past the age limit are dropped, at most once per period."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        # Old enough for the whole partition to have expired.
+        expired = now - dt.timedelta(days=constants.DATA_ENTITY_BUCKET_AGE_LIMIT_DAYS + 8)
+
+        def create_entity(uri: str, datetime: dt.datetime):
+            return DataEntity(
+                uri=uri,
+                datetime=datetime,
+                source=DataSource.REDDIT,
+                label=DataLabel(value="label_1"),
+                content=bytes(10),
+                content_size_bytes=10,
+            )
+
+        self.test_storage.store_data_entities(
+            [
+                create_entity("fresh", now),
+                create_entity("expired_1", expired),
+                create_entity("expired_2", expired - dt.timedelta(hours=5)),
+            ]
+        )
+
+        self.test_storage.clear_expired_content(time_delta=dt.timedelta(hours=1))
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {(TimeBucket.from_datetime(now).id, DataSource.REDDIT, "label_1"): (10, 1)},
+        )
+        self.assertEqual(self._read_content_size(), 10)
+        expired_partition_id = SqliteMinerStorage._get_partition_id(
+            TimeBucket.from_datetime(expired).id
+        )
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertIsNone(
+                connection.execute(
+                    "SELECT name FROM sqlite_master WHERE name = ?",
+                    [f"DataEntity_{expired_partition_id}"],
+                ).fetchone()
+            )
+
+        # A second call within the period does nothing.
+        self.test_storage.store_data_entities([create_entity("expired_3", expired)])
+        self.test_storage.clear_expired_content(time_delta=dt.timedelta(hours=1))
+        self.assertEqual(self._read_content_size(), 20)
+
+        self.test_storage.clear_expired_content(time_delta=dt.timedelta(0))
+        self.assertEqual(self._read_content_size(), 10)
+
+    def _create_json_entities(self, count: int, start: int = 0):
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        return [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now,
+                source=DataSource.X,
+                label=DataLabel(value="#bitcoin"),
+                content=f'{{"username": "user_{i}", "text": "Post number {i} about #bitcoin", "url": "https://x.com/user_{i}/status/{i}"}}'.encode(),
+                content_size_bytes=len(
+                    f'{{"username": "user_{i}", "text": "Post number {i} about #bitcoin", "url": "https://x.com/user_{i}/status/{i}"}}'.encode()
+                ),
+            )
+            for i in range(start, start + count)
+        ]
+
+    def test_compressed_content_round_trip(self):
+        """Tests that compressed content is served unchanged while taking up less stored space."""
+        self.test_storage.compress_content = True
+        # Enough entities to train a dictionary part way through.
+        entities = self._create_json_entities(1000)
+        self.test_storage.store_data_entities(entities)
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertEqual(
+                connection.execute("SELECT COUNT(*) FROM ContentDictionary").fetchone()[0],
+                1,
+            )
+            stored_contents = [
+                row[0] for row in connection.execute("SELECT content FROM DataEntity")
+            ]
+            content_size, stored_size = connection.execute(
+                "SELECT SUM(contentSizeBytes), SUM(storedSizeBytes) FROM DataEntityPartition"
+            ).fetchone()
+
+        self.assertTrue(all(content.startswith(b"\x00") for content in stored_contents))
+        self.assertEqual(content_size, sum(e.content_size_bytes for e in entities))
+        self.assertEqual(stored_size, sum(len(content) for content in stored_contents))
+        self.assertLess(stored_size, content_size)
+
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(entities[0].datetime),
+            source=DataSource.X,
+            label=DataLabel(value="#bitcoin"),
+        )
+        self.assertEqual(
+            sorted(
+                self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+                key=lambda e: e.uri,
+            ),
+            sorted(entities, key=lambda e: e.uri),
+        )
+        self.assertEqual(
+            sorted(self.test_storage.list_contents_in_data_entity_buckets([bucket_id])[bucket_id]),
+            sorted(e.content for e in entities),
+        )
+
+        # Reconciling the sizes from the table finds no drift.
+        self.test_storage.reconcile_content_size(time_delta=dt.timedelta(0))
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertEqual(
+                tuple(
+                    connection.execute(
+                        "SELECT SUM(contentSizeBytes), SUM(storedSizeBytes) FROM DataEntityPartition"
+                    ).fetchone()
+                ),
+                (content_size, stored_size),
+            )
+
+    def test_compressed_content_readable_without_compression(self):
+        """Tests that compressed content stays readable once compression is turned off and mixes with raw content."""
+        self.test_storage.compress_content = True
+        compressed_entities = self._create_json_entities(1000)
+        self.test_storage.store_data_entities(compressed_entities)
+
+        self.test_storage.close()
+        self.test_storage = SqliteMinerStorage(
+            "TestDb.sqlite", max_database_size_gb_hint=1
+        )
+        raw_entities = self._create_json_entities(10, start=1000)
+        self.test_storage.store_data_entities(raw_entities)
+
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(raw_entities[0].datetime),
+            source=DataSource.X,
+            label=DataLabel(value="#bitcoin"),
+        )
+        self.assertEqual(
+            sorted(
+                self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+                key=lambda e: e.uri,
+            ),
+            sorted(compressed_entities + raw_entities, key=lambda e: e.uri),
+        )
+
+    def test_unpartitioned_database_partitioned(self):
+        """Tests that the DataEntity table of a previous version is moved into partitions on startup."""
+        self.test_storage.close()
+        os.remove(self.test_storage.database)
+
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now + dt.timedelta(days=5 * i),
+                source=DataSource.REDDIT,
+                label=DataLabel(value="label_1"),
+                content=bytes(10 + i),
+                content_size_bytes=10 + i,
+            )
+            for i in range(3)
+        ]
+
+        # Simulate a database created by a previous version.
+        with contextlib.closing(sqlite3.connect("TestDb.sqlite")) as connection:
+            connection.execute(
+                """CREATE TABLE DataEntity (
+                    uri TEXT PRIMARY KEY, datetime TIMESTAMP(6) NOT NULL, timeBucketId INTEGER NOT NULL,
+                    source INTEGER NOT NULL, label CHAR(32), content BLOB NOT NULL, contentSizeBytes INTEGER NOT NULL
+                ) WITHOUT ROWID"""
+            )
+            connection.execute("CREATE TABLE ContentSize (id INTEGER PRIMARY KEY, contentSizeBytes INTEGER)")
+            connection.execute("INSERT INTO ContentSize VALUES (0, 0)")
+            connection.execute(
+                """CREATE TRIGGER content_size_insert AFTER INSERT ON DataEntity
+                    BEGIN
+                        UPDATE ContentSize SET contentSizeBytes = contentSizeBytes + NEW.contentSizeBytes;
+                    END"""
+            )
+            connection.executemany(
+                "INSERT INTO DataEntity VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        entity.uri,
+                        entity.datetime,
+                        TimeBucket.from_datetime(entity.datetime).id,
+                        entity.source,
+                        entity.label.value,
+                        entity.content,
+                        entity.content_size_bytes,
+                    )
+                    for entity in entities
+                ],
+            )
+            connection.commit()
+
+        self.test_storage = SqliteMinerStorage(
+            "TestDb.sqlite", max_database_size_gb_hint=1
+        )
+
+        partition_ids = sorted(
+            {
+                SqliteMinerStorage._get_partition_id(TimeBucket.from_datetime(entity.datetime).id)
+                for entity in entities
+            }
+        )
+        self.assertGreater(len(partition_ids), 1)
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertEqual(
+                self.test_storage._get_partition_ids(connection.cursor()), partition_ids
+            )
+            self.assertIsNone(
+                connection.execute(
+                    "SELECT name FROM sqlite_master WHERE name IN ('ContentSize', 'UnpartitionedDataEntity')"
+                ).fetchone()
+            )
+        self.assertEqual(self._read_content_size(), 33)
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {
+                (TimeBucket.from_datetime(entity.datetime).id, DataSource.REDDIT, "label_1"): (
+                    entity.content_size_bytes,
+                    1,
+                )
+                for entity in entities
+            },
+        )
+        for entity in entities:
+            bucket_id = DataEntityBucketId(
+                time_bucket=TimeBucket.from_datetime(entity.datetime),
+                source=DataSource.REDDIT,
+                label=DataLabel(value="label_1"),
+            )
+            self.assertEqual(
+                self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id), [entity]
+            )
+
+    def test_store_overwrite_moves_partition(self):
+        """Tests that overwriting a DataEntity with a datetime in another partition moves it there."""
+        now = dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc)
+        entity = DataEntity(
+            uri="test_entity_1",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        moved_entity = entity.model_copy(
+            update={"datetime": now + dt.timedelta(days=14), "content": bytes(20), "content_size_bytes": 20}
+        )
+        self.test_storage.store_data_entities([entity])
+        self.test_storage.store_data_entities([moved_entity])
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertEqual(
+                [tuple(row) for row in connection.execute("SELECT uri, contentSizeBytes FROM DataEntity")],
+                [("test_entity_1", 20)],
+            )
+        self.assertEqual(self._read_content_size(), 20)
+        self.assertEqual(
+            self._read_bucket_summary(),
+            {(TimeBucket.from_datetime(moved_entity.datetime).id, DataSource.REDDIT, "label_1"): (20, 1)},
+        )
+
+    def _search_keyword_index(self, keyword: str):
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            return sorted(
+                row[0]
+                for row in connection.execute(
+                    "SELECT uri FROM DataEntityTextIndex WHERE text MATCH ?",
+                    [f'"{keyword}"'],
+                )
+            )
+
+    def test_keyword_index(self):
+        """Tests that the keyword index follows stored, overwritten and cleared DataEntities."""
+        self.test_storage.close()
+        self.test_storage = SqliteMinerStorage(
+            "TestDb.sqlite", max_database_size_gb_hint=1, index_keywords=True
+        )
+        self.test_storage.compress_content = True
+        entities = self._create_json_entities(3)
+        reddit_entity = DataEntity(
+            uri="reddit_entity",
+            datetime=dt.datetime(2024, 1, 2, 3, 30, 0, tzinfo=dt.timezone.utc),
+            source=DataSource.REDDIT,
+            content=b'{"title": "Bitcoin news", "body": "Number go up"}',
+            content_size_bytes=48,
+        )
+        self.test_storage.store_data_entities(entities + [reddit_entity])
+
+        self.assertEqual(
+            self._search_keyword_index("BITCOIN"),
+            ["reddit_entity", "test_entity_0", "test_entity_1", "test_entity_2"],
+        )
+        self.assertEqual(self._search_keyword_index("go up"), ["reddit_entity"])
+        self.assertEqual(self._search_keyword_index("number 1 "), ["test_entity_1"])
+
+        # Overwriting an entity replaces its text.
+        self.test_storage.store_data_entities(
+            [entities[0].model_copy(update={"content": b'{"text": "Post about tao"}'})]
+        )
+        self.assertEqual(self._search_keyword_index("tao"), ["test_entity_0"])
+        self.assertNotIn("test_entity_0", self._search_keyword_index("bitcoin"))
+
+        # Clearing entities removes their text.
+        self.test_storage.clear_content_from_oldest(1_000_000)
+        self.assertEqual(self._search_keyword_index("bitcoin"), [])
+
+    def test_keyword_index_added_to_existing_database(self):
+        """Tests that enabling the keyword index indexes previously stored DataEntities, and disabling drops it."""
+        self.test_storage.compress_content = True
+        self.test_storage.store_data_entities(self._create_json_entities(1000))
+
+        self.test_storage.close()
+        self.test_storage = SqliteMinerStorage(
+            "TestDb.sqlite", max_database_size_gb_hint=1, index_keywords=True
+        )
+        self.assertEqual(self._search_keyword_index("number 999 "), ["test_entity_999"])
+
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            # The indexed datetime is the exact stored value, for paging alongside DataEntity.
+            self.assertEqual(
+                connection.execute(
+                    """SELECT COUNT(*) FROM DataEntity d JOIN DataEntityText t
+                        ON t.uri = d.uri AND t.datetime = d.datetime"""
+                ).fetchone()[0],
+                1000,
+            )
+
+        self.test_storage.close()
+        self.test_storage = SqliteMinerStorage("TestDb.sqlite", max_database_size_gb_hint=1)
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            self.assertIsNone(
+                connection.execute(
+                    "SELECT name FROM sqlite_master WHERE name LIKE 'DataEntityText%'"
+                ).fetchone()
+            )
+
     def test_get_compressed_index(self):
         """Tests that we can get the compressed miner index from storage."""
         now = dt.datetime.now()
@@ -1383,6 +1986,142 @@ class TestSqliteMinerStorage(unittest.TestCase):
             constants.BULK_CONTENTS_COUNT_LIMIT,
         )
 
+    def test_read_only_serving_connection(self):
+        """Tests that the serving connections can read stored entities but never write."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        entity = DataEntity(
+            uri="test_entity_1",
+            datetime=now,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+            content=bytes(10),
+            content_size_bytes=10,
+        )
+        self.test_storage.store_data_entities([entity])
+
+        with self.test_storage._pooled_connection(read_only=True) as connection:
+            self.assertEqual(
+                connection.execute("SELECT COUNT(*) FROM DataEntity").fetchone()[0], 1
+            )
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.execute("DELETE FROM DataEntity")
+
+        # Confirm the served entity matches the stored one.
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        self.assertEqual(
+            self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id),
+            [entity],
+        )
+
+    @unittest.skip("Skip the bulk contents benchmark by default.")
+    def test_list_contents_in_data_entity_buckets_benchmark(self):
+        """Measures getting contents for 100 buckets from a 10M row database."""
+        row_count = 10_000_000
+        bucket_count = 100
+        labels = [f"label_{i}" for i in range(1000)]
+        start_time_bucket_id = TimeBucket.from_datetime(
+            dt.datetime.now(tz=dt.timezone.utc)
+        ).id - 24 * 30
+
+        # Insert rows directly to skip model validation while building the synthetic database.
+        def rows():
+            for i in range(row_count):
+                time_bucket_id = start_time_bucket_id + i % (24 * 30)
+                yield (
+                    f"test_entity_{i}",
+                    TimeBucket.to_date_range(TimeBucket(id=time_bucket_id)).start,
+                    time_bucket_id,
+                    DataSource.REDDIT,
+                    labels[i % len(labels)],
+                    bytes(10),
+                    10,
+                )
+
+        creation_start = time.time()
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            rows_by_partition = {}
+            for row in rows():
+                rows_by_partition.setdefault(
+                    SqliteMinerStorage._get_partition_id(row[2]), []
+                ).append(row)
+            for partition_id, partition_rows in rows_by_partition.items():
+                self.test_storage._create_partition(cursor, partition_id)
+                cursor.executemany(
+                    f"INSERT INTO DataEntity_{partition_id} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    partition_rows,
+                )
+            self.test_storage._create_views(cursor)
+            connection.commit()
+        print(f"Finished storing {row_count} rows in {time.time() - creation_start}")
+
+        bucket_ids = [
+            DataEntityBucketId(
+                time_bucket=TimeBucket(id=start_time_bucket_id + i),
+                source=DataSource.REDDIT,
+                label=DataLabel(value=labels[i]),
+            )
+            for i in range(bucket_count)
+        ]
+
+        list_start = time.time()
+        buckets_to_contents = self.test_storage.list_contents_in_data_entity_buckets(
+            bucket_ids
+        )
+        print(
+            f"Finished listing contents for {bucket_count} buckets in {time.time() - list_start}"
+        )
+
+        self.assertEqual(
+            sum(len(contents) for contents in buckets_to_contents.values()),
+            sum(
+                1
+                for i in range(row_count)
+                if i % (24 * 30) < bucket_count
+                and i % len(labels) == i % (24 * 30)
+            ),
+        )
+
+    @unittest.skip("Skip the connection pool benchmark by default.")
+    def test_connection_pool_benchmark(self):
+        """Compares per request latency with a fresh connection per call against pooled connections."""
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        entities = [
+            DataEntity(
+                uri=f"test_entity_{i}",
+                datetime=now,
+                source=DataSource.REDDIT,
+                label=DataLabel(value="label_1"),
+                content=bytes(100),
+                content_size_bytes=100,
+            )
+            for i in range(10)
+        ]
+        self.test_storage.store_data_entities(entities)
+
+        bucket_id = DataEntityBucketId(
+            time_bucket=TimeBucket.from_datetime(now),
+            source=DataSource.REDDIT,
+            label=DataLabel(value="label_1"),
+        )
+        requests = 1000
+
+        for pool_size in (0, SqliteMinerStorage.CONNECTION_POOL_SIZE):
+            self.test_storage.close()
+            self.test_storage.CONNECTION_POOL_SIZE = pool_size
+
+            start = time.time()
+            for _ in range(requests):
+                self.test_storage.list_data_entities_in_data_entity_bucket(bucket_id)
+            elapsed = time.time() - start
+            print(
+                f"Pool size {pool_size}: {requests} requests in {elapsed:.3f}s ({elapsed / requests * 1000:.3f}ms per request)"
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
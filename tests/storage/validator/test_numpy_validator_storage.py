@@ -0,0 +1,208 @@
+import contextlib
+import random
+import threading
+import time
+import unittest
+
+from common.constants import DATA_ENTITY_BUCKET_COUNT_LIMIT_PER_MINER_INDEX_PROTOCOL_4
+from common.data import CompressedEntityBucket, CompressedMinerIndex, DataSource
+from storage.validator.numpy_validator_storage import NumpyValidatorStorage
+from storage.validator.sqlite_memory_validator_storage import (
+    SqliteMemoryValidatorStorage,
+)
+
+FIRST_TIME_BUCKET_ID = 1_000_000
+
+
+def _bucket_tuples(storage, hotkey: str):
+    index = storage.read_miner_index(hotkey)
+    return [
+        (bucket.source, bucket.label, bucket.time_bucket_id, bucket.size_bytes, bucket.scorable_bytes)
+        for bucket in index.scorable_data_entity_buckets
+    ]
+
+
+def _create_random_index(rng: random.Random, labels, num_buckets: int) -> CompressedMinerIndex:
+    sources = {}
+    for _ in range(num_buckets // 10):
+        source = rng.choice([DataSource.REDDIT.value, DataSource.X.value])
+        time_bucket_ids = [FIRST_TIME_BUCKET_ID + rng.randrange(50) for _ in range(10)]
+        sources.setdefault(source, []).append(
+            CompressedEntityBucket(
+                label=rng.choice(labels),
+                time_bucket_ids=time_bucket_ids,
+                # Include zero sizes, whose buckets can have a zero total.
+                sizes_bytes=[rng.choice([0, rng.randrange(1, 10_000_000)]) for _ in time_bucket_ids],
+            )
+        )
+    return CompressedMinerIndex(sources=sources)
+
+
+class TestNumpyValidatorStorage(unittest.TestCase):
+    def setUp(self):
+        self.test_storage = NumpyValidatorStorage()
+
+    def test_read_non_existing_miner_index(self):
+        """Tests that we correctly return none for a non existing miner index."""
+        self.assertIsNone(self.test_storage.read_miner_index("hotkey1"))
+        self.assertIsNone(self.test_storage.read_miner_last_updated("hotkey1"))
+
+    def test_read_miner_index(self):
+        """Tests that buckets are scored on the share of their total content size across miners."""
+        index_1 = CompressedMinerIndex(
+            sources={
+                DataSource.REDDIT.value: [
+                    CompressedEntityBucket(label="Label_1", time_bucket_ids=[5, 5, 6], sizes_bytes=[10, 20, 30])
+                ],
+                DataSource.X.value: [
+                    CompressedEntityBucket(label=None, time_bucket_ids=[5], sizes_bytes=[50])
+                ],
+            }
+        )
+        index_2 = CompressedMinerIndex(
+            sources={
+                DataSource.REDDIT.value: [
+                    CompressedEntityBucket(label="label_1", time_bucket_ids=[5], sizes_bytes=[40])
+                ]
+            }
+        )
+
+        self.test_storage.upsert_compressed_miner_index(index_1, "hotkey1", 1)
+        self.test_storage.upsert_compressed_miner_index(index_2, "hotkey2", 1)
+
+        # The first of the duplicate buckets is kept and labels are casefolded.
+        self.assertEqual(
+            _bucket_tuples(self.test_storage, "hotkey1"),
+            [
+                (DataSource.REDDIT.value, "label_1", 5, 10, 2),
+                (DataSource.REDDIT.value, "label_1", 6, 30, 30),
+                (DataSource.X.value, None, 5, 50, 50),
+            ],
+        )
+        self.assertIsNotNone(self.test_storage.read_miner_last_updated("hotkey1"))
+
+    def test_delete_miner(self):
+        """Tests that deleting a miner removes its index and its contribution to the bucket totals."""
+        index = CompressedMinerIndex(
+            sources={
+                DataSource.REDDIT.value: [
+                    CompressedEntityBucket(label="label_1", time_bucket_ids=[5], sizes_bytes=[10])
+                ]
+            }
+        )
+        self.test_storage.upsert_compressed_miner_index(index, "hotkey1", 1)
+        self.test_storage.upsert_compressed_miner_index(index, "hotkey2", 1)
+        self.assertEqual(_bucket_tuples(self.test_storage, "hotkey1")[0][4], 5)
+
+        self.test_storage.delete_miner("hotkey2")
+
+        self.assertIsNone(self.test_storage.read_miner_index("hotkey2"))
+        self.assertEqual(_bucket_tuples(self.test_storage, "hotkey1")[0][4], 10)
+
+        self.test_storage.delete_miner("hotkey1")
+        self.assertEqual(len(self.test_storage._snapshot.total_keys), 0)
+
+    def test_matches_sqlite_storage(self):
+        """Tests that random upserts and deletes read back exactly like the SQLite storage."""
+        rng = random.Random(42)
+        sqlite_storage = SqliteMemoryValidatorStorage()
+        # Delete the shared in memory db afterwards.
+        self.addCleanup(sqlite_storage.continuous_connection_do_not_reuse.close)
+        labels = [None] + [f"numpy_label_{i}" for i in range(20)]
+        hotkeys = [f"numpy_hotkey{i}" for i in range(8)]
+
+        for _ in range(30):
+            hotkey = rng.choice(hotkeys)
+            if rng.random() < 0.2:
+                sqlite_storage.delete_miner(hotkey)
+                self.test_storage.delete_miner(hotkey)
+            else:
+                index = _create_random_index(rng, labels, 500)
+                sqlite_storage.upsert_compressed_miner_index(index, hotkey, 1)
+                self.test_storage.upsert_compressed_miner_index(index, hotkey, 1)
+
+            for hotkey in hotkeys:
+                if sqlite_storage.read_miner_index(hotkey) is None:
+                    self.assertIsNone(self.test_storage.read_miner_index(hotkey))
+                else:
+                    self.assertEqual(
+                        sorted(_bucket_tuples(self.test_storage, hotkey), key=str),
+                        sorted(_bucket_tuples(sqlite_storage, hotkey), key=str),
+                    )
+
+    def test_reads_during_upserts(self):
+        """Tests that reads racing upserts always see a consistent index."""
+        rng = random.Random(7)
+        labels = [f"label{i}" for i in range(10)]
+        for hotkey in ("hotkey1", "hotkey2"):
+            self.test_storage.upsert_compressed_miner_index(
+                _create_random_index(rng, labels, 1_000), hotkey, 1
+            )
+
+        done = threading.Event()
+
+        def _write():
+            for _ in range(20):
+                self.test_storage.upsert_compressed_miner_index(
+                    _create_random_index(rng, labels, 1_000), "hotkey2", 1
+                )
+            done.set()
+
+        writer = threading.Thread(target=_write)
+        writer.start()
+        # ScorableDataEntityBucket raises if a read mixed an index with totals from before it was upserted.
+        while not done.is_set():
+            self.assertIsNotNone(self.test_storage.read_miner_index("hotkey2"))
+        writer.join()
+
+    @unittest.skip("Skip the benchmark by default.")
+    def test_benchmark_against_sqlite(self):
+        """Compares memory use and read_miner_index latency with the SQLite storage for many maximal indexes."""
+        num_miners = 256
+        max_buckets = DATA_ENTITY_BUCKET_COUNT_LIMIT_PER_MINER_INDEX_PROTOCOL_4
+        labels = [f"label{i}" for i in range(100_000)]
+        time_buckets = list(range(1000, 10_000))
+        hotkeys = [f"hotkey{i}" for i in range(num_miners)]
+
+        def _create_max_index() -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label=label,
+                            time_bucket_ids=random.sample(time_buckets, 100),
+                            sizes_bytes=[random.randrange(1, 100_000) for _ in range(100)],
+                        )
+                        for label in random.sample(labels, max_buckets // 100)
+                    ]
+                }
+            )
+
+        sqlite_storage = SqliteMemoryValidatorStorage()
+        self.addCleanup(sqlite_storage.continuous_connection_do_not_reuse.close)
+        for storage in (self.test_storage, sqlite_storage):
+            name = type(storage).__name__
+            start = time.time()
+            for hotkey in hotkeys:
+                storage.upsert_compressed_miner_index(_create_max_index(), hotkey, 1)
+            print(f"{name}: upserted {num_miners} indexes in {time.time() - start:.1f}s")
+
+            if isinstance(storage, NumpyValidatorStorage):
+                print(f"{name}: {storage.memory_bytes() / 2**20:.0f} MiB of arrays")
+            else:
+                with contextlib.closing(storage._create_connection()) as connection:
+                    page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+                    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+                print(f"{name}: {page_count * page_size / 2**20:.0f} MiB of database pages")
+
+            start = time.time()
+            for hotkey in random.sample(hotkeys, 10):
+                storage.read_miner_index(hotkey)
+            print(f"{name}: read_miner_index in {(time.time() - start) / 10:.2f}s")
+
+            for hotkey in hotkeys:
+                storage.delete_miner(hotkey)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 from collections import defaultdict
 import contextlib
 import random
+import sqlite3
+import threading
 import time
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import unittest
+from unittest import mock
 import concurrent
 
 from common import constants, utils
@@ -21,6 +24,7 @@ from common.data import (
 import datetime as dt
 from common.data_v2 import ScorableDataEntityBucket, ScorableMinerIndex
 from storage.validator.sqlite_memory_validator_storage import (
+    ReadWriteLock,
     SqliteMemoryValidatorStorage,
 )
 
@@ -28,7 +32,11 @@ from storage.validator.sqlite_memory_validator_storage import (
 class TestSqliteMemoryValidatorStorage(unittest.TestCase):
     def setUp(self):
         self.test_storage = SqliteMemoryValidatorStorage()
-        # When test_storage goes out of scope the in memory db automatically gets deleted.
+
+    def tearDown(self):
+        # The shared in memory db is deleted once its last connection closes, so each test starts with an empty db.
+        # The test case keeps test_storage alive after the test, so its connection must be closed explicitly.
+        self.test_storage.continuous_connection_do_not_reuse.close()
 
     def test_upsert_miner(self):
         """Tests that we can store a newly encountered miner."""
@@ -408,6 +416,321 @@ class TestSqliteMemoryValidatorStorage(unittest.TestCase):
         self.assertIsNone(self.test_storage.read_miner_index("hotkey2"))
         self.assertIsNotNone(self.test_storage.read_miner_index("hotkey3"))
 
+    def test_bucket_totals_follow_upserts_and_deletes(self):
+        """Tests that scorable bytes reflect the other miners' current indexes after updates and deletes."""
+        time_bucket_id = 1
+
+        def _create_index(size_bytes: int) -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label="bucket_total_label",
+                            time_bucket_ids=[time_bucket_id],
+                            sizes_bytes=[size_bytes],
+                        )
+                    ]
+                }
+            )
+
+        def _scorable_bytes(hotkey: str) -> int:
+            index = self.test_storage.read_miner_index(hotkey)
+            return index.scorable_data_entity_buckets[0].scorable_bytes
+
+        self.test_storage.upsert_compressed_miner_index(_create_index(10), "total_hotkey1", 1)
+        self.test_storage.upsert_compressed_miner_index(_create_index(40), "total_hotkey2", 1)
+        self.assertEqual(_scorable_bytes("total_hotkey1"), 2)
+
+        # Replacing an index replaces its contribution to the total.
+        self.test_storage.upsert_compressed_miner_index(_create_index(90), "total_hotkey2", 1)
+        self.assertEqual(_scorable_bytes("total_hotkey1"), 1)
+
+        self.test_storage.delete_miner("total_hotkey2")
+        self.assertEqual(_scorable_bytes("total_hotkey1"), 10)
+
+        # The total is dropped once no miner has the bucket.
+        self.test_storage.delete_miner("total_hotkey1")
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM BucketTotal WHERE timeBucketId = ?", [time_bucket_id]
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_upsert_compressed_miner_index_applies_diff(self):
+        """Tests that updating an index inserts, updates and deletes only the changed buckets."""
+        time_bucket_ids = list(range(2_000_000, 2_000_100))
+
+        def _create_index(sizes_by_label: Dict[str, List[int]]) -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label=label,
+                            time_bucket_ids=time_bucket_ids[: len(sizes)],
+                            sizes_bytes=sizes,
+                        )
+                        for label, sizes in sizes_by_label.items()
+                    ]
+                }
+            )
+
+        self.test_storage.upsert_compressed_miner_index(
+            _create_index({"diff_1": [10] * 100, "diff_2": [20] * 50}), "diff_hotkey1", 1
+        )
+        self.test_storage.upsert_compressed_miner_index(
+            _create_index({"diff_1": [30] * 100}), "diff_hotkey2", 1
+        )
+        # Resize 10 buckets, drop 50 and add a new label.
+        self.test_storage.upsert_compressed_miner_index(
+            _create_index({"diff_1": [10] * 90 + [70] * 10, "diff_3": [5] * 3}), "diff_hotkey1", 1
+        )
+
+        buckets = self.test_storage.read_miner_index("diff_hotkey1").scorable_data_entity_buckets
+        self.assertEqual(
+            sorted((b.label, b.time_bucket_id, b.size_bytes, b.scorable_bytes) for b in buckets),
+            sorted(
+                [("diff_1", t, 10, 2) for t in time_bucket_ids[:90]]
+                + [("diff_1", t, 70, 49) for t in time_bucket_ids[90:]]
+                + [("diff_3", t, 5, 5) for t in time_bucket_ids[:3]]
+            ),
+        )
+
+        # The bucket totals match the stored buckets.
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT source, labelId, timeBucketId, SUM(contentSizeBytes) FROM MinerIndex
+                   WHERE timeBucketId >= ? GROUP BY source, labelId, timeBucketId""",
+                [time_bucket_ids[0]],
+            )
+            expected_totals = sorted(cursor.fetchall())
+            cursor.execute(
+                "SELECT source, labelId, timeBucketId, totalBytes FROM BucketTotal WHERE timeBucketId >= ?",
+                [time_bucket_ids[0]],
+            )
+            self.assertEqual(sorted(cursor.fetchall()), expected_totals)
+
+        self.test_storage.delete_miner("diff_hotkey1")
+        self.test_storage.delete_miner("diff_hotkey2")
+
+    def test_read_write_lock(self):
+        """Tests that readers share the lock, writers hold it alone and waiting writers go before new readers."""
+        lock = ReadWriteLock()
+        events = []
+
+        def _read(name: str):
+            with lock.read():
+                events.append(name)
+
+        def _write(name: str):
+            with lock.write():
+                events.append(name)
+
+        with lock.read():
+            # A second reader doesn't wait for the first.
+            _read("reader1")
+
+            writer = threading.Thread(target=_write, args=["writer"])
+            writer.start()
+            while not lock.waiting_writers:
+                time.sleep(0.001)
+            # A new reader waits for the waiting writer.
+            reader = threading.Thread(target=_read, args=["reader2"])
+            reader.start()
+            time.sleep(0.05)
+            self.assertEqual(events, ["reader1"])
+
+        writer.join()
+        reader.join()
+        self.assertEqual(events, ["reader1", "writer", "reader2"])
+
+    def test_upsert_compressed_miner_index_in_batches(self):
+        """Tests that indexes written over several batches store the right buckets and bucket totals."""
+        time_bucket_ids = list(range(3_000_000, 3_000_020))
+
+        def _create_index(sizes_by_label: Dict[str, List[int]]) -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label=label,
+                            time_bucket_ids=time_bucket_ids[: len(sizes)],
+                            sizes_bytes=sizes,
+                        )
+                        for label, sizes in sizes_by_label.items()
+                    ]
+                }
+            )
+
+        with mock.patch.object(SqliteMemoryValidatorStorage, "WRITE_BATCH_SIZE", 7):
+            self.test_storage.upsert_compressed_miner_index(
+                _create_index({"batch_2": [30] * 20}), "batch_hotkey2", 1
+            )
+            # A new miner whose buckets partly overlap those of the other miner.
+            self.test_storage.upsert_compressed_miner_index(
+                _create_index({"batch_1": [10] * 20, "batch_2": [10] * 10}), "batch_hotkey1", 1
+            )
+            buckets = self.test_storage.read_miner_index("batch_hotkey1").scorable_data_entity_buckets
+            self.assertEqual(
+                sorted((b.label, b.time_bucket_id, b.size_bytes, b.scorable_bytes) for b in buckets),
+                sorted(
+                    [("batch_1", t, 10, 10) for t in time_bucket_ids]
+                    + [("batch_2", t, 10, 2) for t in time_bucket_ids[:10]]
+                ),
+            )
+
+            # An update of an existing miner.
+            self.test_storage.upsert_compressed_miner_index(
+                _create_index({"batch_1": [10] * 5 + [20] * 10, "batch_2": [10] * 20}), "batch_hotkey1", 1
+            )
+
+        # The bucket totals match the stored buckets.
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """SELECT source, labelId, timeBucketId, SUM(contentSizeBytes) FROM MinerIndex
+                   WHERE timeBucketId >= ? GROUP BY source, labelId, timeBucketId""",
+                [time_bucket_ids[0]],
+            )
+            expected_totals = sorted(cursor.fetchall())
+            self.assertEqual(len(expected_totals), 35)
+            cursor.execute(
+                "SELECT source, labelId, timeBucketId, totalBytes FROM BucketTotal WHERE timeBucketId >= ?",
+                [time_bucket_ids[0]],
+            )
+            self.assertEqual(sorted(cursor.fetchall()), expected_totals)
+
+        self.test_storage.delete_miner("batch_hotkey1")
+        self.test_storage.delete_miner("batch_hotkey2")
+
+    def test_upsert_compressed_miner_index_updates_last_updated_after_writing(self):
+        """Tests that a miner's lastUpdated only changes once its whole index is written."""
+        index = CompressedMinerIndex(
+            sources={
+                DataSource.REDDIT.value: [
+                    CompressedEntityBucket(
+                        label="last_updated_label",
+                        time_bucket_ids=list(range(5_000_000, 5_000_020)),
+                        sizes_bytes=[10] * 20,
+                    )
+                ]
+            }
+        )
+        stage_bucket_changes = self.test_storage._stage_bucket_changes
+        calls = []
+
+        def _fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("Failed to write")
+            stage_bucket_changes(*args)
+
+        with mock.patch.object(SqliteMemoryValidatorStorage, "WRITE_BATCH_SIZE", 7), mock.patch.object(
+            self.test_storage, "_stage_bucket_changes", side_effect=_fail_second_batch
+        ):
+            # A new miner whose index fails to write was never updated.
+            with self.assertRaises(sqlite3.OperationalError):
+                self.test_storage.upsert_compressed_miner_index(index, "last_updated_hotkey", 1)
+            self.assertEqual(
+                self.test_storage.read_miner_last_updated("last_updated_hotkey"), dt.datetime.min
+            )
+
+            # An existing miner keeps the lastUpdated of its previous index.
+            self.test_storage.upsert_compressed_miner_index(index, "last_updated_hotkey", 1)
+            last_updated = self.test_storage.read_miner_last_updated("last_updated_hotkey")
+            self.assertGreater(last_updated, dt.datetime.min)
+
+            calls.clear()
+            with self.assertRaises(sqlite3.OperationalError):
+                self.test_storage.upsert_compressed_miner_index(
+                    CompressedMinerIndex(sources={}), "last_updated_hotkey", 1
+                )
+            self.assertEqual(
+                self.test_storage.read_miner_last_updated("last_updated_hotkey"), last_updated
+            )
+
+        self.test_storage.delete_miner("last_updated_hotkey")
+
+    def test_upsert_compressed_miner_index_applied_at_once(self):
+        """Tests that reads see none of an index whose staged batches were not applied, and a later upsert applies
+        only its own changes."""
+        time_bucket_ids = list(range(6_000_000, 6_000_020))
+
+        def _create_index(size: int) -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label="staged_label", time_bucket_ids=time_bucket_ids, sizes_bytes=[size] * 20
+                        )
+                    ]
+                }
+            )
+
+        def _read_buckets() -> List[Tuple[int, int, int]]:
+            buckets = self.test_storage.read_miner_index("staged_hotkey").scorable_data_entity_buckets
+            return sorted((b.time_bucket_id, b.size_bytes, b.scorable_bytes) for b in buckets)
+
+        self.test_storage.upsert_compressed_miner_index(_create_index(10), "staged_hotkey", 1)
+        with mock.patch.object(SqliteMemoryValidatorStorage, "WRITE_BATCH_SIZE", 7), mock.patch.object(
+            self.test_storage, "_apply_bucket_changes", side_effect=sqlite3.OperationalError("Failed to write")
+        ):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.test_storage.upsert_compressed_miner_index(_create_index(20), "staged_hotkey", 1)
+
+        # Every batch was staged, but the index and bucket totals are those of the first upsert.
+        self.assertEqual(_read_buckets(), [(t, 10, 10) for t in time_bucket_ids])
+
+        self.test_storage.upsert_compressed_miner_index(_create_index(30), "staged_hotkey", 1)
+        self.assertEqual(_read_buckets(), [(t, 30, 30) for t in time_bucket_ids])
+
+        self.test_storage.delete_miner("staged_hotkey")
+        self.assertNotIn("staged_hotkey", self.test_storage.miner_locks)
+        with contextlib.closing(self.test_storage._create_connection()) as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM MinerIndexChange")
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute("SELECT COUNT(*) FROM BucketTotal WHERE timeBucketId >= ?", [time_bucket_ids[0]])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_reads_during_upserts(self):
+        """Tests that reads racing upserts of several miners always see consistent bucket totals."""
+        rng = random.Random(7)
+        hotkeys = ["race_hotkey1", "race_hotkey2", "race_hotkey3"]
+
+        def _create_index() -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT.value: [
+                        CompressedEntityBucket(
+                            label=f"race_label{label}",
+                            time_bucket_ids=list(range(4_000_000, 4_000_100)),
+                            sizes_bytes=[rng.randrange(1, 1000) for _ in range(100)],
+                        )
+                        for label in range(10)
+                    ]
+                }
+            )
+
+        def _write(hotkey: str, index_count: int):
+            for _ in range(index_count):
+                self.test_storage.upsert_compressed_miner_index(_create_index(), hotkey, 1)
+
+        _write(hotkeys[0], 1)
+        with mock.patch.object(SqliteMemoryValidatorStorage, "WRITE_BATCH_SIZE", 100):
+            writers = [threading.Thread(target=_write, args=[hotkey, 10]) for hotkey in hotkeys]
+            for writer in writers:
+                writer.start()
+            # ScorableDataEntityBucket raises if a read sees a bucket total smaller than the miner's own bucket.
+            while any(writer.is_alive() for writer in writers):
+                self.assertIsNotNone(self.test_storage.read_miner_index(hotkeys[0]))
+            for writer in writers:
+                writer.join()
+
+        for hotkey in hotkeys:
+            self.test_storage.delete_miner(hotkey)
+
     def test_read_miner_last_updated(self):
         """Tests getting the last time a miner was updated."""
         # Insert a miner
@@ -635,6 +958,64 @@ class TestSqliteMemoryValidatorStorage(unittest.TestCase):
             index = self.test_storage.read_miner_index(miner)
             print(f"Read index for miner {miner} in {time.time() - start}")
 
+    @unittest.skip("Skip the concurrent read latency test by default.")
+    def test_read_latency_during_upserts_perf(self):
+        """Measures the latency of API style reads while miners with large indexes are upserted."""
+        labels = [f"label{i}" for i in range(10_000)]
+        time_buckets = [i for i in range(1000, 10_000)]
+        miners = [f"hotkey{i}" for i in range(8)]
+
+        def _create_index() -> CompressedMinerIndex:
+            return CompressedMinerIndex(
+                sources={
+                    DataSource.REDDIT: [
+                        CompressedEntityBucket(
+                            label=label,
+                            time_bucket_ids=random.sample(time_buckets, 100),
+                            sizes_bytes=[random.randrange(1, 1000) for _ in range(100)],
+                        )
+                        for label in random.sample(labels, 2_000)
+                    ]
+                }
+            )
+
+        indexes = [_create_index() for _ in range(2 * len(miners))]
+        for miner, index in zip(miners, indexes):
+            self.test_storage.upsert_compressed_miner_index(index, miner, credibility=1)
+
+        def _upsert_all():
+            # Update each miner with a new index, then with a slightly changed one.
+            for miner, index in zip(miners * 2, indexes[len(miners) :] + indexes[: len(miners)]):
+                self.test_storage.upsert_compressed_miner_index(index, miner, credibility=1)
+
+        writer = threading.Thread(target=_upsert_all)
+        start = time.time()
+        writer.start()
+        latencies = []
+        while writer.is_alive():
+            read_start = time.time()
+            # Like the API routes, which read from the database directly.
+            with self.test_storage.lock.read():
+                with contextlib.closing(self.test_storage._create_connection()) as connection:
+                    connection.execute(
+                        "SELECT COUNT(*) FROM MinerIndex WHERE minerId = 1 AND labelId = 1"
+                    ).fetchone()
+            self.test_storage.read_miner_last_updated(random.choice(miners))
+            latencies.append(time.time() - read_start)
+            time.sleep(0.01)
+        writer.join()
+
+        latencies.sort()
+        print(
+            f"Upserted {2 * len(miners)} indexes in {time.time() - start:.1f}s with {len(latencies)} reads: "
+            f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+            f"p99={latencies[len(latencies) * 99 // 100] * 1000:.1f}ms "
+            f"max={latencies[-1] * 1000:.1f}ms"
+        )
+
+        for miner in miners:
+            self.test_storage.delete_miner(miner)
+
 
 if __name__ == "__main__":
     unittest.main()
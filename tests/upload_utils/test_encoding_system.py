@@ -0,0 +1,74 @@
+import unittest
+
+import pyarrow as pa
+from cryptography.fernet import Fernet
+
+from upload_utils.encoding_system import (
+    EncodingPool,
+    SymKeyEncodingKeyManager,
+    decode_url,
+    encode_urls,
+)
+
+
+class TestEncodingSystem(unittest.TestCase):
+    def setUp(self):
+        self.key_manager = SymKeyEncodingKeyManager(Fernet.generate_key().decode())
+        self.urls = [
+            "",
+            "a" * 15,
+            "b" * 16,
+            "c" * 17,
+            "https://x.com/user/status/1",
+            "https://www.reddit.com/r/bittensor_/comments/abc/ünïcödé/",
+            "d" * 300,
+        ]
+
+    def test_encode_urls_matches_decode_url(self):
+        """Tests that encode_urls round trips through decode_url and keeps missing values missing."""
+        urls = pa.array(self.urls + [None], type=pa.string())
+        encoded = encode_urls(urls, self.key_manager.sym_key).to_pylist()
+
+        self.assertIsNone(encoded[-1])
+        self.assertEqual(
+            [decode_url(url, self.key_manager.get_fernet()) for url in encoded[:-1]],
+            self.urls,
+        )
+        # Each token gets its own IV.
+        self.assertEqual(len(set(encoded[:-1])), len(self.urls))
+
+    def test_encode_urls_with_pool(self):
+        """Tests that encoding across a pool keeps the rows in order."""
+        urls = [f"https://x.com/user/status/{i}" * (i % 5 + 1) for i in range(1000)]
+        with EncodingPool(2) as pool:
+            encoded = encode_urls(
+                pa.array(urls), self.key_manager.sym_key, pool=pool, chunk_rows=100
+            )
+            workers = pool.workers
+
+        self.assertEqual(
+            [decode_url(url, self.key_manager.get_fernet()) for url in encoded.to_pylist()], urls
+        )
+        # The workers exit when the pool is shut down.
+        self.assertEqual([worker.returncode for worker in workers], [0, 0])
+
+    def test_pool_replaces_exited_worker(self):
+        """Tests that a worker that exits fails the map it was running, and later maps run on a replacement."""
+        urls = pa.array([f"https://x.com/user/status/{i}" for i in range(400)])
+        with EncodingPool(2) as pool:
+            exited = pool.workers[0]
+            exited.kill()
+            exited.wait()
+            with self.assertRaises(RuntimeError):
+                encode_urls(urls, self.key_manager.sym_key, pool=pool, chunk_rows=100)
+            self.assertNotIn(exited, pool.workers)
+
+            encoded = encode_urls(urls, self.key_manager.sym_key, pool=pool, chunk_rows=100)
+
+        self.assertEqual(
+            [decode_url(url, self.key_manager.get_fernet()) for url in encoded.to_pylist()], urls.to_pylist()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
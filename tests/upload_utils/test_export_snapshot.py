@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest.mock import patch
+
+from upload_utils.export_snapshot import SharedExportSnapshot
+
+DiskUsage = namedtuple("DiskUsage", ["total", "used", "free"])
+
+
+class TestExportSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "miner.sqlite")
+        self.snapshot_path = os.path.join(self.temp_dir.name, "miner.sqlite.export")
+        self.export_snapshot = SharedExportSnapshot(self.db_path, self.snapshot_path)
+
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE DataEntity (uri TEXT PRIMARY KEY)")
+        self.connection.executemany("INSERT INTO DataEntity VALUES (?)", [(f"http://{i}",) for i in range(100)])
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+        self.temp_dir.cleanup()
+
+    def _count(self, connection: sqlite3.Connection) -> int:
+        return connection.execute("SELECT COUNT(*) FROM DataEntity").fetchone()[0]
+
+    def test_snapshot_is_isolated_from_writes(self):
+        """Tests that the snapshot keeps the rows at the time it was taken while the live database keeps changing."""
+        with self.export_snapshot.use() as snapshot_path:
+            snapshot = sqlite3.connect(snapshot_path)
+            cursor = snapshot.execute("SELECT uri FROM DataEntity")
+            cursor.fetchone()
+
+            # Writes and a full checkpoint of the live database succeed while the snapshot is being read.
+            self.connection.executemany(
+                "INSERT INTO DataEntity VALUES (?)", [(f"http://{i}",) for i in range(100, 150)]
+            )
+            self.connection.commit()
+            busy, _, _ = self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            self.assertEqual(busy, 0)
+
+            self.assertEqual(len(cursor.fetchall()), 99)
+            self.assertEqual(self._count(snapshot), 100)
+            snapshot.close()
+
+        self.assertEqual(self._count(self.connection), 150)
+        self.assertFalse(os.path.exists(self.snapshot_path))
+
+    def test_replaces_leftover_snapshot(self):
+        """Tests that a snapshot left behind by a crash is replaced."""
+        with open(self.snapshot_path, "wb") as f:
+            f.write(b"partial")
+
+        with self.export_snapshot.use() as snapshot_path:
+            snapshot = sqlite3.connect(snapshot_path)
+            self.assertEqual(self._count(snapshot), 100)
+            snapshot.close()
+
+    def test_shared_while_in_use(self):
+        """Tests that a pass starting while the snapshot is in use reads the same copy, removed after both finish."""
+        with self.export_snapshot.use() as first_path:
+            self.connection.execute("INSERT INTO DataEntity VALUES ('http://100')")
+            self.connection.commit()
+
+            with self.export_snapshot.use() as second_path:
+                self.assertEqual(second_path, first_path)
+                snapshot = sqlite3.connect(second_path)
+                self.assertEqual(self._count(snapshot), 100)
+                snapshot.close()
+
+            self.assertTrue(os.path.exists(self.snapshot_path))
+
+        self.assertFalse(os.path.exists(self.snapshot_path))
+
+        # The next pass takes a new snapshot.
+        with self.export_snapshot.use() as snapshot_path:
+            snapshot = sqlite3.connect(snapshot_path)
+            self.assertEqual(self._count(snapshot), 101)
+            snapshot.close()
+
+    def test_skipped_without_free_space(self):
+        """Tests that the live database is read, and no copy is made, when there isn't space for the copy."""
+        with patch("upload_utils.export_snapshot.shutil.disk_usage", return_value=DiskUsage(0, 0, 1)):
+            with self.export_snapshot.use() as snapshot_path:
+                self.assertIsNone(snapshot_path)
+                self.assertFalse(os.path.exists(self.snapshot_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
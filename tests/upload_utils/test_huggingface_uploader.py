@@ -0,0 +1,223 @@
+import datetime as dt
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pyarrow as pa
+
+from common.data import DataEntity, DataLabel, DataSource
+from storage.miner.sqlite_miner_storage import SqliteMinerStorage
+from upload_utils.chunk_manifest import ChunkHasher, ChunkManifest
+from upload_utils.encoding_system import EncodingKeyManager
+from upload_utils.huggingface_uploader import DualUploader
+from upload_utils.stats_accumulator import StatsAccumulator
+
+
+class TestChunkManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "manifest.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_record_and_upload(self):
+        """Tests that chunks move from pending to uploaded and the manifest survives a reload."""
+        manifest = ChunkManifest(self.path)
+        manifest.add_repo("repo", 5)
+        manifest.record_chunk("repo", 5, "a.parquet", "data/a.parquet", "hash_a", 2, ("d1", "u1"), ("d2", "u2"))
+        manifest.record_chunk("repo", 6, "b.parquet", "data/b.parquet", "hash_b", 1, ("d3", "u3"), ("d3", "u4"))
+        manifest.mark_uploaded("repo", [5])
+
+        manifest = ChunkManifest(self.path)
+        self.assertEqual(manifest.next_chunk_id("repo"), 7)
+        self.assertEqual([chunk["chunk_id"] for chunk in manifest.pending_chunks("repo")], [6])
+        self.assertEqual(manifest.resume_cursor("repo"), ("d3", "u4"))
+        self.assertEqual(manifest.find_chunk("repo", "hash_a")["path_in_repo"], "data/a.parquet")
+        self.assertIsNone(manifest.find_chunk("repo", "hash_c"))
+        self.assertIsNone(manifest.resume_cursor("other_repo"))
+
+    def test_hash_independent_of_batches(self):
+        """Tests that the chunk hash depends on the rows, not on how they are batched."""
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(["a", "bb", None, "ccc"]), pa.array([b"x", b"", b"yy", b"z"], type=pa.binary())],
+            names=["datetime", "content"],
+        )
+        whole = ChunkHasher()
+        whole.update(batch)
+        split = ChunkHasher()
+        split.update(batch.slice(0, 1))
+        split.update(batch.slice(1))
+        partial = ChunkHasher()
+        partial.update(batch.slice(1))
+
+        self.assertEqual(whole.hexdigest(), split.hexdigest())
+        self.assertNotEqual(whole.hexdigest(), partial.hexdigest())
+
+
+@patch("upload_utils.huggingface_uploader.time.sleep", Mock())
+@patch("upload_utils.huggingface_uploader.DatasetCardGenerator", Mock())
+@patch("upload_utils.huggingface_uploader.hf_hub_download", Mock(side_effect=FileNotFoundError))
+class TestDualUploader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "miner.sqlite")
+        self.storage = SqliteMinerStorage(self.db_path)
+
+        self.uploader = self._create_uploader()
+        self.commits = []
+        self.fail_commits = False
+
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        # Entities with 2 sharing each datetime, so chunks split rows with the same datetime.
+        self.storage.store_data_entities([self._create_entity(i, now - dt.timedelta(minutes=10 - i // 2)) for i in range(8)])
+
+    def tearDown(self):
+        self.storage.close()
+        self.temp_dir.cleanup()
+
+    def _create_uploader(self) -> DualUploader:
+        wallet = Mock()
+        wallet.hotkey.ss58_address = "hotkey"
+        uploader = DualUploader(
+            db_path=self.db_path,
+            subtensor=Mock(),
+            wallet=wallet,
+            encoding_key_manager=EncodingKeyManager(os.path.join(self.temp_dir.name, "key.json")),
+            private_encoding_key_manager=EncodingKeyManager(os.path.join(self.temp_dir.name, "private_key.json")),
+            state_file=os.path.join(self.temp_dir.name, "state.json"),
+            output_dir=os.path.join(self.temp_dir.name, "output"),
+            chunk_size=3,
+            batch_size=3,
+        )
+        uploader.hf_token = "token"
+        uploader.hf_api = Mock()
+        uploader.hf_api.whoami.return_value = {"name": "user"}
+        uploader.hf_api.list_repo_files.return_value = []
+        uploader.hf_api.create_commit.side_effect = self._create_commit
+        uploader.check_hf_connection = Mock(return_value=True)
+        return uploader
+
+    def _create_entity(self, i: int, datetime: dt.datetime) -> DataEntity:
+        content = {
+            "body": f"body {i}",
+            "dataType": "post",
+            "communityName": "r/bittensor_",
+            "username": "user",
+            "url": f"http://{i}",
+        }
+        return DataEntity(
+            uri=f"http://{i}",
+            datetime=datetime,
+            source=DataSource.REDDIT,
+            label=DataLabel(value="r/bittensor_"),
+            content=json.dumps(content).encode(),
+            content_size_bytes=10,
+        )
+
+    def _create_commit(self, operations, **kwargs):
+        if self.fail_commits:
+            raise ConnectionError("Upload failed")
+        self.commits.append(
+            {
+                operation.path_in_repo: (
+                    list(pd.read_parquet(operation.path_or_fileobj)["text"])
+                    if operation.path_in_repo.endswith(".parquet")
+                    else None
+                )
+                for operation in operations
+            }
+        )
+
+    def test_resumes_pending_chunks(self):
+        """Tests that chunks written before a failed upload are uploaded on the next run without being rebuilt."""
+        self.fail_commits = True
+        self.uploader.upload_sql_to_huggingface()
+        # Leave a partially written chunk behind, as a crash would.
+        with open(os.path.join(self.uploader.output_dir, "reddit_train-DataEntity_chunk_9.parquet"), "wb") as f:
+            f.write(b"partial")
+
+        self.fail_commits = False
+        uploader = self._create_uploader()
+        uploader.upload_sql_to_huggingface()
+
+        self.assertEqual(len(self.commits), 2)
+        self.assertEqual(
+            self.commits[0],
+            {
+                "data/train-DataEntity_chunk_0.parquet": ["body 0", "body 1", "body 2"],
+                "data/train-DataEntity_chunk_1.parquet": ["body 3", "body 4", "body 5"],
+                "data/train-DataEntity_chunk_2.parquet": ["body 6", "body 7"],
+            },
+        )
+        # Then the stats and sidecar, counting every uploaded row once.
+        self.assertEqual(set(self.commits[1]), {"stats.json", "stats.arrow"})
+        stats = StatsAccumulator.load(uploader.get_stats_path(f"user/reddit_dataset_{uploader.unique_id}"))
+        self.assertEqual(stats.total_rows, 8)
+        self.assertEqual(os.listdir(uploader.output_dir), [])
+
+    def test_next_run_uploads_only_new_rows(self):
+        """Tests that later runs continue from the manifest without listing the repo."""
+        self.uploader.upload_sql_to_huggingface()
+        self.commits.clear()
+        # One listing for each platform's repo.
+        self.assertEqual(self.uploader.hf_api.list_repo_files.call_count, 2)
+
+        self.storage.store_data_entities([self._create_entity(8, dt.datetime.now(tz=dt.timezone.utc))])
+        uploader = self._create_uploader()
+        uploader.upload_sql_to_huggingface()
+
+        self.assertEqual(self.commits[0], {"data/train-DataEntity_chunk_3.parquet": ["body 8"]})
+        uploader.hf_api.list_repo_files.assert_not_called()
+        uploader.hf_api.repo_info.assert_not_called()
+
+    def test_new_repo_starts_new_stats(self):
+        """Tests that a repo under another account does not carry over the stats of the previous repo."""
+        self.uploader.upload_sql_to_huggingface()
+        self.commits.clear()
+
+        uploader = self._create_uploader()
+        uploader.hf_api.whoami.return_value = {"name": "other_user"}
+        uploader.upload_sql_to_huggingface()
+
+        # The new repo only counts the rows uploaded to it.
+        uploaded_rows = sum(len(rows) for commit in self.commits for rows in commit.values() if rows is not None)
+        stats = StatsAccumulator.load(uploader.get_stats_path(f"other_user/reddit_dataset_{uploader.unique_id}"))
+        self.assertEqual(stats.total_rows, uploaded_rows)
+        stats = StatsAccumulator.load(uploader.get_stats_path(f"user/reddit_dataset_{uploader.unique_id}"))
+        self.assertEqual(stats.total_rows, 8)
+
+    def test_skips_identical_chunk(self):
+        """Tests that a chunk with the same rows as a recorded one is dropped."""
+        repo_id = "user/reddit_dataset"
+        self.uploader.manifest.add_repo(repo_id, 0)
+        os.makedirs(self.uploader.output_dir)
+        batch = next(self.uploader.get_data_for_huggingface_upload(DataSource.REDDIT.value, None))
+        stats = StatsAccumulator(DataSource.REDDIT.value)
+
+        paths = []
+        results = []
+        for chunk_id in range(2):
+            path = os.path.join(self.uploader.output_dir, f"chunk_{chunk_id}.parquet")
+            with open(path, "wb") as f:
+                f.write(b"parquet")
+            hasher = ChunkHasher()
+            hasher.update(batch)
+            stats_table = pa.table({"datetime": batch.column("datetime"), "label": batch.column("label"),
+                                    "dataType": pa.array(["post"] * 3), "communityName": batch.column("label")})
+            results.append(self.uploader.record_chunk(repo_id, chunk_id, path, hasher, 3, ("d", "u"), ("d", "u"),
+                                                      [stats_table], stats))
+            paths.append(path)
+
+        self.assertEqual(results, [True, False])
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertEqual(stats.total_rows, 3)
+        self.assertEqual(self.uploader.manifest.next_chunk_id(repo_id), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
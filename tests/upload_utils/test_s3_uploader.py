@@ -0,0 +1,272 @@
+import datetime as dt
+import email.parser
+import email.policy
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock
+
+import pandas as pd
+
+from common.data import DataEntity, DataLabel, DataSource
+from storage.miner.sqlite_miner_storage import SqliteMinerStorage
+from upload_utils.export_snapshot import SharedExportSnapshot
+from upload_utils.s3_uploader import S3PartitionedUploader
+
+
+class _PresignedPostHandler(http.server.BaseHTTPRequestHandler):
+    """Local stand-in for the S3 presigned POST endpoint, recording every uploaded file by key."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+        )
+        fields = {
+            part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.iter_parts()
+        }
+        key = fields["key"].decode()
+
+        with self.server.lock:
+            if self.server.should_fail(key):
+                self.send_response(403)
+            else:
+                self.server.uploads[key] = fields["file"]
+                self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestS3PartitionedUploader(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PresignedPostHandler)
+        self.server.lock = threading.Lock()
+        self.server.uploads = {}
+        self.server.should_fail = lambda key: False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.s3_creds = {
+            "url": f"http://127.0.0.1:{self.server.server_address[1]}",
+            "fields": {"policy": "policy", "x-amz-signature": "signature"},
+            "folder": "hotkey=hotkey/",
+        }
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "miner.sqlite")
+        self.storage = SqliteMinerStorage(self.db_path)
+
+        wallet = Mock()
+        wallet.hotkey.ss58_address = "hotkey"
+        self.uploader = S3PartitionedUploader(
+            db_path=self.db_path,
+            subtensor=Mock(),
+            wallet=wallet,
+            s3_auth_url="http://localhost",
+            state_file=os.path.join(self.temp_dir.name, "state.json"),
+            output_dir=os.path.join(self.temp_dir.name, "output"),
+            chunk_size=3,
+        )
+
+        # Entities with 2 sharing each datetime, to exercise the uri tie break.
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        self.entities = [
+            DataEntity(
+                uri=f"http://{i}",
+                datetime=now - dt.timedelta(minutes=10 - i // 2),
+                source=DataSource.REDDIT,
+                label=DataLabel(value="r/bittensor_"),
+                content=json.dumps({"body": f"body {i}"}).encode(),
+                content_size_bytes=10,
+            )
+            for i in range(8)
+        ]
+        self.storage.store_data_entities(self.entities)
+        self.job_config = {"source": DataSource.REDDIT.value, "type": "label", "value": "r/bittensor_"}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.storage.close()
+        self.temp_dir.cleanup()
+
+    def _uploaded_chunks(self):
+        """Returns the uris of every uploaded file, ordered by the sequence of its chunk."""
+        def sequence(key):
+            return int(key.rsplit("_", 2)[1])
+
+        return [
+            list(pd.read_parquet(io.BytesIO(self.server.uploads[key]))["uri"])
+            for key in sorted(self.server.uploads, key=sequence)
+        ]
+
+    def test_process_job_pages_by_cursor(self):
+        """Tests that a job uploads every row once across chunks and runs."""
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(
+            self._uploaded_chunks(),
+            [[f"http://{i}" for i in range(0, 3)], [f"http://{i}" for i in range(3, 6)],
+             [f"http://{i}" for i in range(6, 8)]],
+        )
+        self.assertEqual(self.uploader.processed_state["job"]["total_records_processed"], 8)
+
+        # Nothing new to upload on the next run.
+        self.server.uploads.clear()
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(self._uploaded_chunks(), [])
+
+    def test_process_job_after_deletion(self):
+        """Tests that deleting already uploaded rows does not cause new rows to be skipped."""
+        self.uploader.chunk_size = 4
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.server.uploads.clear()
+
+        # Evict the oldest rows and add a new one.
+        with self.storage._pooled_connection() as connection:
+            connection.execute("DELETE FROM DataEntity WHERE uri IN ('http://0', 'http://1', 'http://2')")
+            connection.commit()
+        self.storage.store_data_entities(
+            [self.entities[7].model_copy(update={"uri": "http://8", "datetime": dt.datetime.now(tz=dt.timezone.utc)})]
+        )
+
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(self._uploaded_chunks(), [["http://8"]])
+
+    def test_process_job_upload_failure(self):
+        """Tests that only chunks before a failed upload are checkpointed, so the rest are uploaded next run."""
+        self.uploader.max_upload_workers = 1
+        self.server.should_fail = lambda key: "_1_3.parquet" in key
+
+        self.assertFalse(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(self._uploaded_chunks()[0], [f"http://{i}" for i in range(0, 3)])
+        self.assertEqual(self.uploader.processed_state["job"]["last_cursor"][1], "http://2")
+        self.assertEqual(self.uploader.processed_state["job"]["total_records_processed"], 3)
+
+        self.server.uploads.clear()
+        self.server.should_fail = lambda key: False
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(
+            self._uploaded_chunks(),
+            [[f"http://{i}" for i in range(3, 6)], [f"http://{i}" for i in range(6, 8)]],
+        )
+        self.assertEqual(self.uploader.processed_state["job"]["total_records_processed"], 8)
+
+    def test_process_job_bounds_pending_uploads(self):
+        """Tests that reading chunks waits for uploads once max_pending_uploads buffers are held."""
+        self.uploader.chunk_size = 1
+        self.uploader.max_upload_workers = 1
+        self.uploader.max_pending_uploads = 2
+        max_in_flight = 0
+        in_flight = 0
+        lock = threading.Lock()
+        upload_parquet_buffer = self.uploader._upload_parquet_buffer
+
+        def upload(*args):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            result = upload_parquet_buffer(*args)
+            with lock:
+                in_flight -= 1
+            return result
+
+        max_pending = 0
+        checkpoint_uploads = self.uploader._checkpoint_uploads
+
+        def checkpoint(job_id, pending, wait):
+            nonlocal max_pending
+            max_pending = max(max_pending, len(pending))
+            return checkpoint_uploads(job_id, pending, wait)
+
+        self.uploader._upload_parquet_buffer = upload
+        self.uploader._checkpoint_uploads = checkpoint
+
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(len(self._uploaded_chunks()), 8)
+        self.assertLessEqual(max_pending, 2)
+        self.assertEqual(max_in_flight, 1)
+
+    def test_process_job_from_export_snapshot(self):
+        """Tests that jobs read rows from the export snapshot taken when the upload started."""
+        self.uploader.export_snapshot = SharedExportSnapshot(self.uploader.db_path)
+        with self.uploader.export_database():
+            # Rows stored after the snapshot are left for the next upload.
+            self.storage.store_data_entities(
+                [self.entities[7].model_copy(update={"uri": "http://8", "datetime": dt.datetime.now(tz=dt.timezone.utc)})]
+            )
+            self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+
+        self.assertEqual(sum(self._uploaded_chunks(), []), [f"http://{i}" for i in range(8)])
+        self.assertFalse(os.path.exists(f"{self.db_path}.export"))
+
+        self.server.uploads.clear()
+        with self.uploader.export_database():
+            self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(self._uploaded_chunks(), [["http://8"]])
+
+    def test_legacy_offset_state(self):
+        """Tests that a job with an offset from an older state file resumes after the row at that offset."""
+        self.uploader.processed_state["job"] = {"last_offset": 5, "total_records_processed": 5}
+
+        self.assertTrue(self.uploader._process_job("job", self.job_config, self.s3_creds))
+        self.assertEqual(self._uploaded_chunks(), [[f"http://{i}" for i in range(5, 8)]])
+        self.assertNotIn("last_offset", self.uploader.processed_state["job"])
+        self.assertEqual(self.uploader.processed_state["job"]["last_cursor"][1], "http://7")
+
+    def _store_keyword_entities(self):
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        texts = ["All about Bitcoin", "bitcoins and more", "nothing here", "100% sure", "1005 sure", "it's 'quoted'"]
+        self.storage.store_data_entities(
+            [
+                DataEntity(
+                    uri=f"http://x/{i}",
+                    datetime=now - dt.timedelta(minutes=len(texts) - i),
+                    source=DataSource.X,
+                    label=DataLabel(value="#other"),
+                    content=json.dumps({"text": text}).encode(),
+                    content_size_bytes=10,
+                )
+                for i, text in enumerate(texts)
+            ]
+        )
+
+    def _run_keyword_job(self, keyword: str):
+        self.server.uploads.clear()
+        self.uploader.processed_state.pop("keyword_job", None)
+        self.assertTrue(
+            self.uploader._process_job(
+                "keyword_job", {"source": DataSource.X.value, "type": "keyword", "value": keyword}, self.s3_creds
+            )
+        )
+        return [uri for chunk in self._uploaded_chunks() for uri in chunk]
+
+    def _assert_keyword_jobs(self):
+        self.assertEqual(self._run_keyword_job("bitcoin"), ["http://x/0", "http://x/1"])
+        self.assertEqual(self._run_keyword_job("ab"), ["http://x/0"])
+        # Wildcards and quotes in keywords are matched literally.
+        self.assertEqual(self._run_keyword_job("0%"), ["http://x/3"])
+        self.assertEqual(self._run_keyword_job("'quoted'"), ["http://x/5"])
+
+    def test_keyword_job_without_index(self):
+        """Tests keyword jobs that search the content of every row."""
+        self._store_keyword_entities()
+        self.assertFalse(self.uploader._has_keyword_index())
+        self._assert_keyword_jobs()
+
+    def test_keyword_job_with_index(self):
+        """Tests keyword jobs that search the full-text keyword index."""
+        self.storage.close()
+        self.storage = SqliteMinerStorage(self.db_path, index_keywords=True)
+        self._store_keyword_entities()
+        self.assertTrue(self.uploader._has_keyword_index())
+        self._assert_keyword_jobs()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import collections
+import random
+import unittest
+
+import pyarrow as pa
+
+from common.data import DataSource
+from upload_utils.stats_accumulator import StatsAccumulator
+
+
+class TestStatsAccumulator(unittest.TestCase):
+    def _reddit_table(self, rows) -> pa.Table:
+        datetimes, data_types, communities = zip(*rows)
+        return pa.table(
+            {
+                "datetime": pa.array(datetimes, type=pa.string()),
+                "label": pa.array([c.lower() for c in communities], type=pa.string()),
+                "dataType": pa.array(data_types, type=pa.string()),
+                "communityName": pa.array(communities, type=pa.string()),
+            }
+        )
+
+    def _x_table(self, rows) -> pa.Table:
+        datetimes, labels = zip(*rows)
+        return pa.table(
+            {
+                "datetime": pa.array(datetimes, type=pa.string()),
+                "label": pa.array(labels, type=pa.string()),
+            }
+        )
+
+    def test_reddit_stats(self):
+        """Tests the Reddit stats accumulated over several batches."""
+        stats = StatsAccumulator(DataSource.REDDIT.value)
+        stats.update(
+            self._reddit_table(
+                [
+                    ("2024-05-02", "post", "r/bittensor_"),
+                    ("2024-05-01", "comment", "r/bittensor_"),
+                ]
+            )
+        )
+        stats.update(
+            self._reddit_table(
+                [
+                    ("2024-05-03", "comment", "r/python"),
+                    ("2024-05-02", "comment", "r/bittensor_"),
+                ]
+            )
+        )
+        stats.record_upload(4)
+
+        result = stats.to_stats()
+        self.assertEqual(result["data_source"], "reddit")
+        self.assertEqual(result["summary"]["total_rows"], 4)
+        self.assertEqual(result["summary"]["start_dt"], "2024-05-01T00:00:00Z")
+        self.assertEqual(result["summary"]["end_dt"], "2024-05-03T00:00:00Z")
+        self.assertEqual(result["summary"]["update_history"][0]["count"], 4)
+        self.assertEqual(result["posts_count"], 1)
+        self.assertEqual(result["comments_count"], 3)
+        self.assertEqual(result["summary"]["metadata"]["posts_percentage"], 25)
+        self.assertEqual(
+            [(t["topic"], t["topic_type"], t["total_count"], t["total_percentage"]) for t in result["topics"]],
+            [("r/bittensor_", "subreddit", 3, 75), ("r/python", "subreddit", 1, 25)],
+        )
+
+    def test_x_stats(self):
+        """Tests that X labels are split into hashtags and tweets without hashtags count as the NULL hashtag."""
+        stats = StatsAccumulator(DataSource.X.value)
+        stats.update(
+            self._x_table(
+                [
+                    ("2024-05-01", "#bittensor #tao"),
+                    ("2024-05-01", "#bittensor"),
+                    ("2024-05-02", "NULL"),
+                    ("2024-05-02", "NULL"),
+                ]
+            )
+        )
+
+        result = stats.to_stats()
+        self.assertEqual(result["tweets_with_hashtags_count"], 2)
+        self.assertEqual(result["tweets_without_hashtags_count"], 2)
+        self.assertEqual(result["summary"]["metadata"]["tweets_with_hashtags_percentage"], 50)
+        self.assertEqual(
+            {t["topic"]: t["total_count"] for t in result["topics"]},
+            {"#bittensor": 2, "#tao": 1, "NULL": 2},
+        )
+
+    def test_topic_capacity_bounds_counts(self):
+        """Tests that a full topic summary keeps the heavy hitters with counts within their error bounds."""
+        rng = random.Random(0)
+        stats = StatsAccumulator(DataSource.REDDIT.value, topic_capacity=20)
+        true_counts = collections.Counter()
+        for _ in range(20):
+            rows = []
+            for _ in range(200):
+                # A few heavy subreddits and a long tail of rare ones.
+                community = (
+                    f"r/heavy{rng.randrange(5)}"
+                    if rng.random() < 0.5
+                    else f"r/tail{rng.randrange(1000)}"
+                )
+                true_counts[community] += 1
+                rows.append(("2024-05-01", "post", community))
+            stats.update(self._reddit_table(rows))
+
+        self.assertEqual(len(stats.topic_counts), 20)
+        self.assertEqual(stats.topic_total, sum(true_counts.values()))
+        for i in range(5):
+            self.assertIn(f"r/heavy{i}", stats.topic_counts)
+        for topic, count in stats.topic_counts.items():
+            self.assertGreaterEqual(count, true_counts[topic])
+            self.assertLessEqual(count - stats.topic_errors[topic], true_counts[topic])
+        for topic, count in true_counts.items():
+            if topic not in stats.topic_counts:
+                self.assertLessEqual(count, stats.topic_floor)
+
+    def test_serialize_round_trip(self):
+        """Tests that the sidecar restores the full accumulator state."""
+        stats = StatsAccumulator(DataSource.X.value, topic_capacity=2)
+        stats.update(
+            self._x_table(
+                [("2024-05-01", "#a #b"), ("2024-05-03", "#c"), ("2024-05-02", "NULL")]
+            )
+        )
+        stats.record_upload(3)
+
+        restored = StatsAccumulator.deserialize(stats.serialize())
+
+        self.assertEqual(restored.to_stats(), stats.to_stats())
+        self.assertEqual(restored.topic_errors, stats.topic_errors)
+        self.assertEqual(restored.topic_floor, stats.topic_floor)
+        self.assertEqual(restored.topic_capacity, 2)
+
+    def test_from_stats(self):
+        """Tests that an accumulator seeded from an existing stats.json continues its totals."""
+        existing = {
+            "version": "2.0.0",
+            "data_source": "reddit",
+            "summary": {
+                "total_rows": 10,
+                "last_update_dt": "2024-05-01T00:00:00Z",
+                "start_dt": "2024-04-01T00:00:00Z",
+                "end_dt": "2024-04-30T00:00:00Z",
+                "update_history": [{"timestamp": "2024-05-01T00:00:00Z", "count": 10}],
+                "metadata": {"posts_percentage": 40, "comments_percentage": 60},
+            },
+            "topics": [
+                {"topic": "r/python", "topic_type": "subreddit", "total_count": 10, "total_percentage": 100}
+            ],
+        }
+        stats = StatsAccumulator.from_stats(existing, DataSource.REDDIT.value)
+        stats.update(self._reddit_table([("2024-05-05", "post", "r/python")]))
+        stats.record_upload(1)
+
+        result = stats.to_stats()
+        self.assertEqual(result["summary"]["total_rows"], 11)
+        self.assertEqual(result["summary"]["start_dt"], "2024-04-01T00:00:00Z")
+        self.assertEqual(result["summary"]["end_dt"], "2024-05-05T00:00:00Z")
+        self.assertEqual(len(result["summary"]["update_history"]), 2)
+        self.assertEqual(result["posts_count"], 5)
+        self.assertEqual(result["comments_count"], 6)
+        self.assertEqual(result["topics"][0]["total_count"], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
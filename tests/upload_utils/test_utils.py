@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+
+from upload_utils.encoding_system import EncodingKeyManager, decode_url
+from upload_utils.utils import (
+    REDDIT_CONTENT_SCHEMA,
+    REDDIT_DATASET_COLUMNS,
+    TWEET_DATASET_COLUMNS,
+    parse_content_column,
+    preprocess_reddit_batch,
+    preprocess_reddit_df,
+    preprocess_twitter_batch,
+    preprocess_twitter_df,
+)
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.key_manager = EncodingKeyManager(os.path.join(self.temp_dir.name, "key.json"))
+        self.private_key_manager = EncodingKeyManager(
+            os.path.join(self.temp_dir.name, "private_key.json")
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _create_batch(self, datetimes, labels, contents) -> pa.RecordBatch:
+        return pa.RecordBatch.from_arrays(
+            [
+                pa.array(datetimes, type=pa.string()),
+                pa.array(labels, type=pa.string()),
+                pa.array(contents, type=pa.binary()),
+            ],
+            names=["datetime", "label", "content"],
+        )
+
+    def _assert_matches_df(self, table: pa.Table, df: pd.DataFrame, columns):
+        """Asserts the Arrow output matches the DataFrame output, decoding the encrypted columns."""
+        self.assertEqual(table.column_names, columns)
+        actual = table.to_pandas().reset_index(drop=True)
+        expected = df.reset_index(drop=True)
+        fernets = {
+            "username_encoded": self.key_manager.get_fernet(),
+            "url_encoded": self.private_key_manager.get_fernet(),
+        }
+
+        def normalize(column, value):
+            if column in fernets:
+                # Fernet tokens differ on every encryption so compare the decoded values.
+                return decode_url(value, fernets[column])
+            # Arrow lists come back as numpy arrays.
+            return list(value) if hasattr(value, "__len__") and not isinstance(value, str) else value
+
+        for column in columns:
+            self.assertEqual(
+                [normalize(column, value) for value in actual[column]],
+                [normalize(column, value) for value in expected[column]],
+                column,
+            )
+
+    def test_preprocess_twitter_batch_matches_df(self):
+        """Tests that the Arrow Twitter preprocessing produces the same rows as the DataFrame preprocessing."""
+        datetimes = [
+            "2024-03-01 10:00:00+00:00",
+            "2024-03-02 11:30:00.123456+00:00",
+            "2024-03-03 00:00:00+00:00",
+            "2024-03-04 00:00:00+00:00",
+        ]
+        labels = ["#bittensor", "NULL", "#tao", "#tao"]
+        contents = [
+            json.dumps({"text": "hello", "tweet_hashtags": ["#bittensor"], "username": "a", "url": "https://x.com/1"}).encode(),
+            json.dumps({"text": "no tags", "tweet_hashtags": [], "username": "b", "url": "https://x.com/2", "extra": 1}).encode(),
+            json.dumps({"text": "   ", "tweet_hashtags": ["#tao"], "username": "c", "url": "https://x.com/3"}).encode(),
+            json.dumps({"text": "no user", "tweet_hashtags": ["#tao"]}).encode(),
+        ]
+
+        table = preprocess_twitter_batch(
+            self._create_batch(datetimes, labels, contents), self.key_manager, self.private_key_manager
+        )
+        df = preprocess_twitter_df(
+            pd.DataFrame({"datetime": pd.to_datetime(datetimes, format="ISO8601"), "label": labels, "content": contents}),
+            self.key_manager,
+            self.private_key_manager,
+        )
+
+        self.assertEqual(table.num_rows, 3)
+        self._assert_matches_df(table, df, TWEET_DATASET_COLUMNS)
+
+    def test_preprocess_reddit_batch_matches_df(self):
+        """Tests that the Arrow Reddit preprocessing produces the same rows as the DataFrame preprocessing."""
+        datetimes = ["2024-03-01 10:00:00+00:00", "2024-03-02 11:30:00+00:00", "2024-03-03 00:00:00+00:00"]
+        labels = ["r/bittensor_", "r/bittensor_", "r/other"]
+        contents = [
+            json.dumps({"body": "post", "dataType": "post", "communityName": "r/bittensor_", "username": "a", "url": "https://reddit.com/1"}).encode(),
+            json.dumps({"body": "", "dataType": "comment", "communityName": "r/bittensor_", "username": "b", "url": "https://reddit.com/2"}).encode(),
+            json.dumps({"body": "comment", "dataType": "comment", "communityName": "r/other", "username": "c", "url": "https://reddit.com/3"}).encode(),
+        ]
+
+        table = preprocess_reddit_batch(
+            self._create_batch(datetimes, labels, contents), self.key_manager, self.private_key_manager
+        )
+        df = preprocess_reddit_df(
+            pd.DataFrame({"datetime": pd.to_datetime(datetimes, format="ISO8601"), "label": labels, "content": contents}),
+            self.key_manager,
+            self.private_key_manager,
+        )
+
+        self.assertEqual(table.num_rows, 2)
+        self._assert_matches_df(table, df, REDDIT_DATASET_COLUMNS)
+
+    def test_parse_content_column_malformed(self):
+        """Tests that malformed or mistyped content is parsed row by row with nulls for the bad values."""
+        contents = pa.array(
+            [
+                json.dumps({"body": "ok", "dataType": "post"}).encode(),
+                b"not json",
+                json.dumps({"body": 5, "dataType": "comment"}).encode(),
+                b'{"body": "multi\nline"}',
+            ],
+            type=pa.binary(),
+        )
+
+        table = parse_content_column(contents, REDDIT_CONTENT_SCHEMA)
+
+        self.assertEqual(table.column_names, REDDIT_CONTENT_SCHEMA.names)
+        self.assertEqual(table.column("body").to_pylist(), ["ok", None, None, None])
+        self.assertEqual(table.column("dataType").to_pylist(), ["post", None, "comment", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import http.server
+import os
+import re
+import tempfile
+import threading
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from upload_utils.utils import TWEET_DATASET_SCHEMA, get_parquet_writer_options
+from vali_utils.hf_utils import sample_parquet_rows
+
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files from a directory, supporting the byte range requests used to read parquet files remotely."""
+
+    def do_GET(self):
+        with open(os.path.join(self.server.directory, self.path.lstrip("/")), "rb") as f:
+            data = f.read()
+
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match is None:
+            self.send_response(200)
+            body = data
+        else:
+            start, end = match.groups()
+            if start == "":
+                # A suffix range of the last bytes of the file.
+                start, end = max(0, len(data) - int(end)), len(data) - 1
+            else:
+                start, end = int(start), min(int(end), len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+
+        self.server.bytes_served += len(body)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSampleParquetRows(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+        self.server.directory = self.temp_dir.name
+        self.server.bytes_served = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        n_rows = 20_000
+        self.table = pa.table(
+            {
+                "text": [f"tweet {i} " + "x" * (i % 200) for i in range(n_rows)],
+                "label": ["#bittensor"] * n_rows,
+                "tweet_hashtags": [["#bittensor", f"#{i}"] for i in range(n_rows)],
+                "datetime": [f"2024-05-{1 + i * 28 // n_rows:02d}" for i in range(n_rows)],
+                "username_encoded": [f"user{i}" for i in range(n_rows)],
+                "url_encoded": [f"url{i}" for i in range(n_rows)],
+            },
+            schema=TWEET_DATASET_SCHEMA,
+        )
+        self.path = os.path.join(self.temp_dir.name, "chunk.parquet")
+        with pq.ParquetWriter(self.path, TWEET_DATASET_SCHEMA, **get_parquet_writer_options(TWEET_DATASET_SCHEMA)) as writer:
+            writer.write_table(self.table, row_group_size=1_000)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chunk.parquet"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_writer_layout(self):
+        """Tests that chunks record their sort order, datetime statistics and page index."""
+        metadata = pq.ParquetFile(self.path).metadata
+        self.assertEqual(metadata.num_row_groups, 20)
+        row_group = metadata.row_group(0)
+        self.assertEqual(row_group.sorting_columns, (pq.SortingColumn(3),))
+        self.assertEqual(row_group.column(3).statistics.min, "2024-05-01")
+        self.assertIsNone(row_group.column(0).statistics)
+        self.assertTrue(row_group.column(0).has_offset_index)
+
+    def test_samples_single_row_group(self):
+        """Tests that sampling downloads a fraction of the file and returns rows as written."""
+        df = sample_parquet_rows(self.url, 10)
+
+        self.assertEqual(len(df), 10)
+        self.assertLess(self.server.bytes_served, os.path.getsize(self.path) / 5)
+        expected = {row["url_encoded"]: row for row in self.table.to_pylist()}
+        for row in df.to_dict(orient="records"):
+            self.assertEqual(row, expected[row["url_encoded"]])
+        # All rows come from the one downloaded row group.
+        row_groups = {int(url[len("url"):]) // 1_000 for url in df["url_encoded"]}
+        self.assertEqual(len(row_groups), 1)
+
+    def test_samples_across_row_groups(self):
+        """Tests that row groups are read until enough rows are sampled."""
+        df = sample_parquet_rows(self.url, 1_500)
+
+        self.assertEqual(len(df), 1_500)
+        self.assertEqual(df["url_encoded"].nunique(), 1_500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Local manifest of the parquet chunks written for each Hugging Face dataset repo."""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+_MANIFEST_VERSION = 1
+
+CHUNK_PENDING = "pending"
+CHUNK_UPLOADED = "uploaded"
+
+
+class ChunkManifest:
+    """Records the content hash, row range, remote path and upload status of every chunk written for each repo.
+
+    Chunks are recorded as pending once their file is complete and marked uploaded once committed to the repo, so
+    the uploader can resume after a crash from the last recorded row, upload only the chunks still pending, skip
+    chunks identical to ones already recorded, and pick the next chunk id without listing the repo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.repos: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != _MANIFEST_VERSION:
+            raise ValueError(f"Unsupported chunk manifest version {manifest.get('version')}.")
+        return manifest["repos"]
+
+    def save(self):
+        """Writes the manifest, replacing the previous one atomically."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": _MANIFEST_VERSION, "repos": self.repos}, f)
+        os.replace(temp_path, self.path)
+
+    def has_repo(self, repo_id: str) -> bool:
+        return repo_id in self.repos
+
+    def add_repo(self, repo_id: str, next_chunk_id: int):
+        """Starts tracking a repo whose existing chunks end before next_chunk_id."""
+        self.repos[repo_id] = {"next_chunk_id": next_chunk_id, "chunks": {}}
+        self.save()
+
+    def next_chunk_id(self, repo_id: str) -> int:
+        return self.repos[repo_id]["next_chunk_id"]
+
+    def find_chunk(self, repo_id: str, sha256: str) -> Optional[Dict[str, Any]]:
+        """Returns the recorded chunk of the repo with the given content hash, if any."""
+        for chunk in self.repos[repo_id]["chunks"].values():
+            if chunk["sha256"] == sha256:
+                return chunk
+        return None
+
+    def record_chunk(
+        self,
+        repo_id: str,
+        chunk_id: int,
+        local_path: str,
+        path_in_repo: str,
+        sha256: str,
+        rows: int,
+        first_row: Tuple[str, str],
+        last_row: Tuple[str, str],
+    ):
+        """Records a completely written chunk as pending upload.
+
+        The first and last rows are the (datetime, uri) of the database rows the chunk was built from.
+        """
+        repo = self.repos[repo_id]
+        repo["chunks"][str(chunk_id)] = {
+            "chunk_id": chunk_id,
+            "local_path": local_path,
+            "path_in_repo": path_in_repo,
+            "sha256": sha256,
+            "rows": rows,
+            "first_row": list(first_row),
+            "last_row": list(last_row),
+            "status": CHUNK_PENDING,
+        }
+        repo["next_chunk_id"] = max(repo["next_chunk_id"], chunk_id + 1)
+        self.save()
+
+    def pending_chunks(self, repo_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the chunks of the repo, or of all repos, that are not uploaded yet."""
+        repo_ids = self.repos.keys() if repo_id is None else [repo_id]
+        return [
+            chunk
+            for repo in repo_ids
+            for chunk in self.repos.get(repo, {}).get("chunks", {}).values()
+            if chunk["status"] == CHUNK_PENDING
+        ]
+
+    def mark_uploaded(self, repo_id: str, chunk_ids: List[int]):
+        chunks = self.repos[repo_id]["chunks"]
+        for chunk_id in chunk_ids:
+            chunks[str(chunk_id)]["status"] = CHUNK_UPLOADED
+        self.save()
+
+    def resume_cursor(self, repo_id: str) -> Optional[Tuple[str, str]]:
+        """Returns the (datetime, uri) of the last row in any recorded chunk of the repo, if any."""
+        chunks = self.repos.get(repo_id, {}).get("chunks", {})
+        if not chunks:
+            return None
+
+        last_chunk = max(chunks.values(), key=lambda chunk: chunk["chunk_id"])
+        return tuple(last_chunk["last_row"])
+
+
+class ChunkHasher:
+    """Content hash of the database rows a chunk is built from.
+
+    The hash depends only on the row values and not on how the rows are split into batches.
+    """
+
+    def __init__(self):
+        self.column_hashers: Dict[str, Any] = {}
+
+    def update(self, batch: pa.RecordBatch):
+        """Adds the rows of a batch of string or binary columns."""
+        for name, column in zip(batch.schema.names, batch.columns):
+            _, offsets_buffer, data_buffer = column.buffers()
+            offsets = np.frombuffer(offsets_buffer, dtype=np.int32)[
+                column.offset : column.offset + len(column) + 1
+            ]
+            self._hasher(f"{name}.lengths").update(np.diff(offsets).astype('<i4').tobytes())
+            data_hasher = self._hasher(f"{name}.data")
+            if data_buffer is not None:
+                data_hasher.update(memoryview(data_buffer)[offsets[0] : offsets[-1]])
+
+    def hexdigest(self) -> str:
+        combined = hashlib.sha256()
+        for name in sorted(self.column_hashers):
+            combined.update(name.encode())
+            combined.update(self.column_hashers[name].digest())
+        return combined.hexdigest()
+
+    def _hasher(self, name: str):
+        # Lengths and values are hashed as separate streams so batch boundaries don't change the hash.
+        return self.column_hashers.setdefault(name, hashlib.sha256())
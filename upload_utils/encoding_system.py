@@ -1,14 +1,29 @@
 """Module for URL encoding and decoding using Fernet encryption."""
 
+import argparse
 import base64
 import json
 import os
+import pickle
+import subprocess
+import sys
+import threading
 import time
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
 
 import pandas as pd
+import pyarrow as pa
 from cryptography.fernet import Fernet
 
+from upload_utils.encoding_worker import encode_urls_inline
+
+# Rows per task when encoding across a pool. Smaller inputs are encoded inline.
+ENCODE_CHUNK_ROWS = 20_000
+
+# Script the pool's worker processes run.
+ENCODING_WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encoding_worker.py')
+
 class EncodingKeyManager:
     """Manages the encryption key for URL encoding and decoding."""
 
@@ -95,6 +110,107 @@ def decode_url(encoded_url: str, fernet: Fernet) -> Optional[str]:
         return None
 
 
+class EncodingPool:
+    """Worker processes that encode chunks of URLs.
+
+    The workers run encoding_worker.py as a script, rather than re-importing the miner's main module like a
+    multiprocessing pool would. They run until the pool is shut down, so a pool is meant to last one upload pass.
+    Chunks are sent to the workers as Arrow arrays and each worker keeps one Fernet instance per key.
+    """
+
+    def __init__(self, n_workers: int):
+        self.workers = [self._start_worker() for _ in range(n_workers)]
+        # Each worker handles one task at a time, so only one map runs at a time.
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _start_worker() -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, ENCODING_WORKER_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    def _replace_worker(self, index: int) -> int:
+        """Replaces a worker that exited with a new one, returning the exit code of the old worker."""
+        worker = self.workers[index]
+        worker.kill()
+        returncode = worker.wait()
+        for pipe in (worker.stdin, worker.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.workers[index] = self._start_worker()
+        return returncode
+
+    def map(self, chunks: Sequence[pa.Array], sym_key: bytes) -> List[pa.Array]:
+        """Encode the chunks across the workers, returning the encoded chunks in order.
+
+        A worker that exits fails the map and is replaced, so later maps still run on every worker.
+        """
+        encoded: List[Optional[pa.Array]] = [None] * len(chunks)
+
+        def run(index: int, chunk_indexes: range) -> None:
+            worker = self.workers[index]
+            for i in chunk_indexes:
+                try:
+                    pickle.dump((chunks[i], sym_key), worker.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+                    worker.stdin.flush()
+                    encoded[i] = pickle.load(worker.stdout)
+                except (EOFError, BrokenPipeError):
+                    raise RuntimeError(f"Encoding worker exited with code {self._replace_worker(index)}.")
+
+        with self.lock, ThreadPoolExecutor(max_workers=len(self.workers)) as executor:
+            n_workers = len(self.workers)
+            list(executor.map(run, range(n_workers), [range(k, len(chunks), n_workers) for k in range(n_workers)]))
+        return encoded
+
+    def shutdown(self) -> None:
+        """Stop the workers once they finish their current task."""
+        with self.lock:
+            for worker in self.workers:
+                worker.stdin.close()
+            for worker in self.workers:
+                worker.wait()
+                worker.stdout.close()
+            self.workers = []
+
+    def __enter__(self) -> "EncodingPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
+
+
+def create_encoding_pool(n_workers: Optional[int] = None) -> Optional[EncodingPool]:
+    """Returns a pool for one upload pass, or None if there is only one worker to encode on.
+
+    Args:
+        n_workers (Optional[int]): Worker processes to start. Defaults to the number of CPUs.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers <= 1:
+        return None
+    return EncodingPool(n_workers)
+
+
+def encode_urls(
+    urls: pa.Array,
+    sym_key: bytes,
+    pool: Optional[EncodingPool] = None,
+    chunk_rows: int = ENCODE_CHUNK_ROWS,
+) -> pa.Array:
+    """Encode an Arrow string array of URLs with the Fernet key, producing the same encoding as encode_url.
+    Missing URLs stay missing.
+
+    If a pool is given, inputs larger than chunk_rows are split into chunks encoded across its workers.
+    """
+    if pool is None or len(urls) <= chunk_rows:
+        return encode_urls_inline(urls, sym_key)
+
+    chunks = [urls.slice(i, chunk_rows) for i in range(0, len(urls), chunk_rows)]
+    return pa.concat_arrays(pool.map(chunks, sym_key))
+
+
 def encode_dataframe_column(df: pd.DataFrame, column_name: str, key_manager: EncodingKeyManager) -> pd.DataFrame:
     """Encode a column of URLs in a DataFrame."""
     fernet = key_manager.get_fernet()
@@ -111,41 +227,53 @@ def decode_dataframe_column(df: pd.DataFrame, column_name: str, key_manager: Enc
 
 
 def main():
-    """Main function to demonstrate URL encoding and decoding."""
-    # Initialize EncodingKeyManager
-    key_manager = EncodingKeyManager()
+    """Benchmark encoding URLs per row, with encode_urls, and across pools of worker processes."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of URLs to encode.")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Largest pool to benchmark. Pools of 1, 2, 4, ... workers up to this are measured.",
+    )
+    args = parser.parse_args()
 
-    # Create a larger sample DataFrame (1 million rows)
-    n_rows = 1_000_000
+    sym_key = Fernet.generate_key()
+    fernet = Fernet(sym_key)
+    n_rows = args.rows
     urls = [
         'https://example.com/short_url',
         'https://example.com/medium_length_url_with_some_parameters?param1=value1&param2=value2',
         'https://example.com/very_long_url_with_many_parameters_and_some_special_characters?param1=value1&param2=value2&param3=value3&param4=value4&special=!@#$%^&*()'
     ]
-    df = pd.DataFrame({
-        'url': urls * (n_rows // len(urls) + 1)
-    }).head(n_rows)
-
-    # Measure encoding time
-    start_time = time.time()
-    df_encoded = encode_dataframe_column(df, 'url', key_manager)
-    encode_time = time.time() - start_time
-    print(f"Encoding time for {n_rows} rows: {encode_time:.2f} seconds")
+    urls = (urls * (n_rows // len(urls) + 1))[:n_rows]
+    url_array = pa.array(urls, type=pa.string())
 
-    # Measure decoding time
-    start_time = time.time()
-    df_decoded = decode_dataframe_column(df_encoded, 'url_encoded', key_manager)
-    decode_time = time.time() - start_time
-    print(f"Decoding time for {n_rows} rows: {decode_time:.2f} seconds")
+    def report(name: str, encode) -> None:
+        start_time = time.perf_counter()
+        encoded = encode()
+        if isinstance(encoded, pa.Array):
+            encoded = encoded.to_pylist()
+        elapsed = time.perf_counter() - start_time
+        sample = range(0, n_rows, max(1, n_rows // 1000))
+        verified = all(decode_url(encoded[i], fernet) == urls[i] for i in sample)
+        print(f"{name:<24} {elapsed:8.2f} s {n_rows / elapsed:12,.0f} rows/second  verified={verified}")
 
-    # Verify that the decoded URLs match the original
-    print("\nVerification:")
-    print(df['url'].equals(df_decoded['url']))
+    print(f"Encoding {n_rows:,} URLs")
+    report("per-row encode_url", lambda: [encode_url(url, fernet) for url in urls])
+    report("encode_urls", lambda: encode_urls(url_array, sym_key))
 
-    # Calculate and print rows processed per second
-    print(f"\nEncoding speed: {n_rows / encode_time:.2f} rows/second")
-    print(f"Decoding speed: {n_rows / decode_time:.2f} rows/second")
+    n_processes = 1
+    while n_processes <= args.processes:
+        with EncodingPool(n_processes) as pool:
+            # Warm up the workers so process start up is not measured.
+            pool.map([url_array[:1]] * n_processes, sym_key)
+            report(
+                f"{n_processes} worker process(es)",
+                lambda: encode_urls(url_array, sym_key, pool=pool),
+            )
+        n_processes *= 2
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
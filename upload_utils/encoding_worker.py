@@ -0,0 +1,52 @@
+"""Entry point of the URL encoding worker processes.
+
+Run as a script, a worker reads pickled (urls, sym_key) tasks from stdin, with urls an Arrow string array, and writes
+the pickled Arrow array of encoded URLs to stdout until stdin is closed. It only imports what encoding needs, so
+workers don't load the miner's modules.
+"""
+
+import base64
+import pickle
+import sys
+from typing import Dict
+
+import pyarrow as pa
+from cryptography.fernet import Fernet
+
+# Fernet instances by key, so each process builds one per key rather than one per task.
+_fernets: Dict[bytes, Fernet] = {}
+
+
+def get_fernet(sym_key: bytes) -> Fernet:
+    """Returns this process's Fernet instance for the key."""
+    fernet = _fernets.get(sym_key)
+    if fernet is None:
+        fernet = _fernets[sym_key] = Fernet(sym_key)
+    return fernet
+
+
+def encode_urls_inline(urls: pa.Array, sym_key: bytes) -> pa.Array:
+    """Encode an Arrow string array of URLs in this process, the same way as encode_url. Missing URLs stay missing."""
+    encrypt = get_fernet(sym_key).encrypt
+    # Reading the values as binary hands over the UTF-8 bytes without decoding them to str and back.
+    encoded = [
+        None if url is None else base64.urlsafe_b64encode(encrypt(url))
+        for url in urls.cast(pa.binary()).to_pylist()
+    ]
+    # The encoded URLs are base64, so they are valid strings.
+    return pa.array(encoded, type=pa.binary()).cast(pa.string())
+
+
+def main():
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        try:
+            urls, sym_key = pickle.load(stdin)
+        except EOFError:
+            return
+        pickle.dump(encode_urls_inline(urls, sym_key), stdout, protocol=pickle.HIGHEST_PROTOCOL)
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Point-in-time copies of the miner database for the uploaders to read from."""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import bittensor as bt
+
+# Files SQLite may create next to a database.
+_SIDECAR_SUFFIXES = ("", "-wal", "-shm", "-journal")
+
+
+class SharedExportSnapshot:
+    """A snapshot of the miner database shared by the uploaders.
+
+    The copy is made with SQLite's online backup API in a single step, so it is consistent and holds a read
+    transaction on the live database only for as long as the copy takes. Reading from the copy for hours then doesn't
+    stop the live WAL from being checkpointed or slow down writes to it.
+
+    The first uploader to start an upload pass takes the snapshot, and uploaders starting while it is in use read
+    from the same copy. The copy is deleted once the last of them finishes, so there is at most one on disk.
+    """
+
+    def __init__(self, db_path: str, snapshot_path: Optional[str] = None):
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path or f"{db_path}.export"
+        # Guards taking, sharing and removing the snapshot.
+        self.lock = threading.Lock()
+        self.users = 0
+        self.available = False
+
+    @contextmanager
+    def use(self) -> Iterator[Optional[str]]:
+        """Yields the path of the shared snapshot, taking it if it isn't in use.
+
+        Yields None, to read from the live database instead, if there isn't enough free disk space for the copy.
+        """
+        with self.lock:
+            if self.users == 0:
+                self.available = _take_snapshot(self.db_path, self.snapshot_path)
+            self.users += 1
+
+        try:
+            yield self.snapshot_path if self.available else None
+        finally:
+            with self.lock:
+                self.users -= 1
+                if self.users == 0 and self.available:
+                    _remove_snapshot(self.snapshot_path)
+                    self.available = False
+
+
+def _take_snapshot(db_path: str, snapshot_path: str) -> bool:
+    """Copies the database to snapshot_path, returning False if there isn't enough free disk space for the copy."""
+    # Remove any snapshot left behind by a crash.
+    _remove_snapshot(snapshot_path)
+
+    # The copy holds every page of the database, including those still only in the WAL.
+    database_size = sum(
+        os.path.getsize(db_path + suffix) for suffix in ("", "-wal") if os.path.exists(db_path + suffix)
+    )
+    free_space = shutil.disk_usage(os.path.dirname(os.path.abspath(snapshot_path))).free
+    if free_space < database_size:
+        bt.logging.warning(
+            f"Not enough free disk space for an export snapshot of {db_path} ({free_space} bytes free, "
+            f"{database_size} bytes needed). Reading from the live database instead."
+        )
+        return False
+
+    started = time.monotonic()
+    source = sqlite3.connect(db_path, timeout=60.0)
+    try:
+        destination = sqlite3.connect(snapshot_path)
+        try:
+            # Copying every page in one step, as copying in several steps restarts whenever the live database changes.
+            source.backup(destination)
+            # The copy is only read, so it doesn't need the WAL of the live database.
+            destination.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destination.close()
+    except Exception:
+        _remove_snapshot(snapshot_path)
+        raise
+    finally:
+        source.close()
+
+    bt.logging.info(
+        f"Created export snapshot {snapshot_path} of {db_path} in {time.monotonic() - started:.1f} seconds."
+    )
+    return True
+
+
+def _remove_snapshot(snapshot_path: str):
+    for suffix in _SIDECAR_SUFFIXES:
+        try:
+            os.remove(snapshot_path + suffix)
+        except FileNotFoundError:
+            pass
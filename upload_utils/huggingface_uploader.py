@@ -2,23 +2,33 @@ import os
 import json
 import datetime as dt
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import bittensor as bt
 import sqlite3
 import re
 import time
 import requests
 from contextlib import contextmanager
-from huggingface_hub import HfApi, hf_hub_download
+from huggingface_hub import CommitOperationAdd, HfApi, hf_hub_download
 from upload_utils.utils import(
-    preprocess_reddit_df,
-    preprocess_twitter_df,
+    preprocess_reddit_batch,
+    preprocess_twitter_batch,
+    REDDIT_DATASET_SCHEMA,
+    SAMPLING_ROW_GROUP_SIZE,
+    TWEET_DATASET_SCHEMA,
     generate_static_integer,
+    get_parquet_writer_options,
     migrate_stats_to_v2,
     get_default_stats_structure
 )
-from upload_utils.encoding_system import EncodingKeyManager
+from upload_utils.encoding_system import EncodingKeyManager, create_encoding_pool
+from upload_utils.export_snapshot import SharedExportSnapshot
+from upload_utils.chunk_manifest import ChunkHasher, ChunkManifest
+from upload_utils.stats_accumulator import STATS_SIDECAR_FILENAME, StatsAccumulator
+from storage.miner.content_compression import register_content_functions
 from common.data import HuggingFaceMetadata, DataSource
-from typing import List, Dict, Union, Any
+from typing import List, Dict, Iterator, Any, Optional
 from upload_utils.dataset_card import DatasetCardGenerator, NumpyEncoder
 from functools import wraps
 
@@ -53,7 +63,11 @@ class DualUploader:
                  private_encoding_key_manager: EncodingKeyManager,   # USED FOR ENCODING URLS
                  state_file: str,
                  output_dir: str = 'hf_storage',
-                 chunk_size: int = 1_000_000):
+                 chunk_size: int = 1_000_000,
+                 batch_size: int = 100_000,
+                 export_snapshot: Optional[SharedExportSnapshot] = None,
+                 row_group_size: int = SAMPLING_ROW_GROUP_SIZE,
+                 n_encoding_workers: Optional[int] = None):
         self.db_path = db_path
         self.wallet = wallet
         self.miner_hotkey = self.wallet.hotkey.ss58_address
@@ -65,12 +79,26 @@ class DualUploader:
         self.hf_token = os.getenv("HUGGINGFACE_TOKEN")
         self.hf_api = HfApi(token=self.hf_token)
         self.state_file = f"{state_file.split('.json')[0]}_{self.unique_id}.json"
+        self.manifest = ChunkManifest(f"{self.state_file.split('.json')[0]}_chunk_manifest.json")
+        # Rows per parquet file.
         self.chunk_size = chunk_size
+        # Rows read from the database and written to parquet at a time.
+        self.batch_size = batch_size
+        # Rows per parquet row group.
+        self.row_group_size = row_group_size
         self.wal_size_limit_mb = 2000  # 2 GB WAL size limit
+        # Read uploads from a snapshot of the database, shared with the other uploaders, rather than the live database.
+        self.export_snapshot = export_snapshot
+        self.export_db_path = None
+        # Worker processes encoding the username and url columns during an upload pass, one per CPU by default.
+        self.n_encoding_workers = n_encoding_workers
+        self.encoding_pool = None
 
     @contextmanager
-    def get_db_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=60.0)  # Added timeout
+    def get_db_connection(self, live: bool = False):
+        """Connect to the export snapshot while one is in use, or to the live database."""
+        db_path = self.db_path if live or self.export_db_path is None else self.export_db_path
+        conn = sqlite3.connect(db_path, timeout=60.0)  # Added timeout
         try:
             # Enhanced optimization settings
             conn.execute("PRAGMA journal_mode=WAL")
@@ -79,6 +107,8 @@ class DualUploader:
             conn.execute("PRAGMA cache_size=-2000000")  # Increased to 2GB
             conn.execute("PRAGMA page_size=16384")  # Optimized page size
             conn.execute("PRAGMA mmap_size=30000000000")  # 30GB memory mapping
+            # Allow queries to read content the miner storage compressed.
+            register_content_functions(conn)
             yield conn
         finally:
             conn.close()
@@ -142,82 +172,182 @@ class DualUploader:
             bt.logging.error(f"Error getting next chunk id: {e}")
             return 0
 
-    def get_data_for_huggingface_upload(self, source, last_upload):
-        if last_upload is None:
+    def get_data_for_huggingface_upload(self, source, last_upload, after_key=None) -> Iterator[pa.RecordBatch]:
+        """
+        Streams the rows to upload as RecordBatches of up to batch_size rows, ordered by (datetime, uri).
+
+        Rows start after the (datetime, uri) after_key if given, otherwise after the last_upload datetime.
+        """
+        if after_key is not None:
+            query = """
+                SELECT datetime, label, decompress_content(content) AS content, uri
+                FROM DataEntity
+                WHERE source = ?
+                AND (datetime, uri) > (?, ?)
+                ORDER BY datetime ASC, uri ASC
+            """
+            params = [source, after_key[0], after_key[1]]
+        elif last_upload is None:
             query = """
-                SELECT datetime, label, content
+                SELECT datetime, label, decompress_content(content) AS content, uri
                 FROM DataEntity
                 WHERE source = ?
-                ORDER BY datetime ASC
+                ORDER BY datetime ASC, uri ASC
                 LIMIT 200000000
             """
             params = [source]
         else:
             query = """
-                SELECT datetime, label, content
+                SELECT datetime, label, decompress_content(content) AS content, uri
                 FROM DataEntity
                 WHERE source = ?
                 AND datetime > ?
-                ORDER BY datetime ASC
+                ORDER BY datetime ASC, uri ASC
             """
             params = [source, last_upload]
 
         with self.get_db_connection() as conn:
-            for chunk in pd.read_sql_query(
-                    sql=query,
-                    con=conn,
-                    params=params,
-                    chunksize=self.chunk_size,
-                    parse_dates=['datetime']
-            ):
-                yield chunk
-
-    def preprocess_data(self, df, source):
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+
+                datetimes, labels, contents, uris = zip(*rows)
+                yield pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(datetimes, type=pa.string()),
+                        pa.array(labels, type=pa.string()),
+                        pa.array(contents, type=pa.binary()),
+                        pa.array(uris, type=pa.string()),
+                    ],
+                    names=['datetime', 'label', 'content', 'uri'],
+                )
+
+    def preprocess_data(self, batch: pa.RecordBatch, source) -> pa.Table:
         if source == DataSource.REDDIT.value:
-            return preprocess_reddit_df(df, self.encoding_key_manager, self.private_encoding_key_manager)
+            return preprocess_reddit_batch(batch, self.encoding_key_manager, self.private_encoding_key_manager,
+                                           self.encoding_pool)
         else:
-            return preprocess_twitter_df(df, self.encoding_key_manager, self.private_encoding_key_manager)
+            return preprocess_twitter_batch(batch, self.encoding_key_manager, self.private_encoding_key_manager,
+                                            self.encoding_pool)
 
     @retry_upload(max_retries=5)
     def upload_parquet_to_hf(self, repo_id):
-        """Upload parquet files to HuggingFace """
+        """Upload the chunks pending in the manifest to HuggingFace in a single commit"""
+        chunks = self.manifest.pending_chunks(repo_id)
+        if not chunks:
+            return True
+
         success = False
 
         # Try HuggingFace upload if token available
         if self.hf_token and self.check_hf_connection():
             try:
-                self.hf_api.upload_folder(
+                self.hf_api.create_commit(
                     token=self.hf_token,
-                    folder_path=self.output_dir,
                     repo_id=repo_id,
                     repo_type="dataset",
-                    path_in_repo='data/',
-                    allow_patterns="*.parquet",
+                    operations=[
+                        CommitOperationAdd(path_in_repo=chunk['path_in_repo'], path_or_fileobj=chunk['local_path'])
+                        for chunk in chunks
+                    ],
+                    commit_message=f"Upload {len(chunks)} chunks",
                 )
-                bt.logging.info(f"Successfully uploaded files to HF repo {repo_id}")
+                bt.logging.info(f"Successfully uploaded {len(chunks)} files to HF repo {repo_id}")
                 success = True
             except Exception as e:
                 bt.logging.error(f"Error during HF upload: {str(e)}")
 
-        # Only clean up if at least one upload method succeeded
+        # Only clean up if the upload succeeded
         if success:
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith(".parquet"):
-                    os.remove(os.path.join(self.output_dir, filename))
+            self.manifest.mark_uploaded(repo_id, [chunk['chunk_id'] for chunk in chunks])
+            for chunk in chunks:
+                os.remove(chunk['local_path'])
 
-        # If both uploads failed, raise exception to trigger retry
+        # If the upload failed, raise exception to trigger retry
         if not success:
             raise Exception("HuggingFace upload failed")
 
         return success
 
+    def remove_unrecorded_chunks(self):
+        """Remove parquet files that are not pending in the manifest, i.e. partial chunks left by a crash."""
+        pending_paths = {os.path.abspath(chunk['local_path']) for chunk in self.manifest.pending_chunks()}
+        for filename in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, filename)
+            if filename.endswith(".parquet") and os.path.abspath(path) not in pending_paths:
+                bt.logging.info(f"Removing incomplete chunk {path}")
+                os.remove(path)
+
+    def record_chunk(self, repo_id: str, chunk_id: int, local_path: str, hasher: ChunkHasher, rows: int,
+                     first_row, last_row, chunk_stats: List[pa.Table], stats: StatsAccumulator) -> bool:
+        """
+        Record a completely written chunk in the manifest as pending upload, and add its rows to the stats.
+
+        Returns False, and removes the file, if a chunk with identical rows was already recorded for the repo.
+        """
+        sha256 = hasher.hexdigest()
+        existing_chunk = self.manifest.find_chunk(repo_id, sha256)
+        if existing_chunk is not None:
+            bt.logging.info(f"Skipping chunk {chunk_id}, identical to chunk {existing_chunk['chunk_id']} in {repo_id}")
+            os.remove(local_path)
+            return False
+
+        self.manifest.record_chunk(
+            repo_id,
+            chunk_id,
+            local_path,
+            f"data/train-DataEntity_chunk_{chunk_id}.parquet",
+            sha256,
+            rows,
+            first_row,
+            last_row,
+        )
+
+        for chunk_table in chunk_stats:
+            stats.update(chunk_table)
+        # Keep the stats of recorded chunks locally, so chunks still pending after a crash are counted when resumed.
+        stats.save(self.get_stats_path(repo_id))
+        return True
+
+    @contextmanager
+    def export_database(self):
+        """Read from a snapshot of the database within the context, if export snapshots are enabled."""
+        if self.export_snapshot is None:
+            yield
+            return
+
+        with self.export_snapshot.use() as snapshot_path:
+            self.export_db_path = snapshot_path
+            try:
+                yield
+            finally:
+                self.export_db_path = None
+
+    @contextmanager
+    def encoding_workers(self):
+        """Encode across a pool of worker processes within the context, shutting the workers down when it exits."""
+        self.encoding_pool = create_encoding_pool(self.n_encoding_workers)
+        try:
+            yield
+        finally:
+            if self.encoding_pool is not None:
+                self.encoding_pool.shutdown()
+            self.encoding_pool = None
+
     def upload_sql_to_huggingface(self) -> List[HuggingFaceMetadata]:
         if not self.hf_token:
             bt.logging.error("Hugging Face token not found. Please check your environment variables.")
             return []
 
+        with self.export_database(), self.encoding_workers():
+            return self.upload_sources_to_huggingface()
+
+    def upload_sources_to_huggingface(self) -> List[HuggingFaceMetadata]:
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        self.remove_unrecorded_chunks()
 
         state = self.load_state()
         hf_metadata_list = []
@@ -235,72 +365,111 @@ class DualUploader:
                 token=self.hf_token
             )
 
-            try:
-                # Check if repository exists
-                self.hf_api.repo_info(repo_id=repo_id, repo_type="dataset")
-                bt.logging.info(f"Repository {repo_id} already exists.")
-                next_chunk_id = self.get_next_chunk_id(repo_id)
-            except Exception:
-                # Create new repository
-                self.hf_api.create_repo(token=self.hf_token, repo_id=repo_id.split('/')[1], private=False, repo_type="dataset")
-                bt.logging.info(f"Created new repository: {repo_id}")
-                next_chunk_id = 0
+            if not self.manifest.has_repo(repo_id):
+                try:
+                    # Check if repository exists
+                    self.hf_api.repo_info(repo_id=repo_id, repo_type="dataset")
+                    bt.logging.info(f"Repository {repo_id} already exists.")
+                    next_chunk_id = self.get_next_chunk_id(repo_id)
+                except Exception:
+                    # Create new repository
+                    self.hf_api.create_repo(token=self.hf_token, repo_id=repo_id.split('/')[1], private=False, repo_type="dataset")
+                    bt.logging.info(f"Created new repository: {repo_id}")
+                    next_chunk_id = 0
+                self.manifest.add_repo(repo_id, next_chunk_id)
+            next_chunk_id = self.manifest.next_chunk_id(repo_id)
 
             last_upload = state['last_upload'].get(str(source))
+            # Continue after the last chunk recorded in the manifest, so a crashed upload resumes where it stopped.
+            after_key = self.manifest.resume_cursor(repo_id)
             total_rows = state['total_rows'].get(str(source), 0)
             chunk_count = 0
 
-            all_stats = {}
+            stats = self.load_stats_accumulator(repo_id, source)
             new_rows = 0
 
+            schema = REDDIT_DATASET_SCHEMA if source == DataSource.REDDIT.value else TWEET_DATASET_SCHEMA
+            stats_columns = ['datetime', 'label'] + (
+                ['dataType', 'communityName'] if source == DataSource.REDDIT.value else [])
+            # Each parquet chunk is written a batch at a time so memory stays bounded by the batch size.
+            writer = None
 
             try:
-                for df in self.get_data_for_huggingface_upload(source, last_upload):
-                    bt.logging.info(f"Processing new DataFrame for source {source}")
-
-                    if df.empty:
-                        bt.logging.info(f"Encountered empty DataFrame for source {source}. Skipping.")
-                        continue
+                # Upload the complete chunks left pending by a previous run. Their rows are already in the stats.
+                pending_chunks = self.manifest.pending_chunks(repo_id)
+                if pending_chunks:
+                    self.upload_parquet_to_hf(repo_id)
+                    bt.logging.info(f'Uploaded {len(pending_chunks)} pending chunks to {repo_id}')
+                    pending_rows = sum(chunk['rows'] for chunk in pending_chunks)
+                    total_rows += pending_rows
+                    new_rows += pending_rows
 
+                for batch in self.get_data_for_huggingface_upload(source, last_upload, after_key):
                     bt.logging.info(f"Current total rows: {total_rows}")
                     if total_rows >= 200_000_000: # TODO
                         bt.logging.info(f"Reached 200 million rows limit for source {source}. Stopping upload.")
                         break
 
-                    last_upload = df['datetime'].max()
-
-                    bt.logging.info(f"Starting preprocessing for DataFrame with {len(df)} rows")
-                    df = self.preprocess_data(df, source)
-                    rows_to_upload = min(len(df), 400_000_000 - total_rows)
-
-                    if rows_to_upload < len(df):
-                        df = df.iloc[:rows_to_upload]  # Trim the dataframe if necessary
+                    # Rows are ordered by datetime so the last one is the latest.
+                    last_upload = pd.to_datetime(batch.column('datetime')[-1].as_py())
 
-                    parquet_path = os.path.join(self.output_dir,
-                                                f"train-DataEntity_chunk_{next_chunk_id + chunk_count}.parquet")
-                    df.to_parquet(parquet_path, index=False)
+                    bt.logging.info(f"Starting preprocessing for batch with {batch.num_rows} rows")
+                    table = self.preprocess_data(batch, source)
+                    rows_to_upload = min(table.num_rows, 400_000_000 - total_rows)
 
-                    bt.logging.info(f"Saving chunk to Parquet file: {parquet_path}")
+                    if rows_to_upload < table.num_rows:
+                        table = table.slice(0, rows_to_upload)  # Trim the table if necessary
 
-                    bt.logging.info("Collecting statistics for the current chunk")
-                    chunk_stats = self.collect_statistics(df, source)
-                    all_stats = self.merge_statistics(all_stats, chunk_stats)
+                    if table.num_rows == 0:
+                        continue
 
-                    chunk_count += 1
-                    total_rows += len(df)
-                    new_rows += len(df)
+                    if writer is None:
+                        chunk_id = next_chunk_id
+                        parquet_path = os.path.join(self.output_dir,
+                                                    f"{platform}_train-DataEntity_chunk_{chunk_id}.parquet")
+                        bt.logging.info(f"Saving chunk to Parquet file: {parquet_path}")
+                        writer = pq.ParquetWriter(parquet_path, schema, **get_parquet_writer_options(schema))
+                        chunk_hasher = ChunkHasher()
+                        chunk_rows = 0
+                        chunk_stats = []
+                        first_row = (batch.column('datetime')[0].as_py(), batch.column('uri')[0].as_py())
+
+                    writer.write_table(table, row_group_size=self.row_group_size)
+                    chunk_hasher.update(batch)
+                    # Stats are only added once the chunk is recorded, in case it turns out to be a duplicate.
+                    chunk_stats.append(table.select(stats_columns))
+                    chunk_rows += table.num_rows
+                    last_row = (batch.column('datetime')[-1].as_py(), batch.column('uri')[-1].as_py())
+
+                    if chunk_rows >= self.chunk_size:
+                        writer.close()
+                        writer = None
+                        if self.record_chunk(repo_id, chunk_id, parquet_path, chunk_hasher, chunk_rows,
+                                             first_row, last_row, chunk_stats, stats):
+                            total_rows += chunk_rows
+                            new_rows += chunk_rows
+                            next_chunk_id += 1
+                            chunk_count += 1
 
                     if chunk_count == 10:
                         self.upload_parquet_to_hf(repo_id)
                         bt.logging.info(f'Uploaded {chunk_count} chunks to {repo_id}')
-                        next_chunk_id += chunk_count
                         chunk_count = 0
-                        with self.get_db_connection() as conn:
+                        with self.get_db_connection(live=True) as conn:
                             self.manage_wal(conn)
 
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                    if self.record_chunk(repo_id, chunk_id, parquet_path, chunk_hasher, chunk_rows,
+                                         first_row, last_row, chunk_stats, stats):
+                        total_rows += chunk_rows
+                        new_rows += chunk_rows
+                        chunk_count += 1
+
                 if chunk_count > 0:
                     self.upload_parquet_to_hf(repo_id)
-                    with self.get_db_connection() as conn:
+                    with self.get_db_connection(live=True) as conn:
                         self.manage_wal(conn)
                     bt.logging.info(f'Uploaded final {chunk_count} chunks to {repo_id}')
 
@@ -310,7 +479,8 @@ class DualUploader:
 
                 if new_rows > 0:
                     # Update stats
-                    updated_stats = self.save_stats_json(all_stats, platform, new_rows, repo_id)
+                    stats.record_upload(new_rows)
+                    updated_stats = self.save_stats_json(stats, repo_id)
 
                     # Update README and save stats.json
                     update_history = updated_stats['summary']['update_history']
@@ -336,129 +506,37 @@ class DualUploader:
 
             except Exception as e:
                 bt.logging.error(f"Error during upload for source {source}: {e}")
+                if writer is not None:
+                    # Drop the partially written chunk. Its rows are read again on the next upload.
+                    writer.close()
+                    os.remove(parquet_path)
 
         return hf_metadata_list
 
-    def collect_statistics(self, df: pd.DataFrame, source: int) -> Dict[str, Any]:
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        stats = {
-            'total_rows': len(df),
-            'start_date': df['datetime'].min().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'end_date': df['datetime'].max().strftime('%Y-%m-%dT%H:%M:%SZ'),
-            'metadata': {}
-        }
+    def get_stats_path(self, repo_id: str) -> str:
+        """Returns the local path of the stats sidecar for a repo, so a new repo never starts from another's counts."""
+        return f"{self.state_file.split('.json')[0]}_{repo_id.replace('/', '_')}_{STATS_SIDECAR_FILENAME}"
 
-        if source == DataSource.REDDIT.value:
-            stats['posts_count'] = df[df['dataType'] == 'post'].shape[0]
-            stats['comments_count'] = df[df['dataType'] == 'comment'].shape[0]
-            stats['metadata']['posts_percentage'] = (stats['posts_count'] / len(df)) * 100
-            stats['metadata']['comments_percentage'] = (stats['comments_count'] / len(df)) * 100
-            subreddit_counts = df['communityName'].value_counts().to_dict()
-            stats['subreddits'] = {subreddit: {'count': count, 'percentage': (count / len(df)) * 100}
-                                   for subreddit, count in subreddit_counts.items()}
-        else:  # X (Twitter)
-            # Count tweets with and without hashtags
-            tweets_with_hashtags = df[df['label'] != 'NULL']
-            tweets_without_hashtags = df[df['label'] == 'NULL']
-            stats['tweets_with_hashtags_count'] = len(tweets_with_hashtags)
-            stats['tweets_without_hashtags_count'] = len(tweets_without_hashtags)
-            stats['metadata']['tweets_with_hashtags_percentage'] = (stats['tweets_with_hashtags_count'] / len(df)) * 100
-            stats['metadata']['tweets_without_hashtags_percentage'] = (stats['tweets_without_hashtags_count'] / len(
-                df)) * 100
-
-            # Extract and count hashtags
-            all_hashtags = tweets_with_hashtags['label'].str.split().explode()
-            hashtag_counts = all_hashtags.value_counts().to_dict()
-
-            stats['hashtags'] = {
-                hashtag: {
-                    'count': count,
-                    'percentage': (count / len(df)) * 100
-                }
-                for hashtag, count in hashtag_counts.items()
-            }
-
-            # Add "NULL" for tweets without hashtags
-            stats['hashtags']['NULL'] = {
-                'count': stats['tweets_without_hashtags_count'],
-                'percentage': stats['metadata']['tweets_without_hashtags_percentage']
-            }
-
-        return stats
-
-    def merge_statistics(self, old_stats: Dict[str, Any], new_stats: Dict[str, Any]) -> Dict[str, Any]:
-        merged = old_stats.copy()
-        for key, value in new_stats.items():
-            if key in ['total_rows', 'posts_count', 'comments_count', 'tweets_with_hashtags_count',
-                       'tweets_without_hashtags_count']:
-                merged[key] = merged.get(key, 0) + value
-            elif key in ['start_date', 'end_date']:
-                if key == 'start_date':
-                    merged[key] = min(merged.get(key, value), value)
-                else:
-                    merged[key] = max(merged.get(key, value), value)
-            elif key in ['subreddits', 'hashtags']:
-                merged[key] = self.merge_top_items(merged.get(key, {}), value)
-            elif key == 'metadata':
-                merged[key] = self.merge_metadata(merged.get(key, {}), value)
-        return merged
-
-    def merge_metadata(self, old_metadata: Dict[str, float], new_metadata: Dict[str, float]) -> Dict[str, float]:
-        merged_metadata = old_metadata.copy()
-        for key, value in new_metadata.items():
-            if key in merged_metadata:
-                # For percentages, we take the average
-                merged_metadata[key] = (merged_metadata[key] + value) / 2
-            else:
-                merged_metadata[key] = value
-        return merged_metadata
-
-    def merge_top_items(self, old_items: Dict[str, Dict[str, Union[int, float]]],
-                        new_items: Dict[str, Dict[str, Union[int, float]]]) -> Dict[str, Dict[str, Union[int, float]]]:
-        merged = {k: v.copy() for k, v in old_items.items()}
-        for k, v in new_items.items():
-            if k in merged:
-                merged[k]['count'] += v['count']
-            else:
-                merged[k] = v.copy()
-
-        total_count = sum(item['count'] for item in merged.values())
-        for item in merged.values():
-            item['percentage'] = (item['count'] / total_count) * 100 if total_count > 0 else 0
-
-        return merged
-
-    def update_topics(self, existing_topics: List[Dict[str, Any]], new_topics: Dict[str, Dict[str, Any]],
-                      platform: str) -> List[Dict[str, Any]]:
+    def load_stats_accumulator(self, repo_id: str, source: int) -> StatsAccumulator:
         """
-        Updated method to handle topics without update history
+        Load the stats accumulator for a source, preferring the local sidecar, then the sidecar in the HF repo,
+        and finally migrating the repo's stats.json.
         """
-        topic_type = "subreddit" if platform == "reddit" else "hashtag"
-        topic_dict = {topic["topic"]: topic for topic in existing_topics if topic["topic_type"] == topic_type}
-
-        for topic_name, data in new_topics.items():
-            if topic_name in topic_dict:
-                # Update existing topic counts
-                topic_dict[topic_name]["total_count"] += data["count"]
-            else:
-                # Create new topic
-                topic_dict[topic_name] = {
-                    "topic": topic_name,
-                    "topic_type": topic_type,
-                    "total_count": data["count"],
-                    "total_percentage": 0  # Will be calculated below
-                }
-
-        # Recalculate total percentages
-        total_count = sum(topic["total_count"] for topic in topic_dict.values())
-        if total_count > 0:
-            for topic in topic_dict.values():
-                topic["total_percentage"] = (topic["total_count"] / total_count) * 100
-        else:
-            for topic in topic_dict.values():
-                topic["total_percentage"] = 0
+        stats_path = self.get_stats_path(repo_id)
+        try:
+            if os.path.exists(stats_path):
+                return StatsAccumulator.load(stats_path)
+        except Exception as e:
+            bt.logging.warning(f"Error loading local stats sidecar {stats_path}: {e}")
+
+        try:
+            local_path = hf_hub_download(repo_id=repo_id, filename=STATS_SIDECAR_FILENAME, repo_type="dataset",
+                                         token=self.hf_token)
+            return StatsAccumulator.load(local_path)
+        except Exception as e:
+            bt.logging.info(f"No stats sidecar loaded from {repo_id}, building it from stats.json: {e}")
 
-        return list(topic_dict.values())
+        return StatsAccumulator.from_stats(self.load_existing_stats(repo_id), source)
 
     def load_existing_stats(self, repo_id: str) -> Dict[str, Any]:
         """
@@ -493,77 +571,36 @@ class DualUploader:
             return get_default_stats_structure()
 
     @retry_upload()
-    def save_stats_json(self, platform_stats: Dict[str, Any], platform: str, new_rows: int, repo_id: str) -> Dict[
-        str, Any]:
+    def save_stats_json(self, stats: StatsAccumulator, repo_id: str) -> Dict[str, Any]:
         """
-        Updated method to save stats with the new structure
+        Upload stats.json and the stats sidecar in a single commit, then keep the sidecar locally for the next upload.
         """
         filename = "stats.json"
 
         try:
-            existing_stats = self.load_existing_stats(repo_id)
-
-            # Ensure version is set to 2.0.0
-            existing_stats["version"] = "2.0.0"
-
-            if existing_stats["data_source"] is None:
-                existing_stats["data_source"] = platform
-
-            merged_stats = self.merge_statistics(existing_stats, platform_stats)
-
-            merged_stats["summary"]["total_rows"] += new_rows
-            merged_stats["summary"]["last_update_dt"] = dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            if merged_stats["summary"]["start_dt"] is None or platform_stats["start_date"] < merged_stats["summary"][
-                "start_dt"]:
-                merged_stats["summary"]["start_dt"] = platform_stats["start_date"]
-
-            if merged_stats["summary"]["end_dt"] is None or platform_stats["end_date"] > merged_stats["summary"][
-                "end_dt"]:
-                merged_stats["summary"]["end_dt"] = platform_stats["end_date"]
-
-            merged_stats["summary"]["update_history"].append({
-                "timestamp": merged_stats["summary"]["last_update_dt"],
-                "count": new_rows
-            })
-
-            # Update topics with simplified structure
-            merged_stats["topics"] = self.update_topics(
-                merged_stats.get("topics", []),
-                platform_stats.get('subreddits' if platform == 'reddit' else 'hashtags', {}),
-                platform
-            )
-
-            # Update metadata percentages
-            total_rows = merged_stats["summary"]["total_rows"]
-            if platform == 'reddit':
-                merged_stats["summary"]["metadata"]["posts_percentage"] = (
-                                merged_stats.get("posts_count", 0) / total_rows) * 100 if total_rows > 0 else 0
-                merged_stats["summary"]["metadata"]["comments_percentage"] = (
-                                merged_stats.get("comments_count", 0) / total_rows) * 100 if total_rows > 0 else 0
-            else:  # X (Twitter)
-                merged_stats["summary"]["metadata"]["tweets_with_hashtags_percentage"] = (
-                                merged_stats.get("tweets_with_hashtags_count", 0) / total_rows) * 100 if total_rows > 0 else 0
-                merged_stats["summary"]["metadata"]["tweets_without_hashtags_percentage"] = (
-                                merged_stats.get("tweets_without_hashtags_count", 0) / total_rows) * 100 if total_rows > 0 else 0
-
-            stats_json = json.dumps(merged_stats, indent=2, cls=NumpyEncoder)
+            updated_stats = stats.to_stats()
+            stats_json = json.dumps(updated_stats, indent=2, cls=NumpyEncoder)
             sanitized_stats_json = self.sanitize_json(stats_json)
 
-            self.hf_api.upload_file(
-                token=self.hf_token,
-                path_or_fileobj=sanitized_stats_json.encode(),
-                path_in_repo=filename,
+            self.hf_api.create_commit(
                 repo_id=repo_id,
                 repo_type="dataset",
+                operations=[
+                    CommitOperationAdd(path_in_repo=filename, path_or_fileobj=sanitized_stats_json.encode()),
+                    CommitOperationAdd(path_in_repo=STATS_SIDECAR_FILENAME, path_or_fileobj=stats.serialize()),
+                ],
+                commit_message=f"Update {filename}",
+                token=self.hf_token,
             )
+            stats.save(self.get_stats_path(repo_id))
 
-            bt.logging.info(f"Successfully updated {filename} for {platform} dataset in {repo_id}")
-            return merged_stats
+            bt.logging.info(f"Successfully updated {filename} for {stats.platform} dataset in {repo_id}")
+            return updated_stats
 
         except Exception as e:
-            bt.logging.error(f"Error saving merged stats JSON: {e}")
+            bt.logging.error(f"Error saving stats JSON: {e}")
             raise
+
     def check_wal_size(self):
         wal_file = f"{self.db_path}-wal"
         if os.path.exists(wal_file):
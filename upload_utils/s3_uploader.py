@@ -4,19 +4,25 @@ Uploads data using exact job IDs from Gravity as folder names:
 hotkey={hotkey_id}/job_id={job_id}/parquet_files
 
 NO ENCODING - Raw data upload to S3
-Uses offset-based tracking for continuous processing of new data
+Uses (datetime, uri) keyset cursors for continuous processing of new data
 """
 
 import os
+import io
 import json
+import collections
 import datetime as dt
 import pandas as pd
 import bittensor as bt
 import sqlite3
 import re
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import List, Dict
+from typing import Deque, List, Dict, Optional, Tuple
 from upload_utils.s3_utils import S3Auth
+from upload_utils.export_snapshot import SharedExportSnapshot
+from storage.miner.content_compression import register_content_functions
+from storage.miner.keyword_index import LIKE_ESCAPE, keyword_like_pattern, keyword_match_query
 from common.data import DataSource
 
 
@@ -56,6 +62,8 @@ class S3PartitionedUploader:
         state_file: str,
         output_dir: str = 's3_partitioned_storage',
         chunk_size: int = 1_000_000,
+        max_upload_workers: int = 4,
+        export_snapshot: Optional[SharedExportSnapshot] = None,
     ):
         self.db_path = db_path
         self.wallet = wallet
@@ -65,22 +73,45 @@ class S3PartitionedUploader:
         self.state_file = f"{state_file.split('.json')[0]}_s3_partitioned.json"
         self.output_dir = os.path.join(output_dir, self.miner_hotkey)
         self.chunk_size = chunk_size
+        # Uploads run in parallel with reading the next chunks, holding at most max_pending_uploads in memory.
+        self.max_upload_workers = max_upload_workers
+        self.max_pending_uploads = 2 * max_upload_workers
+        # Read uploads from a snapshot of the database, shared with the other uploaders, rather than the live database.
+        self.export_snapshot = export_snapshot
+        self.export_db_path = None
 
         # Load processed state - tracks last processed info per job
         self.processed_state = self._load_processed_state()
 
     @contextmanager
     def get_db_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=60.0)
+        """Connect to the export snapshot while one is in use, or to the live database."""
+        conn = sqlite3.connect(self.export_db_path or self.db_path, timeout=60.0)
         try:
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
             conn.execute("PRAGMA temp_store=MEMORY")
             conn.execute("PRAGMA cache_size=-2000000")
+            # Allow queries to read content the miner storage compressed.
+            register_content_functions(conn)
             yield conn
         finally:
             conn.close()
 
+    @contextmanager
+    def export_database(self):
+        """Read from a snapshot of the database within the context, if export snapshots are enabled."""
+        if self.export_snapshot is None:
+            yield
+            return
+
+        with self.export_snapshot.use() as snapshot_path:
+            self.export_db_path = snapshot_path
+            try:
+                yield
+            finally:
+                self.export_db_path = None
+
     def _load_processed_state(self) -> Dict[str, Dict]:
         """Load processed state - tracks last processed info per job"""
         if os.path.exists(self.state_file):
@@ -99,18 +130,46 @@ class S3PartitionedUploader:
         except Exception as e:
             bt.logging.error(f"Failed to save processed state: {e}")
 
-    def _get_last_processed_offset(self, job_id: str) -> int:
-        """Get the last processed offset for a job"""
+    def _get_last_processed_cursor(
+        self, job_id: str, source: int, condition: Tuple[str, List]
+    ) -> Optional[Tuple[str, str]]:
+        """Get the (datetime, uri) of the last processed row for a job, or None to start from the beginning"""
         job_state = self.processed_state.get(job_id, {})
-        return job_state.get('last_offset', 0)
+        if 'last_cursor' in job_state:
+            return tuple(job_state['last_cursor']) if job_state['last_cursor'] else None
+
+        # State files written before cursors were introduced only have an offset. Resolve it to the row at that
+        # offset once, after which the job pages by cursor.
+        offset = job_state.get('last_offset', 0)
+        if offset <= 0:
+            return None
+
+        condition_sql, condition_params = condition
+        query = f"""
+            SELECT datetime, uri
+            FROM DataEntity
+            WHERE source = ? AND ({condition_sql})
+            ORDER BY datetime ASC, uri ASC
+            LIMIT 1 OFFSET ?
+        """
+        try:
+            with self.get_db_connection() as conn:
+                row = conn.execute(query, [source] + condition_params + [offset - 1]).fetchone()
+        except Exception as e:
+            bt.logging.error(f"Error resolving offset {offset} for job {job_id}: {e}")
+            row = None
+
+        return tuple(row) if row else None
 
-    def _update_processed_state(self, job_id: str, new_offset: int, records_processed: int):
+    def _update_processed_state(self, job_id: str, new_cursor: Tuple[str, str], records_processed: int):
         """Update the processed state for a job"""
         if job_id not in self.processed_state:
             self.processed_state[job_id] = {}
 
+        # Drop the offset of state files written before cursors were introduced.
+        self.processed_state[job_id].pop('last_offset', None)
         self.processed_state[job_id].update({
-            'last_offset': new_offset,
+            'last_cursor': list(new_cursor),
             'total_records_processed': self.processed_state[job_id].get('total_records_processed', 0) + records_processed,
             'last_processed_time': dt.datetime.now().isoformat(),
             'processing_completed': False  # Never mark as "completed" - always check for new data
@@ -171,86 +230,140 @@ class S3PartitionedUploader:
             bt.logging.error(f"Failed to load jobs from Gravity: {e}")
             return {}
 
-    def _get_label_data(self, source: int, label: str, offset: int = 0) -> pd.DataFrame:
-        """Get data matching exact label"""
+    def _get_label_condition(self, source: int, label: str) -> Tuple[str, List]:
+        """Get the SQL condition and parameters matching exact label"""
         # Normalize label for SQL query
         normalized_label = label.lower().strip()
 
         # Build label conditions based on source
         if source == DataSource.REDDIT.value:
             # For Reddit: check both with and without r/ prefix
-            label_conditions = [
-                f"LOWER(label) = '{normalized_label}'",
-                f"LOWER(label) = 'r/{normalized_label.removeprefix('r/')}'",
-            ]
+            labels = [normalized_label, f"r/{normalized_label.removeprefix('r/')}"]
         else:
             # For X: check hashtags with and without #
-            label_conditions = [
-                f"LOWER(label) = '{normalized_label}'",
-                f"LOWER(label) = '#{normalized_label.removeprefix('#')}'",
-            ]
-
-        label_condition_sql = " OR ".join(label_conditions)
-
-        query = f"""
-            SELECT uri, datetime, label, content
-            FROM DataEntity
-            WHERE source = ? AND ({label_condition_sql})
-            ORDER BY datetime ASC
-            LIMIT ? OFFSET ?
-        """
-        params = [source, self.chunk_size, offset]
-
-        try:
-            with self.get_db_connection() as conn:
-                df = pd.read_sql_query(query, conn, params=params, parse_dates=['datetime'])
+            labels = [normalized_label, f"#{normalized_label.removeprefix('#')}"]
 
-            bt.logging.debug(f"Found {len(df)} records for label '{label}' in source {source} (offset: {offset})")
-            return df
+        return "LOWER(label) IN (?, ?)", labels
 
-        except Exception as e:
-            bt.logging.error(f"Error querying label data for {source}/{label}: {e}")
-            return pd.DataFrame()
+    def _has_keyword_index(self) -> bool:
+        """Whether the miner storage maintains the full-text keyword index"""
+        with self.get_db_connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'DataEntityTextIndex'"
+            ).fetchone() is not None
 
-    def _get_keyword_data_chunk(self, source: int, keyword: str, offset: int = 0) -> pd.DataFrame:
-        """Get chunk of data where keyword appears in text content"""
+    def _get_keyword_condition(self, source: int, keyword: str) -> Tuple[str, List]:
+        """Get the SQL condition and parameters matching rows where keyword appears in text content"""
         # Normalize keyword
         normalized_keyword = keyword.lower().strip()
 
+        if self._has_keyword_index():
+            # The index holds the same text fields searched below, so no content needs to be parsed.
+            match_query = keyword_match_query(normalized_keyword)
+            if match_query is not None:
+                return (
+                    "uri IN (SELECT uri FROM DataEntityTextIndex WHERE text MATCH ?)",
+                    [match_query],
+                )
+            # Keywords too short for the trigram index scan the indexed text instead.
+            return (
+                f"uri IN (SELECT uri FROM DataEntityText WHERE text LIKE ? ESCAPE '{LIKE_ESCAPE}')",
+                [keyword_like_pattern(normalized_keyword)],
+            )
+
         # Build content search conditions - focus on main text fields
         if source == DataSource.REDDIT.value:
-            # Search Reddit body field specifically
-            content_conditions = [
-                f"LOWER(JSON_EXTRACT(content, '$.body')) LIKE '%{normalized_keyword}%'",
-                f"LOWER(JSON_EXTRACT(content, '$.title')) LIKE '%{normalized_keyword}%'"
-            ]
+            # Search Reddit body and title fields specifically
+            fields = ['body', 'title']
         else:
             # Search X text field specifically
-            content_conditions = [
-                f"LOWER(JSON_EXTRACT(content, '$.text')) LIKE '%{normalized_keyword}%'"
-            ]
+            fields = ['text']
+
+        content_conditions = [
+            f"LOWER(JSON_EXTRACT(decompress_content(content), '$.{field}')) LIKE ? ESCAPE '{LIKE_ESCAPE}'"
+            for field in fields
+        ]
+        return " OR ".join(content_conditions), [keyword_like_pattern(normalized_keyword)] * len(fields)
 
-        content_condition_sql = " OR ".join(content_conditions)
+    def _get_condition(self, source: int, search_type: str, value: str) -> Tuple[str, List]:
+        """Get the SQL condition and parameters selecting the rows of a job"""
+        if search_type == "label":
+            return self._get_label_condition(source, value)
+        return self._get_keyword_condition(source, value)
+
+    def _get_data_chunk(
+        self,
+        source: int,
+        condition: Tuple[str, List],
+        cursor: Optional[Tuple[str, str]] = None,
+        selective: bool = False,
+    ) -> Tuple[pd.DataFrame, Optional[Tuple[str, str]]]:
+        """
+        Get the next chunk of rows matching the condition after the (datetime, uri) cursor.
+
+        Returns the chunk and the cursor of its last row. Paging by cursor rather than offset means each chunk
+        seeks straight to where the last one ended, and rows deleted by eviction can't shift the position.
+
+        If selective, the condition is expected to match few rows by uri, so the query looks those up directly and
+        sorts them rather than walking every row of the source in datetime order.
+        """
+        condition_sql, condition_params = condition
+        # A unary + stops SQLite from using the (source, datetime) index for the term.
+        column_prefix = "+" if selective else ""
+        if cursor is None:
+            cursor_sql = ""
+            params = [source] + condition_params + [self.chunk_size]
+        else:
+            cursor_sql = f"AND ({column_prefix}datetime, uri) > (?, ?)"
+            params = [source] + condition_params + [cursor[0], cursor[1], self.chunk_size]
 
         query = f"""
-            SELECT uri, datetime, label, content
+            SELECT uri, datetime, label, decompress_content(content) AS content
             FROM DataEntity
-            WHERE source = ? AND ({content_condition_sql})
-            ORDER BY datetime ASC
-            LIMIT ? OFFSET ?
+            WHERE {column_prefix}source = ? AND ({condition_sql}) {cursor_sql}
+            ORDER BY datetime ASC, uri ASC
+            LIMIT ?
         """
-        params = [source, self.chunk_size, offset]
 
+        with self.get_db_connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+
+        if df.empty:
+            return df, cursor
+
+        # Keep the stored datetime text for the cursor so comparisons match what SQLite stores.
+        next_cursor = (df['datetime'].iloc[-1], df['uri'].iloc[-1])
+        df['datetime'] = pd.to_datetime(df['datetime'], format='ISO8601')
+        return df, next_cursor
+
+    def _get_label_data(
+        self, source: int, label: str, cursor: Optional[Tuple[str, str]] = None
+    ) -> Tuple[pd.DataFrame, Optional[Tuple[str, str]]]:
+        """Get the next chunk of data matching exact label"""
         try:
-            with self.get_db_connection() as conn:
-                df = pd.read_sql_query(query, conn, params=params, parse_dates=['datetime'])
+            df, next_cursor = self._get_data_chunk(source, self._get_label_condition(source, label), cursor)
+            bt.logging.debug(f"Found {len(df)} records for label '{label}' in source {source} (cursor: {cursor})")
+            return df, next_cursor
 
-            bt.logging.debug(f"Found {len(df)} records for keyword '{keyword}' in source {source} (offset: {offset})")
-            return df
+        except Exception as e:
+            bt.logging.error(f"Error querying label data for {source}/{label}: {e}")
+            return pd.DataFrame(), cursor
+
+    def _get_keyword_data_chunk(
+        self, source: int, keyword: str, cursor: Optional[Tuple[str, str]] = None
+    ) -> Tuple[pd.DataFrame, Optional[Tuple[str, str]]]:
+        """Get the next chunk of data where keyword appears in text content"""
+        try:
+            # Keyword index conditions resolve the matching uris up front.
+            df, next_cursor = self._get_data_chunk(
+                source, self._get_keyword_condition(source, keyword), cursor, selective=self._has_keyword_index()
+            )
+            bt.logging.debug(f"Found {len(df)} records for keyword '{keyword}' in source {source} (cursor: {cursor})")
+            return df, next_cursor
 
         except Exception as e:
             bt.logging.error(f"Error querying keyword data for {source}/{keyword}: {e}")
-            return pd.DataFrame()
+            return pd.DataFrame(), cursor
 
     def _create_raw_dataframe(self, df: pd.DataFrame, source: int) -> pd.DataFrame:
         """Create raw dataframe with decoded content - NO ENCODING"""
@@ -314,43 +427,29 @@ class S3PartitionedUploader:
             bt.logging.error(f"Error creating raw dataframe: {e}")
             return pd.DataFrame()
 
-    def _upload_data_chunk(self, df: pd.DataFrame, source: int, job_id: str, s3_creds: Dict) -> bool:
-        """Upload chunk directly to job_id folder (no source or date partitioning)"""
-        if df.empty:
-            return True
-
-        try:
-            raw_df = self._create_raw_dataframe(df, source)
-            if raw_df.empty:
-                bt.logging.warning(f"No data after raw processing for job {job_id}")
-                return True
-
-            # Create local parquet file
-            if not os.path.exists(self.output_dir):
-                os.makedirs(self.output_dir, exist_ok=True)
+    def _build_parquet_buffer(self, df: pd.DataFrame, source: int, job_id: str) -> Optional[bytes]:
+        """Build the parquet file for a chunk in memory, returning None if there is nothing to upload"""
+        raw_df = self._create_raw_dataframe(df, source)
+        if raw_df.empty:
+            bt.logging.warning(f"No data after raw processing for job {job_id}")
+            return None
 
-            # Generate filename with timestamp and record count
-            timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"data_{timestamp}_{len(raw_df)}.parquet"
-            local_path = os.path.join(self.output_dir, filename)
-
-            # Save to parquet
-            raw_df.to_parquet(local_path, index=False)
+        buffer = io.BytesIO()
+        raw_df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
 
+    def _upload_parquet_buffer(self, buffer: bytes, filename: str, job_id: str, s3_creds: Dict) -> bool:
+        """Upload a parquet buffer directly to job_id folder (no source or date partitioning)"""
+        try:
             # Create S3 path: hotkey={hotkey_id}/job_id={job_id}/{filename}.parquet
             s3_path = f"job_id={job_id}/{filename}"
 
-            # Upload to S3
-            upload_success = self.s3_auth.upload_file_with_path(local_path, s3_path, s3_creds)
+            upload_success = self.s3_auth.upload_bytes_with_path(buffer, s3_path, s3_creds)
 
             if upload_success:
-                bt.logging.success(f"Uploaded {len(raw_df)} records to job {job_id}")
+                bt.logging.success(f"Uploaded {filename} to job {job_id}")
             else:
-                bt.logging.error(f"Failed to upload {len(raw_df)} records to job {job_id}")
-
-            # Clean up local file
-            if os.path.exists(local_path):
-                os.remove(local_path)
+                bt.logging.error(f"Failed to upload {filename} to job {job_id}")
 
             return upload_success
 
@@ -358,47 +457,102 @@ class S3PartitionedUploader:
             bt.logging.error(f"Error uploading data chunk for job {job_id}: {e}")
             return False
 
-    def _process_job(self, job_id: str, job_config: Dict, s3_creds: Dict) -> bool:
-        """Process a single job using exact job_id as folder name"""
-        source = job_config["source"]
-        search_type = job_config["type"]
-        value = job_config["value"]
+    def _checkpoint_uploads(self, job_id: str, pending: Deque, wait: bool) -> Tuple[bool, int]:
+        """
+        Checkpoint finished uploads from the front of pending, in the order their chunks were read.
 
-        offset = self._get_last_processed_offset(job_id)
+        Only a prefix of successful uploads is checkpointed, so a failed chunk and everything after it are read
+        again on the next run. If wait, blocks until at least the oldest pending upload finishes.
 
-        bt.logging.info(f"Processing job {job_id} ({search_type}: {value}), starting from offset: {offset}")
+        Returns whether every finished upload succeeded, and how many records were checkpointed.
+        """
+        records_checkpointed = 0
+        while pending and (wait or pending[0][0].done()):
+            future, cursor, records = pending.popleft()
+            wait = False
+
+            if not future.result():
+                # Don't start uploads of later chunks that could never be checkpointed.
+                for later_future, _, _ in pending:
+                    later_future.cancel()
+                pending.clear()
+                return False, records_checkpointed
+
+            self._update_processed_state(job_id, cursor, records)
+            self._save_processed_state()
+            records_checkpointed += records
 
-        total_processed = 0
+        return True, records_checkpointed
 
-        while True:
-            # Get next chunk based on search type
-            if search_type == "label":
-                chunk_df = self._get_label_data(source, value, offset)
-            else:  # keyword
-                chunk_df = self._get_keyword_data_chunk(source, value, offset)
-
-            if chunk_df.empty:
-                bt.logging.info(f"No new data for job {job_id}, total processed this run: {total_processed}")
-                break
-
-            # Upload chunk using job_id as folder name
-            success = self._upload_data_chunk(chunk_df, source, job_id, s3_creds)
-            if not success:
-                bt.logging.error(f"Failed to upload chunk for job {job_id}")
-                return False
+    def _process_job(self, job_id: str, job_config: Dict, s3_creds: Dict) -> bool:
+        """
+        Process a single job using exact job_id as folder name.
 
-            total_processed += len(chunk_df)
-            offset += len(chunk_df)
+        Chunks are read and converted to parquet in memory on this thread while up to max_upload_workers
+        previous chunks upload in the background, so the database, CPU and network work overlap.
+        """
+        source = job_config["source"]
+        search_type = job_config["type"]
+        value = job_config["value"]
 
-            # Update state after each successful chunk
-            self._update_processed_state(job_id, offset, len(chunk_df))
-            self._save_processed_state()
+        cursor = self._get_last_processed_cursor(job_id, source, self._get_condition(source, search_type, value))
 
-            bt.logging.info(f"Processed {total_processed} new records for job {job_id}")
+        bt.logging.info(f"Processing job {job_id} ({search_type}: {value}), starting after cursor: {cursor}")
 
-            # If we got less than chunk_size, we've reached the end for now
-            if len(chunk_df) < self.chunk_size:
-                break
+        total_processed = 0
+        success = True
+        timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+        # (upload future, cursor after the chunk, records in the chunk), in the order the chunks were read.
+        pending = collections.deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_upload_workers) as executor:
+            sequence = 0
+            while success:
+                # Get next chunk based on search type
+                if search_type == "label":
+                    chunk_df, next_cursor = self._get_label_data(source, value, cursor)
+                else:  # keyword
+                    chunk_df, next_cursor = self._get_keyword_data_chunk(source, value, cursor)
+
+                if chunk_df.empty:
+                    bt.logging.info(f"No new data for job {job_id}")
+                    break
+
+                buffer = self._build_parquet_buffer(chunk_df, source, job_id)
+                if buffer is None:
+                    # Nothing to upload but the chunk still counts as processed.
+                    future = Future()
+                    future.set_result(True)
+                else:
+                    # Bound the number of parquet buffers held in memory.
+                    while success and len(pending) >= self.max_pending_uploads:
+                        success, records = self._checkpoint_uploads(job_id, pending, wait=True)
+                        total_processed += records
+                    if not success:
+                        break
+
+                    # Generate filename with timestamp, chunk sequence and record count
+                    filename = f"data_{timestamp}_{sequence}_{len(chunk_df)}.parquet"
+                    future = executor.submit(self._upload_parquet_buffer, buffer, filename, job_id, s3_creds)
+                    sequence += 1
+
+                pending.append((future, next_cursor, len(chunk_df)))
+                cursor = next_cursor
+
+                success, records = self._checkpoint_uploads(job_id, pending, wait=False)
+                total_processed += records
+
+                # If we got less than chunk_size, we've reached the end for now
+                if len(chunk_df) < self.chunk_size:
+                    break
+
+            while success and pending:
+                success, records = self._checkpoint_uploads(job_id, pending, wait=True)
+                total_processed += records
+
+        if not success:
+            bt.logging.error(f"Failed to upload chunk for job {job_id}, total processed this run: {total_processed}")
+            return False
 
         bt.logging.info(f"Completed job {job_id}: {total_processed} records processed")
         return True
@@ -429,13 +583,14 @@ class S3PartitionedUploader:
 
             overall_success = True
 
-            # Process each job using the same credentials
-            for job_id, job_config in jobs.items():
-                bt.logging.info(f"Processing job: {job_id}")
+            # Process each job using the same credentials, reading every job from the same snapshot if enabled
+            with self.export_database():
+                for job_id, job_config in jobs.items():
+                    bt.logging.info(f"Processing job: {job_id}")
 
-                job_success = self._process_job(job_id, job_config, s3_creds)
-                if not job_success:
-                    overall_success = False
+                    job_success = self._process_job(job_id, job_config, s3_creds)
+                    if not job_success:
+                        overall_success = False
 
             bt.logging.info("Completed S3 upload using job IDs")
             return overall_success
@@ -92,31 +92,50 @@ class S3Auth:
             creds: S3 credentials from API
         """
         try:
-            # Get the folder prefix from credentials (base_url)
-            folder_prefix = creds.get('folder', '')
+            with open(file_path, 'rb') as f:
+                return self._post_with_path(f, s3_path, creds)
 
-            # Construct the full S3 path by appending our relative path to the folder prefix
-            # This creates: base_url/hotkey={hotkey_id}/job_id={job_id}/filename.parquet
-            full_s3_path = f"{folder_prefix}{s3_path}"
+        except Exception as e:
+            bt.logging.error(f"❌ S3 Upload Exception for {file_path} -> {s3_path}: {e}")
+            return False
 
-            bt.logging.info(f"🔄 Uploading to S3 path: {full_s3_path}")
+    def upload_bytes_with_path(self, data: bytes, s3_path: str, creds: Dict[str, Any]) -> bool:
+        """Upload an in-memory file with custom S3 path for job-based uploads
 
-            post_data = dict(creds['fields'])  # clone all fields (V4-compatible)
-            post_data['key'] = full_s3_path  # use the full path
+        Args:
+            data: File contents
+            s3_path: Relative path within the folder (e.g., "hotkey={hotkey_id}/job_id={job_id}/filename.parquet")
+            creds: S3 credentials from API
+        """
+        try:
+            return self._post_with_path(data, s3_path, creds)
 
-            with open(file_path, 'rb') as f:
-                files = {'file': f}
-                response = requests.post(creds['url'], data=post_data, files=files)
+        except Exception as e:
+            bt.logging.error(f"❌ S3 Upload Exception for {s3_path}: {e}")
+            return False
 
-            if response.status_code == 204:
-                bt.logging.success(f"✅ S3 upload success: {full_s3_path}")
-                return True
-            else:
-                bt.logging.error(f"❌ S3 upload failed: {response.status_code} — {response.text}")
-                return False
+    def _post_with_path(self, file: Any, s3_path: str, creds: Dict[str, Any]) -> bool:
+        """POST a file object or bytes to the folder from the credentials"""
+        # Get the folder prefix from credentials (base_url)
+        folder_prefix = creds.get('folder', '')
 
-        except Exception as e:
-            bt.logging.error(f"❌ S3 Upload Exception for {file_path} -> {s3_path}: {e}")
+        # Construct the full S3 path by appending our relative path to the folder prefix
+        # This creates: base_url/hotkey={hotkey_id}/job_id={job_id}/filename.parquet
+        full_s3_path = f"{folder_prefix}{s3_path}"
+
+        bt.logging.info(f"🔄 Uploading to S3 path: {full_s3_path}")
+
+        post_data = dict(creds['fields'])  # clone all fields (V4-compatible)
+        post_data['key'] = full_s3_path  # use the full path
+
+        files = {'file': (os.path.basename(s3_path), file)}
+        response = requests.post(creds['url'], data=post_data, files=files)
+
+        if response.status_code == 204:
+            bt.logging.success(f"✅ S3 upload success: {full_s3_path}")
+            return True
+        else:
+            bt.logging.error(f"❌ S3 upload failed: {response.status_code} — {response.text}")
             return False
 
     def get_structure_info(self) -> Optional[Dict[str, Any]]:
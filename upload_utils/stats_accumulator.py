@@ -0,0 +1,301 @@
+"""Streaming statistics for the Hugging Face dataset cards.
+
+A StatsAccumulator is updated once per uploaded Arrow batch and persisted as a small binary sidecar next to
+stats.json, so each upload only has to process its new rows instead of re-merging the full statistics.
+"""
+
+import datetime as dt
+import heapq
+import json
+import os
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from common.data import DataSource
+from upload_utils.utils import STATS_VERSION
+
+# Name of the sidecar in the dataset repo.
+STATS_SIDECAR_FILENAME = "stats.arrow"
+
+# Maximum number of distinct subreddits or hashtags tracked per dataset.
+DEFAULT_TOPIC_CAPACITY = 10_000
+
+_SIDECAR_VERSION = 1
+
+_COUNT_KEYS_BY_SOURCE = {
+    DataSource.REDDIT.value: ("posts_count", "comments_count"),
+    DataSource.X.value: ("tweets_with_hashtags_count", "tweets_without_hashtags_count"),
+}
+
+
+class StatsAccumulator:
+    """Accumulates the dataset card statistics of a source one Arrow batch at a time.
+
+    Row counts and date bounds are exact. Topic (subreddit or hashtag) counts are kept in a Space-Saving summary of at
+    most topic_capacity entries: while fewer distinct topics have been seen the counts are exact, and afterwards each
+    tracked count overestimates the true count by at most its recorded error. Memory use and the size of the written
+    stats therefore stay bounded however many topics the dataset has.
+    """
+
+    def __init__(self, source: int, topic_capacity: int = DEFAULT_TOPIC_CAPACITY):
+        if source not in _COUNT_KEYS_BY_SOURCE:
+            raise ValueError(f"Unsupported source {source}.")
+
+        self.source = source
+        self.topic_capacity = topic_capacity
+
+        self.total_rows = 0
+        self.start_dt: Optional[str] = None
+        self.end_dt: Optional[str] = None
+        # Posts and comments for Reddit, tweets with and without hashtags for X.
+        self.counts: Dict[str, int] = {key: 0 for key in _COUNT_KEYS_BY_SOURCE[source]}
+
+        self.topic_counts: Dict[str, int] = {}
+        self.topic_errors: Dict[str, int] = {}
+        # The highest count an untracked topic can have. Newly tracked topics start from it.
+        self.topic_floor = 0
+        # The exact total of all topic counts, tracked or not.
+        self.topic_total = 0
+
+        self.last_update_dt: Optional[str] = None
+        self.update_history: List[Dict[str, Any]] = []
+
+    @property
+    def platform(self) -> str:
+        return "reddit" if self.source == DataSource.REDDIT.value else "x"
+
+    @property
+    def topic_type(self) -> str:
+        return "subreddit" if self.source == DataSource.REDDIT.value else "hashtag"
+
+    def update(self, table: pa.Table):
+        """Adds the rows of an uploaded table.
+
+        The table needs the datetime and label columns, and for Reddit also the dataType and communityName columns.
+        """
+        n_rows = table.num_rows
+        if n_rows == 0:
+            return
+
+        self.total_rows += n_rows
+
+        date_range = pc.min_max(table.column("datetime"))
+        start_dt = _format_dt(date_range["min"].as_py())
+        end_dt = _format_dt(date_range["max"].as_py())
+        if self.start_dt is None or start_dt < self.start_dt:
+            self.start_dt = start_dt
+        if self.end_dt is None or end_dt > self.end_dt:
+            self.end_dt = end_dt
+
+        if self.source == DataSource.REDDIT.value:
+            data_type = table.column("dataType")
+            self.counts["posts_count"] += _count_equal(data_type, "post")
+            self.counts["comments_count"] += _count_equal(data_type, "comment")
+            self._add_topics(pc.value_counts(table.column("communityName")))
+        else:
+            label = table.column("label")
+            without_hashtags = _count_equal(label, "NULL")
+            self.counts["tweets_with_hashtags_count"] += n_rows - without_hashtags
+            self.counts["tweets_without_hashtags_count"] += without_hashtags
+
+            hashtags = pc.list_flatten(
+                pc.utf8_split_whitespace(pc.filter(label, pc.not_equal(label, "NULL")))
+            )
+            self._add_topics(pc.value_counts(hashtags))
+            # Tweets without hashtags are listed as the NULL hashtag.
+            if without_hashtags:
+                self._add_topic_counts({"NULL": without_hashtags})
+
+    def record_upload(self, new_rows: int):
+        """Records an upload of new_rows rows in the update history."""
+        self.last_update_dt = dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.update_history.append({"timestamp": self.last_update_dt, "count": new_rows})
+
+    def to_stats(self) -> Dict[str, Any]:
+        """Returns the statistics in the stats.json format."""
+        metadata = {
+            key.replace("_count", "_percentage"): (
+                (count / self.total_rows) * 100 if self.total_rows > 0 else 0
+            )
+            for key, count in self.counts.items()
+        }
+        topics = [
+            {
+                "topic": topic,
+                "topic_type": self.topic_type,
+                "total_count": count,
+                "total_percentage": (
+                    (count / self.topic_total) * 100 if self.topic_total > 0 else 0
+                ),
+            }
+            for topic, count in sorted(
+                self.topic_counts.items(), key=itemgetter(1), reverse=True
+            )
+        ]
+
+        return {
+            "version": STATS_VERSION,
+            "data_source": self.platform,
+            "summary": {
+                "total_rows": self.total_rows,
+                "last_update_dt": self.last_update_dt,
+                "start_dt": self.start_dt,
+                "end_dt": self.end_dt,
+                "update_history": list(self.update_history),
+                "metadata": metadata,
+            },
+            "topics": topics,
+            **self.counts,
+        }
+
+    @classmethod
+    def from_stats(
+        cls, stats: Dict[str, Any], source: int, topic_capacity: int = DEFAULT_TOPIC_CAPACITY
+    ) -> "StatsAccumulator":
+        """Creates an accumulator from an existing stats.json in the v2 format."""
+        accumulator = cls(source, topic_capacity)
+
+        summary = stats.get("summary", {})
+        accumulator.total_rows = summary.get("total_rows", 0)
+        accumulator.start_dt = summary.get("start_dt")
+        accumulator.end_dt = summary.get("end_dt")
+        accumulator.last_update_dt = summary.get("last_update_dt")
+        accumulator.update_history = list(summary.get("update_history", []))
+
+        metadata = summary.get("metadata", {})
+        for key in accumulator.counts:
+            if key in stats:
+                accumulator.counts[key] = stats[key]
+            else:
+                # Older stats only kept the percentages.
+                percentage = metadata.get(key.replace("_count", "_percentage"), 0)
+                accumulator.counts[key] = round(percentage * accumulator.total_rows / 100)
+
+        accumulator._add_topic_counts(
+            {
+                topic["topic"]: topic["total_count"]
+                for topic in stats.get("topics", [])
+                if topic.get("topic_type") == accumulator.topic_type
+            }
+        )
+        return accumulator
+
+    def serialize(self) -> bytes:
+        """Serializes the accumulator to the sidecar format: an Arrow IPC stream of the tracked topics, with the
+        remaining state in the schema metadata."""
+        state = {
+            "version": _SIDECAR_VERSION,
+            "source": self.source,
+            "topic_capacity": self.topic_capacity,
+            "total_rows": self.total_rows,
+            "start_dt": self.start_dt,
+            "end_dt": self.end_dt,
+            "counts": self.counts,
+            "topic_floor": self.topic_floor,
+            "topic_total": self.topic_total,
+            "last_update_dt": self.last_update_dt,
+            "update_history": self.update_history,
+        }
+        topics = list(self.topic_counts)
+        table = pa.table(
+            {
+                "topic": pa.array(topics, type=pa.string()),
+                "count": pa.array([self.topic_counts[topic] for topic in topics], type=pa.int64()),
+                "error": pa.array([self.topic_errors[topic] for topic in topics], type=pa.int64()),
+            }
+        ).replace_schema_metadata({"stats": json.dumps(state)})
+
+        options = pa.ipc.IpcWriteOptions(
+            compression="zstd" if pa.Codec.is_available("zstd") else None
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "StatsAccumulator":
+        """Creates an accumulator from bytes returned by serialize."""
+        table = pa.ipc.open_stream(data).read_all()
+        state = json.loads(table.schema.metadata[b"stats"])
+        if state["version"] != _SIDECAR_VERSION:
+            raise ValueError(f"Unsupported stats sidecar version {state['version']}.")
+
+        accumulator = cls(state["source"], state["topic_capacity"])
+        accumulator.total_rows = state["total_rows"]
+        accumulator.start_dt = state["start_dt"]
+        accumulator.end_dt = state["end_dt"]
+        accumulator.counts = state["counts"]
+        accumulator.topic_floor = state["topic_floor"]
+        accumulator.topic_total = state["topic_total"]
+        accumulator.last_update_dt = state["last_update_dt"]
+        accumulator.update_history = state["update_history"]
+
+        topics = table.column("topic").to_pylist()
+        accumulator.topic_counts = dict(zip(topics, table.column("count").to_pylist()))
+        accumulator.topic_errors = dict(zip(topics, table.column("error").to_pylist()))
+        return accumulator
+
+    def save(self, path: str):
+        """Writes the sidecar to path, replacing any previous one atomically."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.serialize())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "StatsAccumulator":
+        """Reads a sidecar written by save."""
+        with open(path, "rb") as f:
+            return cls.deserialize(f.read())
+
+    def _add_topics(self, value_counts: pa.StructArray):
+        self._add_topic_counts(
+            {
+                topic: count
+                for topic, count in zip(
+                    value_counts.field("values").to_pylist(),
+                    value_counts.field("counts").to_pylist(),
+                )
+                if topic
+            }
+        )
+
+    def _add_topic_counts(self, topic_counts: Dict[str, int]):
+        floor = self.topic_floor
+        for topic, count in topic_counts.items():
+            self.topic_total += count
+            if topic in self.topic_counts:
+                self.topic_counts[topic] += count
+            else:
+                # The topic may have been evicted earlier with a count of up to the floor.
+                self.topic_counts[topic] = floor + count
+                self.topic_errors[topic] = floor
+
+        if len(self.topic_counts) > self.topic_capacity:
+            kept = heapq.nlargest(
+                self.topic_capacity, self.topic_counts.items(), key=itemgetter(1)
+            )
+            kept_topics = {topic for topic, _ in kept}
+            self.topic_floor = max(
+                self.topic_floor,
+                max(
+                    count
+                    for topic, count in self.topic_counts.items()
+                    if topic not in kept_topics
+                ),
+            )
+            self.topic_counts = dict(kept)
+            self.topic_errors = {topic: self.topic_errors[topic] for topic in kept_topics}
+
+
+def _count_equal(values: pa.ChunkedArray, value: str) -> int:
+    return pc.sum(pc.equal(values, value)).as_py() or 0
+
+
+def _format_dt(value: str) -> str:
+    return pd.to_datetime(value).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -5,17 +5,65 @@ import hashlib
 from typing import Dict, Any, List, Optional
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
 import psutil
 import os
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import bittensor as bt
-from upload_utils.encoding_system import EncodingKeyManager, encode_url
+from upload_utils.encoding_system import EncodingKeyManager, EncodingPool, encode_url, encode_urls
 
 # Constants
 TWEET_DATASET_COLUMNS = ['text', 'label', 'tweet_hashtags', 'datetime', 'username_encoded', 'url_encoded']
 REDDIT_DATASET_COLUMNS = ['text', 'label', 'dataType', 'communityName', 'datetime', 'username_encoded', 'url_encoded']
 
+# Arrow schemas of the uploaded datasets, matching the columns above.
+TWEET_DATASET_SCHEMA = pa.schema([
+    ('text', pa.string()),
+    ('label', pa.string()),
+    ('tweet_hashtags', pa.list_(pa.string())),
+    ('datetime', pa.string()),
+    ('username_encoded', pa.string()),
+    ('url_encoded', pa.string()),
+])
+REDDIT_DATASET_SCHEMA = pa.schema([
+    ('text', pa.string()),
+    ('label', pa.string()),
+    ('dataType', pa.string()),
+    ('communityName', pa.string()),
+    ('datetime', pa.string()),
+    ('username_encoded', pa.string()),
+    ('url_encoded', pa.string()),
+])
+
+# Fields read from the JSON content of each source.
+TWEET_CONTENT_SCHEMA = pa.schema([
+    ('text', pa.string()),
+    ('tweet_hashtags', pa.list_(pa.string())),
+    ('username', pa.string()),
+    ('url', pa.string()),
+])
+REDDIT_CONTENT_SCHEMA = pa.schema([
+    ('body', pa.string()),
+    ('dataType', pa.string()),
+    ('communityName', pa.string()),
+    ('username', pa.string()),
+    ('url', pa.string()),
+])
+
+# Rows per parquet row group in HF chunks. Validators sample rows by fetching a single row group, so small groups keep
+# validation downloads small, at the cost of a larger footer.
+SAMPLING_ROW_GROUP_SIZE = 2_000
+
+# Columns short enough for their min/max statistics to be worth keeping in the parquet footer.
+STATISTICS_COLUMNS = ['label', 'datetime', 'dataType', 'communityName']
+
+# Block size for parsing content. A single content blob larger than this falls back to row by row parsing.
+CONTENT_PARSE_BLOCK_SIZE = 16 * 1024 * 1024
+
 # Stats Related Constants
 STATS_VERSION = "2.0.0"
 DEFAULT_STATS_STRUCTURE = {
@@ -299,3 +347,170 @@ def preprocess_reddit_df(df: pd.DataFrame, encoding_key_manager: EncodingKeyMana
     except Exception as e:
         bt.logging.error(f"Error in Reddit preprocessing: {e}")
         raise
+
+
+def _coerce_content_value(value: Any, data_type: pa.DataType) -> Any:
+    """Returns the value if it matches the Arrow type, otherwise None."""
+    if pa.types.is_list(data_type):
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return value
+        return None
+    return value if isinstance(value, str) else None
+
+
+def parse_content_column(contents: pa.Array, content_schema: pa.Schema) -> pa.Table:
+    """
+    Parse a column of JSON content blobs into a table with one column per field of the content schema.
+
+    The blobs are parsed together as newline delimited JSON by Arrow. If that fails, for example on a malformed
+    blob, they are parsed row by row and values that do not match the schema become null.
+
+    Args:
+        contents (pa.Array): Binary array of JSON objects, one per row.
+        content_schema (pa.Schema): The fields to read from each object.
+
+    Returns:
+        pa.Table: A table with the same number of rows as contents.
+    """
+    if len(contents) == 0:
+        return content_schema.empty_table()
+
+    if contents.null_count == 0:
+        joined = pc.binary_join(
+            pa.ListArray.from_arrays(pa.array([0, len(contents)], pa.int32()), contents.cast(pa.binary())),
+            b"\n",
+        )
+        try:
+            table = pa_json.read_json(
+                pa.BufferReader(joined[0].as_buffer()),
+                read_options=pa_json.ReadOptions(block_size=CONTENT_PARSE_BLOCK_SIZE),
+                parse_options=pa_json.ParseOptions(
+                    explicit_schema=content_schema,
+                    unexpected_field_behavior='ignore',
+                ),
+            )
+            # A blob containing a raw newline would be split across rows.
+            if table.num_rows == len(contents):
+                return table.select(content_schema.names)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+    decoded = [decode_content(content) for content in contents.to_pylist()]
+    return pa.Table.from_pylist(
+        [
+            {
+                field.name: _coerce_content_value(item.get(field.name), field.type) if isinstance(item, dict) else None
+                for field in content_schema
+            }
+            for item in decoded
+        ],
+        schema=content_schema,
+    )
+
+
+def get_parquet_writer_options(schema: pa.Schema) -> Dict[str, Any]:
+    """
+    ParquetWriter options for HF chunks, whose rows are written in datetime order.
+
+    The sort order and statistics of the short columns are recorded in the footer and a page index is written, so
+    readers can locate rows from the footer alone.
+    """
+    return {
+        'sorting_columns': [pq.SortingColumn(schema.get_field_index('datetime'))],
+        'write_statistics': [name for name in STATISTICS_COLUMNS if name in schema.names],
+        'write_page_index': True,
+    }
+
+
+def _encode_column(values: pa.ChunkedArray, key_manager: EncodingKeyManager,
+                   encoding_pool: Optional[EncodingPool]) -> pa.Array:
+    """Encode a string column with the manager's key, treating missing values as empty strings."""
+    urls = values.fill_null('').combine_chunks()
+    return encode_urls(urls, key_manager.sym_key, pool=encoding_pool)
+
+
+def _filter_empty_text(table: pa.Table, text_column: str) -> pa.Table:
+    text = table.column(text_column)
+    return table.filter(pc.fill_null(pc.not_equal(pc.utf8_trim_whitespace(text), ''), False))
+
+
+def preprocess_twitter_batch(batch: pa.RecordBatch, encoding_key_manager: EncodingKeyManager,
+                             private_encoding_key_manager: EncodingKeyManager,
+                             encoding_pool: Optional[EncodingPool] = None) -> pa.Table:
+    """
+    Arrow equivalent of preprocess_twitter_df.
+
+    Args:
+        batch (pa.RecordBatch): Rows with datetime, label and content columns, as read from the miner database.
+        encoding_pool (Optional[EncodingPool]): Pool to encode the username and url columns across, if any.
+
+    Returns:
+        pa.Table: Rows with non-empty text, in TWEET_DATASET_SCHEMA.
+    """
+    content = parse_content_column(batch.column('content'), TWEET_CONTENT_SCHEMA)
+    table = pa.table({
+        'text': content.column('text'),
+        'label': batch.column('label'),
+        'tweet_hashtags': content.column('tweet_hashtags'),
+        'datetime': pc.utf8_slice_codeunits(batch.column('datetime'), 0, 10),
+        'username': content.column('username'),
+        'url': content.column('url'),
+    })
+
+    table = _filter_empty_text(table, 'text')
+    bt.logging.info(f"Removed {batch.num_rows - table.num_rows} Twitter rows with empty text. "
+                    f"Remaining rows: {table.num_rows}")
+
+    return pa.Table.from_arrays(
+        [
+            table.column('text'),
+            table.column('label'),
+            table.column('tweet_hashtags'),
+            table.column('datetime'),
+            _encode_column(table.column('username'), encoding_key_manager, encoding_pool),
+            _encode_column(table.column('url'), private_encoding_key_manager, encoding_pool),
+        ],
+        schema=TWEET_DATASET_SCHEMA,
+    )
+
+
+def preprocess_reddit_batch(batch: pa.RecordBatch, encoding_key_manager: EncodingKeyManager,
+                            private_encoding_key_manager: EncodingKeyManager,
+                            encoding_pool: Optional[EncodingPool] = None) -> pa.Table:
+    """
+    Arrow equivalent of preprocess_reddit_df.
+
+    Args:
+        batch (pa.RecordBatch): Rows with datetime, label and content columns, as read from the miner database.
+        encoding_pool (Optional[EncodingPool]): Pool to encode the username and url columns across, if any.
+
+    Returns:
+        pa.Table: Rows with non-empty text, in REDDIT_DATASET_SCHEMA.
+    """
+    content = parse_content_column(batch.column('content'), REDDIT_CONTENT_SCHEMA)
+    table = pa.table({
+        'text': content.column('body'),
+        'label': batch.column('label'),
+        'dataType': content.column('dataType'),
+        'communityName': content.column('communityName'),
+        'datetime': pc.utf8_slice_codeunits(batch.column('datetime'), 0, 10),
+        'username': content.column('username'),
+        'url': content.column('url'),
+    })
+
+    table = _filter_empty_text(table, 'text')
+    bt.logging.info(f"Removed {batch.num_rows - table.num_rows} Reddit rows with empty text. "
+                    f"Remaining rows: {table.num_rows}")
+
+    return pa.Table.from_arrays(
+        [
+            table.column('text'),
+            table.column('label'),
+            table.column('dataType'),
+            table.column('communityName'),
+            table.column('datetime'),
+            _encode_column(table.column('username'), encoding_key_manager, encoding_pool),
+            _encode_column(table.column('url'), private_encoding_key_manager, encoding_pool),
+        ],
+        schema=REDDIT_DATASET_SCHEMA,
+    )
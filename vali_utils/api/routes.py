@@ -222,7 +222,7 @@ async def query_bucket(
 
         query += " ORDER BY m.credibility DESC LIMIT 1"
 
-        with validator.evaluator.storage.lock:
+        with validator.evaluator.storage.lock.read():
             connection = validator.evaluator.storage._create_connection()
             cursor = connection.cursor()
 
@@ -361,7 +361,7 @@ async def get_label_sizes(
         except KeyError:
             raise HTTPException(400, f"Invalid source: {source}")
 
-        with validator.evaluator.storage.lock:
+        with validator.evaluator.storage.lock.read():
             connection = validator.evaluator.storage._create_connection()
             cursor = connection.cursor()
 
@@ -413,7 +413,7 @@ async def get_age_sizes(
         except KeyError:
             raise HTTPException(400, f"Invalid source: {source}")
 
-        with validator.evaluator.storage.lock:
+        with validator.evaluator.storage.lock.read():
             connection = validator.evaluator.storage._create_connection()
             cursor = connection.cursor()
 
@@ -497,7 +497,7 @@ async def get_bytes_by_label(
         if not normalized_label:
             return LabelBytes(label=label, total_bytes=0, adj_total_bytes=0.0)
 
-        with validator.evaluator.storage.lock:
+        with validator.evaluator.storage.lock.read():
             connection = validator.evaluator.storage._create_connection()
             cursor = connection.cursor()
 
@@ -1,4 +1,5 @@
 """Module for HuggingFace dataset utilities and validation."""
+import io
 import os
 import random
 import bittensor as bt
@@ -8,7 +9,9 @@ import itertools
 import asyncio
 import datetime as dt
 import pyarrow as pa
+import pyarrow.parquet as pq
 import fsspec
+import requests
 from typing import List, Dict, Any, Tuple, Optional
 from huggingface_hub import HfApi, hf_hub_url
 from upload_utils.encoding_system import SymKeyEncodingKeyManager, decode_url
@@ -146,6 +149,101 @@ def get_parquet_file_structure(repo_id: str, file: str) -> dict:
         return {}
 
 
+class HttpRangeFile(io.RawIOBase):
+    """
+    Read-only file over HTTP that downloads only the byte ranges that are read, using range requests.
+
+    The end of the file is fetched up front, since that is where parquet readers start.
+    """
+
+    def __init__(self, url: str, session: Optional[requests.Session] = None, tail_size: int = 64 * 1024,
+                 timeout: int = 30):
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.position = 0
+        self.bytes_fetched = 0
+
+        response = self._get_range(f"bytes=-{tail_size}")
+        # Content-Range is "bytes <start>-<end>/<size>".
+        self.size = int(response.headers["Content-Range"].rsplit("/", 1)[1])
+        self._tail = response.content
+        self._tail_offset = self.size - len(self._tail)
+
+    def _get_range(self, byte_range: str) -> requests.Response:
+        response = self.session.get(self.url, headers={"Range": byte_range}, timeout=self.timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError(f"Server does not support range requests for {self.url}")
+        self.bytes_fetched += len(response.content)
+        return response
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        end = self.size if size is None or size < 0 else min(self.size, self.position + size)
+        if end <= self.position:
+            return b""
+
+        if self.position >= self._tail_offset:
+            data = self._tail[self.position - self._tail_offset:end - self._tail_offset]
+        else:
+            data = self._get_range(f"bytes={self.position}-{end - 1}").content
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def sample_parquet_rows(url: str, num_rows: int, session: Optional[requests.Session] = None) -> pd.DataFrame:
+    """
+    Sample rows of a remote parquet file, downloading only its footer and randomly chosen row groups.
+
+    Miners write small row groups, so this usually fetches kilobytes rather than the whole file.
+    """
+    source = HttpRangeFile(url, session)
+    # Pre-buffering coalesces the reads of a row group's columns into as few requests as possible.
+    parquet_file = pq.ParquetFile(source, pre_buffer=True)
+
+    row_groups = [i for i in range(parquet_file.num_row_groups) if parquet_file.metadata.row_group(i).num_rows > 0]
+    random.shuffle(row_groups)
+    tables = []
+    rows = 0
+    for row_group in row_groups:
+        if rows >= num_rows:
+            break
+        tables.append(parquet_file.read_row_group(row_group))
+        rows += tables[-1].num_rows
+
+    if not tables:
+        return pd.DataFrame()
+
+    table = pa.concat_tables(tables)
+    indices = sorted(random.sample(range(table.num_rows), min(num_rows, table.num_rows)))
+    bt.logging.trace(f"Sampled {len(indices)} rows from {url}, fetching {source.bytes_fetched} of {source.size} bytes.")
+    # Build the rows as Python objects, matching rows read through the datasets library.
+    return pd.DataFrame(table.take(indices).to_pylist())
+
+
 def get_validation_data(repo_id: str, files: List[str], num_rows: int = 10) -> Tuple[List[str], pd.DataFrame]:
     """
     Get both encoded URLs and complete DataFrame (with encoded values) for validation.
@@ -157,6 +255,20 @@ def get_validation_data(repo_id: str, files: List[str], num_rows: int = 10) -> T
         raise ValueError("No parquet files found in the dataset.")
     selected_file = random.choice(files)
     bt.logging.trace(f"Selected file: {selected_file}")
+
+    try:
+        df = sample_parquet_rows(hf_hub_url(repo_id=repo_id, filename=selected_file, repo_type="dataset"), num_rows)
+    except Exception as e:
+        bt.logging.warning(f"Falling back to streaming {selected_file} after failing to sample row groups: {e}")
+        df = _stream_validation_rows(repo_id, selected_file, num_rows)
+
+    encoded_urls = []
+    if 'url_encoded' in df.columns:
+        encoded_urls = df['url_encoded'].dropna().tolist()[:10]
+    return encoded_urls, df
+
+
+def _stream_validation_rows(repo_id: str, selected_file: str, num_rows: int) -> pd.DataFrame:
     dataset = load_dataset(
         repo_id,
         data_files={'train': selected_file},
@@ -166,11 +278,7 @@ def get_validation_data(repo_id: str, files: List[str], num_rows: int = 10) -> T
     random_seed = random.randint(0, 2 ** 32 - 1)
     shuffled_dataset = dataset.shuffle(buffer_size=10_000, seed=random_seed)
     selected_rows = list(itertools.islice(shuffled_dataset, num_rows))
-    df = pd.DataFrame(selected_rows)
-    encoded_urls = []
-    if 'url_encoded' in df.columns:
-        encoded_urls = df['url_encoded'].dropna().tolist()[:10]
-    return encoded_urls, df
+    return pd.DataFrame(selected_rows)
 
 
 def decode_dataframe(df: pd.DataFrame, encoding_key: str) -> pd.DataFrame:
@@ -21,6 +21,7 @@ from common.protocol import GetDataEntityBucket, GetMinerIndex, GetHuggingFaceMe
 from rewards.data_value_calculator import DataValueCalculator
 from scraping.provider import ScraperProvider
 from scraping.scraper import ScraperId, ValidationResult, HFValidationResult, S3ValidationResult
+from storage.validator.numpy_validator_storage import NumpyValidatorStorage
 from storage.validator.sqlite_memory_validator_storage import (
     SqliteMemoryValidatorStorage,
 )
@@ -76,7 +77,10 @@ class MinerEvaluator:
             utils.get_miner_uids(self.metagraph, self.uid, self.vpermit_rao_limit)
         )
         self.scraper_provider = ScraperProvider()
-        self.storage = SqliteMemoryValidatorStorage()
+        if self.config.neuron.storage_backend == "numpy":
+            self.storage = NumpyValidatorStorage()
+        else:
+            self.storage = SqliteMemoryValidatorStorage()
         self.hf_storage = HFValidationStorage(self.config.hf_results_path)
         self.s3_storage = S3ValidationStorage(self.config.s3_results_path)
         self.s3_reader = s3_reader